@@ -0,0 +1,125 @@
+import datetime
+import logging
+import threading
+from collections import namedtuple
+
+logger = logging.getLogger("tjpr_autodownloader.scheduler")
+
+# Edições baixadas no dia da publicação necessárias para aprender a janela; antes disso vale a padrão
+MIN_SAMPLES = 5
+# Folga, em minutos, antes e depois dos horários observados
+WINDOW_MARGIN = 30
+# Janela padrão: a partir de default_start, por DEFAULT_WINDOW_HOURS horas
+DEFAULT_WINDOW_HOURS = 3
+
+# Intervalos entre verificações, em segundos: dentro da janela começa em WINDOW_INTERVAL e dobra a cada
+# verificação sem novidade até WINDOW_MAX_INTERVAL; fora dela, de IDLE_INTERVAL até MAX_INTERVAL
+WINDOW_INTERVAL = 5 * 60
+WINDOW_MAX_INTERVAL = 30 * 60
+IDLE_INTERVAL = 60 * 60
+MAX_INTERVAL = 4 * 60 * 60
+BACKOFF_FACTOR = 2.0
+
+
+class PublicationWindow(namedtuple('PublicationWindow', ['start', 'end', 'samples'])):
+    """Horário do dia (minutos desde a meia-noite, start a end) em que as edições costumam aparecer"""
+    __slots__ = ()
+
+    def contains(self, moment):
+        return self.start <= moment.hour * 60 + moment.minute <= self.end
+
+    def next_start(self, moment):
+        """Próximo início da janela depois de moment"""
+        start = datetime.datetime.combine(moment.date(), datetime.time(self.start // 60, self.start % 60))
+        return start if start > moment else start + datetime.timedelta(days=1)
+
+    def __str__(self):
+        return (f"{self.start // 60:02d}:{self.start % 60:02d}-{self.end // 60:02d}:{self.end % 60:02d}"
+                + (f" ({self.samples} edições)" if self.samples else " (padrão)"))
+
+
+def learn_publication_window(entries, default_start="09:00", margin=WINDOW_MARGIN):
+    """Janela de publicação a partir do registro: horários de download das edições baixadas no próprio
+    dia da publicação (as do backfill e as baixadas dias depois não dizem nada sobre o horário), do
+    percentil 10 ao 90, com margin minutos de folga. Com menos de MIN_SAMPLES, a janela padrão."""
+    minutes = []
+    for entry in entries:
+        try:
+            downloaded = datetime.datetime.strptime(entry['download_date'], '%Y-%m-%d %H:%M:%S')
+            published = datetime.datetime.strptime(entry['data'], '%d/%m/%Y').date()
+        except (KeyError, TypeError, ValueError):
+            continue
+        if downloaded.date() == published:
+            minutes.append(downloaded.hour * 60 + downloaded.minute)
+    if len(minutes) < MIN_SAMPLES:
+        hour, minute = (int(part) for part in default_start.split(":"))
+        start = hour * 60 + minute
+        return PublicationWindow(start, min(24 * 60 - 1, start + DEFAULT_WINDOW_HOURS * 60), 0)
+    minutes.sort()
+    low = minutes[int(0.1 * (len(minutes) - 1))]
+    high = minutes[int(round(0.9 * (len(minutes) - 1)))]
+    return PublicationWindow(max(0, low - margin), min(24 * 60 - 1, high + margin), len(minutes))
+
+
+class AdaptiveScheduler:
+    """Verificações contínuas num único processo, com intervalo adaptativo.
+
+    check() é chamado em laço e retorna verdadeiro quando encontrou edições novas. Dentro da janela de
+    publicação as verificações são frequentes; fora dela, espaçadas, mas sempre acordando no início da
+    próxima janela. A cada verificação sem novidade o intervalo é multiplicado por factor (até o limite
+    da fase); uma novidade, ou a entrada na janela, volta ao intervalo inicial. learn_window() é chamado
+    no início e depois de cada novidade, para a janela acompanhar o registro. stop (threading.Event)
+    interrompe a espera e encerra o laço.
+    """
+
+    def __init__(self, check, learn_window, window_interval=WINDOW_INTERVAL, window_max=WINDOW_MAX_INTERVAL,
+                 idle_interval=IDLE_INTERVAL, max_interval=MAX_INTERVAL, factor=BACKOFF_FACTOR, clock=None):
+        self.check = check
+        self.learn_window = learn_window
+        self.window_interval = window_interval
+        self.window_max = window_max
+        self.idle_interval = idle_interval
+        self.max_interval = max_interval
+        self.factor = factor
+        self.clock = clock or datetime.datetime.now
+        self.window = None
+        self.misses = 0
+        self._in_window = None
+
+    def next_delay(self, now, changed):
+        """Segundos até a próxima verificação, depois de uma verificação em now"""
+        in_window = self.window.contains(now)
+        if changed or (in_window and not self._in_window):
+            self.misses = 0
+        else:
+            self.misses += 1
+        self._in_window = in_window
+        if in_window:
+            return min(self.window_max, self.window_interval * self.factor ** self.misses)
+        delay = min(self.max_interval, self.idle_interval * self.factor ** self.misses)
+        return max(1.0, min(delay, (self.window.next_start(now) - now).total_seconds()))
+
+    def run(self, stop=None, max_checks=None):
+        """Verifica até stop ser acionado (ou max_checks verificações); retorna quantas verificações houve"""
+        stop = stop or threading.Event()
+        self.window = self.learn_window()
+        logger.info(f"Janela de publicação: {self.window}")
+        checks = 0
+        while not stop.is_set():
+            try:
+                changed = bool(self.check())
+            except Exception as e:
+                logger.error(f"Erro na verificação: {e}")
+                changed = False
+            checks += 1
+            if changed:
+                self.window = self.learn_window()
+                logger.info(f"Janela de publicação: {self.window}")
+            if max_checks is not None and checks >= max_checks:
+                break
+            now = self.clock()
+            delay = self.next_delay(now, changed)
+            logger.info(f"Próxima verificação em {delay / 60:.1f} min "
+                        f"({'dentro' if self.window.contains(now) else 'fora'} da janela {self.window})")
+            stop.wait(delay)
+        return checks
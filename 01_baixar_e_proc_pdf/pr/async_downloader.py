@@ -0,0 +1,315 @@
+import asyncio
+import concurrent.futures
+import hashlib
+import logging
+import os
+import re
+import time
+from collections import namedtuple
+
+import requests
+
+from pdf_store import edition_key
+from tjpr_http import CONNECT_TIMEOUT, READ_TIMEOUT
+
+logger = logging.getLogger("tjpr_autodownloader.async_downloader")
+
+# Downloads simultâneos por padrão
+DEFAULT_CONCURRENCY = 4
+
+# Tempo máximo de um download inteiro, mesmo que os bytes continuem chegando devagar
+TOTAL_TIMEOUT = 600
+
+# Blocos maiores reduzem as chamadas de leitura e escrita em PDFs de dezenas de MB
+CHUNK_SIZE = 256 * 1024
+
+# Sufixo dos downloads em andamento; o arquivo só recebe o nome final depois de conferido
+PART_SUFFIX = '.part'
+# Ao lado do .part: ETag (ou Last-Modified) da resposta que o começou, enviado como If-Range ao continuar
+VALIDATOR_SUFFIX = '.validator'
+
+# Quedas seguidas sem receber nenhum byte novo antes de desistir do download
+MAX_RESUMES = 5
+
+# existing: arquivo (ou nome no PdfStore) que já tinha a edição ou o mesmo conteúdo; None se o PDF é novo
+DownloadResult = namedtuple('DownloadResult', ['edition', 'success', 'path', 'bytes', 'elapsed', 'error', 'sha256',
+                                               'existing'], defaults=(None, None))
+
+StreamedFile = namedtuple('StreamedFile', ['size', 'sha256'])
+
+_CONTENT_RANGE = re.compile(r'bytes\s+(?:(\d+)-\d+|\*)/(\d+|\*)')
+
+# Falhas no meio da transferência, que deixam o .part aproveitável
+_STREAM_ERRORS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+
+
+def _content_range(response):
+    """(início, tamanho total) do cabeçalho Content-Range; None onde o servidor não informa"""
+    match = _CONTENT_RANGE.match(response.headers.get('Content-Range', ''))
+    if not match:
+        return None, None
+    start, total = match.groups()
+    return (int(start) if start is not None else None), (int(total) if total != '*' else None)
+
+
+def _validator(response):
+    """ETag forte ou, sem ele, Last-Modified da resposta: identifica a versão do arquivo no servidor"""
+    etag = response.headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        return etag
+    return response.headers.get('Last-Modified')
+
+
+def _read_validator(part_path):
+    try:
+        with open(part_path + VALIDATOR_SUFFIX, 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _write_validator(part_path, validator):
+    if validator is None:
+        _remove(part_path + VALIDATOR_SUFFIX)
+        return
+    with open(part_path + VALIDATOR_SUFFIX, 'w', encoding='utf-8') as f:
+        f.write(validator)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _discard_part(part_path):
+    """Apaga o .part e o validador dele"""
+    _remove(part_path)
+    _remove(part_path + VALIDATOR_SUFFIX)
+
+
+def _file_digest(path, chunk_size=CHUNK_SIZE):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest
+
+
+def stream_to_file(http, url, filepath, headers=None, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+                   total_timeout=TOTAL_TIMEOUT, chunk_size=CHUNK_SIZE, max_resumes=MAX_RESUMES, metrics=None):
+    """Baixa url em filepath passando por filepath + PART_SUFFIX; retorna StreamedFile(tamanho, sha256).
+    http é um TJPRHttpClient (ou qualquer objeto com o get de requests.Session).
+
+    O SHA-256 é calculado enquanto os bytes são gravados; ao continuar um .part, o que já está no
+    disco é lido uma vez para o hash.
+
+    Um .part deixado por uma execução anterior, ou por uma queda de conexão nesta, é continuado com
+    Range e If-Range, com o ETag (ou Last-Modified) da resposta que o começou, guardado ao lado dele
+    (VALIDATOR_SUFFIX). Só é continuado se o servidor responder 206 com o mesmo validador; sem validador
+    guardado, com outro validador ou se o servidor ignorar o Range e responder 200, o download recomeça
+    do zero. Um 416 só completa o .part se o tamanho e o validador baterem. O .part só ganha o nome
+    final (os.replace, atômico) depois de conferido contra o tamanho anunciado pelo servidor. Levanta
+    exceção em código HTTP inesperado, arquivo vazio, tamanho divergente, quedas demais ou estouro de
+    total_timeout; o .part fica para a próxima tentativa.
+    Com metrics (StageMetrics), o tempo de escrita e fsync vai para a etapa 'gravacao'.
+    """
+    part_path = filepath + PART_SUFFIX
+    deadline = time.monotonic() + total_timeout if total_timeout else None
+    failures = 0
+    # Hash dos bytes do .part e quantos bytes ele cobre
+    digest, hashed = None, 0
+    while True:
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        validator = _read_validator(part_path) if offset else None
+        if offset and validator is None:
+            # Sem validador não há como saber se o .part é da versão que o servidor tem agora
+            logger.info(f"Arquivo parcial de {os.path.basename(filepath)} sem validador; recomeçando")
+            _discard_part(part_path)
+            offset, digest, hashed = 0, None, 0
+        # Sem compressão de transporte: o Range e o tamanho anunciado valem sobre os bytes do PDF
+        request_headers = {**(headers or {}), 'Accept-Encoding': 'identity'}
+        if offset:
+            request_headers['Range'] = f'bytes={offset}-'
+            request_headers['If-Range'] = validator
+        received = 0
+        writing = 0.0
+        try:
+            with http.get(url, headers=request_headers, stream=True, timeout=timeout) as response:
+                start, total = _content_range(response)
+                if response.status_code == 416 and offset:
+                    # O .part já tem tudo o que o servidor tem, se for da mesma versão do arquivo
+                    if total == offset and _validator(response) == validator:
+                        break
+                    _discard_part(part_path)
+                    digest, hashed = None, 0
+                    if total == offset:
+                        logger.info(f"{os.path.basename(filepath)} mudou no servidor; recomeçando")
+                        continue
+                    raise ValueError(f"arquivo parcial com {offset} bytes não corresponde ao servidor ({total})")
+                if response.status_code == 206 and offset and start == offset:
+                    if _validator(response) != validator:
+                        # Servidor que não respeita If-Range: o resto seria de outra versão do arquivo
+                        logger.info(f"{os.path.basename(filepath)} mudou no servidor; recomeçando")
+                        _discard_part(part_path)
+                        digest, hashed = None, 0
+                        continue
+                    mode = 'ab'
+                    if digest is None or hashed != offset:
+                        digest, hashed = _file_digest(part_path), offset
+                elif response.status_code == 200:
+                    if offset:
+                        logger.info(f"Servidor ignorou o Range de {os.path.basename(filepath)}; recomeçando")
+                    mode, offset = 'wb', 0
+                    digest, hashed = hashlib.sha256(), 0
+                    length = response.headers.get('Content-Length')
+                    total = int(length) if length and length.isdigit() else None
+                    _write_validator(part_path, _validator(response))
+                else:
+                    raise requests.HTTPError(f"código {response.status_code}", response=response)
+
+                with open(part_path, mode) as f:
+                    for chunk in response.iter_content(chunk_size=chunk_size):
+                        if chunk:
+                            written = time.perf_counter()
+                            f.write(chunk)
+                            writing += time.perf_counter() - written
+                            digest.update(chunk)
+                            received += len(chunk)
+                            hashed += len(chunk)
+                        if deadline is not None and time.monotonic() > deadline:
+                            raise TimeoutError(f"download excedeu {total_timeout} s")
+                    written = time.perf_counter()
+                    f.flush()
+                    os.fsync(f.fileno())
+                    writing += time.perf_counter() - written
+        except _STREAM_ERRORS as e:
+            failures = 0 if received else failures + 1
+            if failures > max_resumes or (deadline is not None and time.monotonic() > deadline):
+                raise
+            delay = http.backoff(failures) if hasattr(http, 'backoff') else 0
+            logger.warning(f"Conexão interrompida em {os.path.basename(filepath)} com {offset + received} bytes "
+                           f"({e}); retomando em {delay:.1f} s")
+            time.sleep(delay)
+            continue
+        finally:
+            if metrics is not None:
+                metrics.add_time('gravacao', writing)
+
+        size = offset + received
+        if size == 0:
+            _discard_part(part_path)
+            raise ValueError("arquivo baixado está vazio")
+        if total is not None and size != total:
+            if size > total:
+                _discard_part(part_path)
+            raise ValueError(f"tamanho divergente: {size} bytes recebidos, {total} anunciados")
+        break
+
+    size = os.path.getsize(part_path)
+    if digest is None or hashed != size:
+        digest = _file_digest(part_path)
+    os.replace(part_path, filepath)
+    _remove(part_path + VALIDATOR_SUFFIX)
+    return StreamedFile(size, digest.hexdigest())
+
+
+class AsyncDownloadEngine:
+    """Baixa várias edições ao mesmo tempo com asyncio, no máximo concurrency por vez.
+
+    O requests é bloqueante, então cada download roda numa thread de um pool do tamanho do limite,
+    despachada pelo loop asyncio; o cliente http (com os cookies e o limitador de taxa dele) é
+    compartilhado. Cada edição é um dict com 'url', 'filename', 'numero' e 'data'. Sem store, arquivos
+    que já existem no diretório não são baixados de novo; com store (PdfStore), a edição é procurada
+    no índice pelo número e pela data, e cada PDF baixado é guardado pelo SHA-256 do conteúdo.
+    Com metrics (StageMetrics), cada download registra tempo, vazão, bytes e o tempo gasto no store.
+    """
+
+    def __init__(self, http, download_dir, headers=None, concurrency=DEFAULT_CONCURRENCY,
+                 timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), total_timeout=TOTAL_TIMEOUT, chunk_size=CHUNK_SIZE,
+                 store=None, metrics=None):
+        if concurrency < 1:
+            raise ValueError(f"Limite de downloads simultâneos inválido: {concurrency}")
+        self.http = http
+        self.download_dir = download_dir
+        self.headers = headers
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.total_timeout = total_timeout
+        self.chunk_size = chunk_size
+        self.store = store
+        self.metrics = metrics
+
+    async def _download(self, edition, semaphore, executor, on_downloaded=None):
+        async with semaphore:
+            result = await asyncio.get_running_loop().run_in_executor(executor, self.fetch, edition)
+        if result.success and result.existing is None and on_downloaded is not None:
+            # Na thread do pool: se o callback bloquear (fila cheia), a vaga de download fica ocupada
+            async with semaphore:
+                await asyncio.get_running_loop().run_in_executor(executor, on_downloaded, result)
+        return result
+
+    def fetch(self, edition):
+        """Baixa (e guarda, com store) uma edição, na thread que chamar; retorna o DownloadResult"""
+        filepath = os.path.join(self.download_dir, edition['filename'])
+        key = edition_key(edition['numero'], edition['data']) if self.store is not None else None
+        if self.store is not None:
+            found = self.store.find(key)
+            if found:
+                logger.info(f"Edição já guardada como {found[1]}: {edition['filename']}")
+                if self.metrics is not None:
+                    self.metrics.count('ja_guardados')
+                return DownloadResult(edition, True, filepath, 0, 0.0, None, found[0], found[1])
+        elif os.path.exists(filepath):
+            logger.info(f"Arquivo já existe: {edition['filename']}")
+            return DownloadResult(edition, True, filepath, 0, 0.0, None, None, filepath)
+
+        logger.info(f"Baixando: {edition['filename']}")
+        start = time.perf_counter()
+        try:
+            streamed = stream_to_file(self.http, edition['url'], filepath, self.headers, self.timeout,
+                                      self.total_timeout, self.chunk_size, metrics=self.metrics)
+            stored = time.perf_counter()
+            existing = self.store.add(filepath, streamed.sha256, key) if self.store is not None else None
+            stored = time.perf_counter() - stored
+        except Exception as e:
+            elapsed = time.perf_counter() - start
+            logger.error(f"Erro ao baixar {edition['filename']}: {e}")
+            if self.metrics is not None:
+                self.metrics.count('falhas')
+            return DownloadResult(edition, False, filepath, 0, elapsed, str(e))
+        elapsed = time.perf_counter() - start
+        if self.metrics is not None:
+            self.metrics.add_time('download', elapsed)
+            self.metrics.add_time('repositorio', stored)
+            self.metrics.observe('download_segundos', elapsed)
+            self.metrics.observe('download_kb_s', streamed.size / 1024 / max(elapsed, 1e-9))
+            self.metrics.count('pdfs')
+            self.metrics.count('bytes', streamed.size)
+            if existing is not None:
+                self.metrics.count('repetidos')
+        logger.info(f"Baixado: {edition['filename']} ({streamed.size / 1024:.1f} KB em {elapsed:.1f} s)")
+        return DownloadResult(edition, True, filepath, streamed.size, elapsed, None, streamed.sha256, existing)
+
+    async def run(self, editions, on_downloaded=None):
+        """Baixa todas as edições; retorna um DownloadResult por edição, na mesma ordem.
+
+        on_downloaded, se dado, é chamado com o DownloadResult de cada PDF novo assim que ele fica pronto
+        (não para edições já baixadas nem para conteúdo repetido).
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            return await asyncio.gather(*(self._download(edition, semaphore, executor, on_downloaded)
+                                          for edition in editions))
+
+    def download_all(self, editions, on_downloaded=None):
+        """Versão síncrona de run, para quem não está dentro de um loop asyncio"""
+        start = time.perf_counter()
+        results = asyncio.run(self.run(editions, on_downloaded))
+        elapsed = time.perf_counter() - start
+        total_bytes = sum(result.bytes for result in results)
+        logger.info(f"{sum(result.success for result in results)}/{len(results)} downloads concluídos em "
+                    f"{elapsed:.1f} s ({total_bytes / 1024 ** 2 / max(elapsed, 1e-9):.2f} MB/s, "
+                    f"até {self.concurrency} simultâneos)")
+        return results
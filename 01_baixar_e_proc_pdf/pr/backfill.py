@@ -0,0 +1,248 @@
+import concurrent.futures
+import datetime
+import logging
+import threading
+import time
+
+logger = logging.getLogger("tjpr_autodownloader.backfill")
+
+# Edições por shard; cada shard é percorrido por um worker, da edição mais nova para a mais antiga
+DEFAULT_SHARD_SIZE = 100
+
+# Intervalo mínimo entre dois relatórios de progresso, em segundos
+REPORT_INTERVAL = 30.0
+
+# Prefixo das chaves de checkpoint na tabela state do registro
+STATE_PREFIX = "backfill"
+
+
+def _parse_date(value):
+    return datetime.datetime.strptime(value.strip(), '%d/%m/%Y').date()
+
+
+class BackfillProgress:
+    """Contadores de edições e bytes baixados, com relatório de vazão a cada REPORT_INTERVAL"""
+
+    def __init__(self, total_editions=None, interval=REPORT_INTERVAL):
+        self.total_editions = total_editions
+        self.interval = interval
+        self.editions = 0
+        self.bytes = 0
+        self.failures = 0
+        self.start = time.perf_counter()
+        self._last_report = self.start
+        self._lock = threading.Lock()
+
+    def add(self, editions=0, size=0, failures=0):
+        with self._lock:
+            self.editions += editions
+            self.bytes += size
+            self.failures += failures
+            now = time.perf_counter()
+            if now - self._last_report < self.interval:
+                return
+            self._last_report = now
+        logger.info(f"Progresso: {self.summary()}")
+
+    def summary(self):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        total = f"/{self.total_editions}" if self.total_editions else ""
+        return (f"{self.editions}{total} edições em {elapsed / 60:.1f} min ({self.editions / elapsed * 60:.1f} "
+                f"edições/min, {self.bytes / 1024 ** 2 / elapsed:.2f} MB/s), {self.failures} falhas")
+
+
+class Backfill:
+    """Baixa o histórico de um intervalo de edições em shards, com checkpoint por shard.
+
+    O intervalo [first, last] de números de edição é dividido em shards de shard_size edições,
+    percorridos por até workers threads; todos os pedidos passam pelo cliente http do downloader,
+    então o limite de taxa vale para o conjunto. Cada shard localiza na listagem (busca a partir da
+    página estimada) a página onde começa e segue página a página até sair do intervalo; depois de
+    cada página, grava no registro (tabela state) o cursor do shard, o maior número ainda não
+    percorrido. Como o cursor é um número de edição e não uma página, uma execução interrompida
+    continua do mesmo ponto mesmo que novas edições tenham empurrado a listagem. Um shard com edições
+    que falharam fica pendente, e a execução seguinte volta o cursor para baixá-las.
+
+    downloader é um DiarioDownloader; com pipeline (ProcessingPipeline), cada PDF novo vai para o
+    processamento assim que termina de baixar.
+    """
+
+    def __init__(self, downloader, first, last, shard_size=DEFAULT_SHARD_SIZE, workers=None, pipeline=None):
+        if first > last:
+            raise ValueError(f"Intervalo de edições inválido: {first} a {last}")
+        self.downloader = downloader
+        self.registry = downloader.registry
+        self.first = first
+        self.last = last
+        self.shard_size = shard_size
+        self.workers = workers or downloader.concurrency
+        self.pipeline = pipeline
+        self._pages = {}
+        self._pages_lock = threading.Lock()
+        self.latest = None
+        self.per_page = None
+
+    @classmethod
+    def for_dates(cls, downloader, first_date, last_date, **options):
+        """Backfill das edições publicadas entre duas datas (dd/mm/aaaa), convertidas em números de edição.
+
+        A conversão fica no registro, para que a mesma linha de comando retome o mesmo intervalo.
+        """
+        key = f"{STATE_PREFIX}/datas/{first_date}-{last_date}"
+        numbers = downloader.registry.get_state(key)
+        if numbers is None:
+            finder = cls(downloader, 0, 0)
+            finder._start_session()
+            numbers = finder._numbers_between(_parse_date(first_date), _parse_date(last_date))
+            if numbers is None:
+                return None
+            downloader.registry.set_state(key, numbers)
+            logger.info(f"Edições de {first_date} a {last_date}: {numbers[0]} a {numbers[1]}")
+        return cls(downloader, numbers[0], numbers[1], **options)
+
+    def _start_session(self):
+        if not self.downloader.initialize_session():
+            raise RuntimeError("falha ao inicializar a sessão")
+        # A página inicial da sessão é a página 1 da listagem
+        with self._pages_lock:
+            self._pages[1], self.downloader._first_page_editions = self.downloader._first_page_editions, None
+
+    def page(self, page):
+        """Edições de uma página da listagem, pedida uma vez por execução; [] depois da última página"""
+        with self._pages_lock:
+            editions = self._pages.get(page)
+        if editions is None:
+            editions = self.downloader.fetch_listing_page(page)
+            if editions is None:
+                raise RuntimeError(f"página {page} da listagem indisponível")
+            with self._pages_lock:
+                self._pages[page] = editions
+        if page == 1 and editions and self.latest is None:
+            self.latest = max(edition['edition_number'] for edition in editions)
+            self.per_page = len(editions)
+        return editions
+
+    def _first_page(self, predicate, guess=1):
+        """Primeira página p com predicate(edições de p) verdadeiro, sendo predicate falso antes e
+        verdadeiro depois dela (páginas vazias contam como verdadeiro). Parte de guess e dobra o passo
+        até cercar a resposta, depois faz busca binária."""
+        lo, hi, step = 0, None, 1
+        if predicate(self.page(guess)):
+            hi = guess
+            while hi - step > lo:
+                if not predicate(self.page(hi - step)):
+                    lo = hi - step
+                    break
+                hi -= step
+                step *= 2
+        else:
+            lo = guess
+            while hi is None:
+                if predicate(self.page(lo + step)):
+                    hi = lo + step
+                else:
+                    lo += step
+                    step *= 2
+        while hi - lo > 1:
+            middle = (lo + hi) // 2
+            if predicate(self.page(middle)):
+                hi = middle
+            else:
+                lo = middle
+        return hi
+
+    def _page_of(self, numero):
+        """Primeira página com alguma edição de número menor ou igual a numero"""
+        self.page(1)
+        guess = max(1, (self.latest - numero) // self.per_page + 1) if self.per_page else 1
+        return self._first_page(
+            lambda editions: not editions or min(e['edition_number'] for e in editions) <= numero, guess)
+
+    def _numbers_between(self, first_date, last_date):
+        """(menor, maior) número de edição publicada entre as datas, ou None se não houver nenhuma"""
+        def dates(editions):
+            return [_parse_date(edition['data']) for edition in editions]
+
+        last_page = self._first_page(lambda editions: not editions or min(dates(editions)) <= last_date)
+        first_page = self._first_page(lambda editions: not editions or min(dates(editions)) < first_date)
+        candidates = [edition for page in range(max(1, first_page - 1), first_page + 1) for edition in self.page(page)]
+        candidates += self.page(last_page)
+        numbers = [edition['edition_number'] for edition in candidates
+                   if first_date <= _parse_date(edition['data']) <= last_date]
+        return [min(numbers), max(numbers)] if numbers else None
+
+    def shards(self):
+        """Intervalos (menor, maior) de cada shard, do mais novo para o mais antigo"""
+        return [(max(self.first, high - self.shard_size + 1), high)
+                for high in range(self.last, self.first - 1, -self.shard_size)]
+
+    def _state_key(self, shard):
+        return f"{STATE_PREFIX}/{self.first}-{self.last}/{shard[0]}-{shard[1]}"
+
+    def _run_shard(self, shard, progress):
+        low, high = shard
+        key = self._state_key(shard)
+        state = self.registry.get_state(key) or {'cursor': high, 'concluido': False, 'baixadas': 0, 'bytes': 0,
+                                                  'falhas': []}
+        if state['concluido']:
+            return state
+        if state['falhas']:
+            # Edições que falharam na execução anterior: volta o cursor até a mais nova delas; as já
+            # baixadas no caminho ficam de fora pelo registro
+            logger.info(f"Shard {low}-{high}: repetindo as falhas {sorted(state['falhas'])}")
+            state['cursor'] = max(state['cursor'], max(state['falhas']))
+            state['falhas'] = []
+        engine = self.downloader._download_engine()
+        page = self._page_of(state['cursor'])
+        while state['cursor'] >= low:
+            editions = self.page(page)
+            if not editions:
+                break
+            in_range = [edition for edition in editions if low <= edition['edition_number'] <= state['cursor']]
+            for edition in self.registry.missing(in_range):
+                result = engine.fetch(edition)
+                if not result.success:
+                    state['falhas'].append(edition['edition_number'])
+                    progress.add(failures=1)
+                    continue
+                self.registry.add(self.downloader._registry_entry(edition))
+                if self.pipeline is not None and result.existing is None:
+                    self.pipeline.submit(result.path)
+                state['baixadas'] += 1
+                state['bytes'] += result.bytes
+                progress.add(1, result.bytes)
+            state['cursor'] = min(state['cursor'], min(e['edition_number'] for e in editions) - 1)
+            self.registry.set_state(key, state)
+            page += 1
+        # Com falhas, o shard fica pendente e a próxima execução tenta de novo essas edições
+        state['concluido'] = not state['falhas']
+        self.registry.set_state(key, state)
+        if state['concluido']:
+            logger.info(f"Shard {low}-{high} concluído: {state['baixadas']} edições baixadas")
+        else:
+            logger.warning(f"Shard {low}-{high} percorrido com falhas em {sorted(state['falhas'])}; "
+                           f"será retomado na próxima execução")
+        return state
+
+    def run(self):
+        """Percorre todos os shards; retorna o BackfillProgress com o total desta execução"""
+        shards = self.shards()
+        pending = [shard for shard in shards
+                   if not (self.registry.get_state(self._state_key(shard)) or {}).get('concluido')]
+        progress = BackfillProgress()
+        logger.info(f"Backfill das edições {self.first} a {self.last}: {len(shards)} shards de até "
+                    f"{self.shard_size} edições, {len(shards) - len(pending)} já concluídos, "
+                    f"{self.workers} workers")
+        if not pending:
+            return progress
+        self._start_session()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self._run_shard, shard, progress): shard for shard in pending}
+            for future in concurrent.futures.as_completed(futures):
+                low, high = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f"Shard {low}-{high} interrompido: {e}; será retomado na próxima execução")
+        logger.info(f"Backfill concluído: {progress.summary()}")
+        return progress
@@ -0,0 +1,130 @@
+"""Mede o tempo total de download das edições: laço serial (download_file uma a uma) contra o
+AsyncDownloadEngine, com os dois downloaders apontados para o portal falso local (fake_portal).
+
+Uso: python benchmark_downloads.py [--editions=20] [--concurrency=4] [--latency=0.2]
+                                   [--pdf-kb=512] [--bandwidth-kb=1024] [--rate=50]
+"""
+import importlib.util
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from async_downloader import AsyncDownloadEngine, DEFAULT_CONCURRENCY
+from fake_portal import FakePortal
+from tjpr_downloader import TJPRDiarioDownloader
+
+SCRIPT_PATH = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_autodownloader():
+    """Importa tjpr-downloader-automatico-ajustado.py (o hífen impede o import direto)"""
+    spec = importlib.util.spec_from_file_location(
+        "tjpr_autodownloader", os.path.join(SCRIPT_PATH, "tjpr-downloader-automatico-ajustado.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _get_option(name, default):
+    for arg in sys.argv[1:]:
+        if arg.startswith(f"--{name}="):
+            return type(default)(arg.split("=", 1)[1])
+    return default
+
+
+def _check_files(portal, directory, editions):
+    """Confere se cada PDF baixado tem exatamente os bytes servidos pelo portal"""
+    wrong = 0
+    for edition in editions:
+        path = os.path.join(directory, edition['filename'])
+        with open(path, 'rb') as f:
+            if f.read() != portal.pdf_bytes(int(edition['numero'])):
+                wrong += 1
+    return wrong
+
+
+def _report(label, elapsed, count, total_bytes, wrong=0):
+    print(f"{label:<34} {elapsed:7.2f} s  {count:3d} PDFs  {total_bytes / 1024 ** 2 / elapsed:6.2f} MB/s"
+          + (f"  ({wrong} arquivos divergentes)" if wrong else ""))
+
+
+def main():
+    num_editions = _get_option("editions", 20)
+    concurrency = _get_option("concurrency", DEFAULT_CONCURRENCY)
+    latency = _get_option("latency", 0.2)
+    pdf_size = _get_option("pdf-kb", 512) * 1024
+    bandwidth = _get_option("bandwidth-kb", 1024) * 1024
+    # Taxa alta por padrão para medir a concorrência, não o limitador
+    rate = _get_option("rate", 50.0)
+
+    autodownloader = load_autodownloader()
+    logging.getLogger("tjpr_autodownloader").setLevel(logging.WARNING)
+    work_dir = tempfile.mkdtemp(prefix="benchmark_downloads_")
+    portal = FakePortal(editions=num_editions, per_page=10, pdf_size=pdf_size, latency=latency,
+                        bandwidth=bandwidth).start()
+    try:
+        print(f"{num_editions} edições de {pdf_size // 1024} KB, latência {latency * 1000:.0f} ms, "
+              f"{bandwidth // 1024} KB/s por conexão, até {concurrency} downloads simultâneos\n")
+
+        downloader = autodownloader.DiarioDownloader(os.path.join(work_dir, "listagem"),
+                                                     os.path.join(work_dir, "script"), base_url=portal.base_url,
+                                                     concurrency=concurrency, rate=rate,
+                                                     store_dir=os.path.join(work_dir, "pdfs_serial"))
+        editions = downloader.get_all_editions(max_editions=num_editions)
+        total_bytes = pdf_size * len(editions)
+
+        # Caminho anterior: um download de cada vez pela sessão bloqueante
+        serial_dir = os.path.join(work_dir, "serial")
+        os.makedirs(serial_dir)
+        downloader.download_dir = serial_dir
+        start = time.perf_counter()
+        ok = sum(downloader.download_file(edition) for edition in editions)
+        serial_elapsed = time.perf_counter() - start
+        _report("serial (download_file)", serial_elapsed, ok, total_bytes,
+                _check_files(portal, serial_dir, editions))
+
+        async_dir = os.path.join(work_dir, "async")
+        os.makedirs(async_dir)
+        engine = AsyncDownloadEngine(downloader.http, async_dir, headers=downloader.headers,
+                                     concurrency=concurrency)
+        start = time.perf_counter()
+        results = engine.download_all(editions)
+        async_elapsed = time.perf_counter() - start
+        _report(f"AsyncDownloadEngine ({concurrency} simultâneos)", async_elapsed,
+                sum(result.success for result in results), total_bytes, _check_files(portal, async_dir, editions))
+        print(f"\nGanho no download: {serial_elapsed / async_elapsed:.2f}x")
+
+        # Os dois pontos de entrada de ponta a ponta (listagem + downloads)
+        print()
+        check = autodownloader.DiarioDownloader(os.path.join(work_dir, "check"), os.path.join(work_dir, "script2"),
+                                                base_url=portal.base_url, concurrency=concurrency,
+                                                rate=rate, store_dir=os.path.join(work_dir, "pdfs_check"))
+        start = time.perf_counter()
+        downloaded = check.check_and_download_new_editions()
+        _report("check_and_download_new_editions", time.perf_counter() - start, len(downloaded),
+                pdf_size * len(downloaded), _check_files(portal, check.download_dir, downloaded))
+
+        manual = TJPRDiarioDownloader(os.path.join(work_dir, "manual"), base_url=portal.base_url,
+                                      concurrency=concurrency, rate=rate,
+                                      store_dir=os.path.join(work_dir, "pdfs_manual"))
+        stdout = sys.stdout
+        start = time.perf_counter()
+        try:
+            sys.stdout = open(os.devnull, 'w')
+            downloaded = manual.download_diarios(num_editions)
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+        _report("download_diarios", time.perf_counter() - start, len(downloaded),
+                pdf_size * len(downloaded), _check_files(portal, manual.download_dir, downloaded))
+    finally:
+        portal.stop()
+        logging.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
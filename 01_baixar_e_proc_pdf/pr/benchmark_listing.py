@@ -0,0 +1,104 @@
+"""Confere e mede o parser da listagem de edições (tjpr_listing.parse_listing).
+
+Para cada fixture em fixtures/listagem_*.html, compara o resultado com o JSON esperado de mesmo nome.
+Depois mede páginas e linhas por segundo das três leituras, incluindo a varredura antiga do
+get_all_editions (BeautifulSoup com html.parser e re.compile a cada linha), nas fixtures e numa página
+sintética do portal falso com --rows linhas.
+
+Uso: python benchmark_listing.py [--rows=500] [--repeat=20]
+"""
+import glob
+import json
+import os
+import re
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+import tjpr_listing
+from fake_portal import FakePortal
+from tjpr_listing import parse_listing
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def legacy_parse(html):
+    """Leitura anterior da listagem, como no get_all_editions original"""
+    soup = BeautifulSoup(html, 'html.parser')
+    edition_rows = []
+    for table in soup.find_all('table'):
+        for row in table.find_all('tr'):
+            link = row.find('a', href=re.compile(r'javascript:downloadWindow'))
+            if link:
+                edition_rows.append(row)
+    rows = []
+    for row in edition_rows:
+        cells = row.find_all('td')
+        if len(cells) < 2:
+            continue
+        link = row.find('a', href=re.compile(r'javascript:downloadWindow'))
+        match = re.search(r"downloadWindow\('([^']+)'\)", link.get('href', ''))
+        if match:
+            rows.append(tjpr_listing.ListingRow(tuple(cell.text.strip() for cell in cells), match.group(1)))
+    return rows
+
+
+def _get_option(name, default):
+    for arg in sys.argv[1:]:
+        if arg.startswith(f"--{name}="):
+            return type(default)(arg.split("=", 1)[1])
+    return default
+
+
+def _rate(parse, html, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        rows = parse(html)
+    elapsed = (time.perf_counter() - start) / repeat
+    return elapsed, len(rows)
+
+
+def main():
+    num_rows = _get_option("rows", 500)
+    repeat = _get_option("repeat", 20)
+
+    parsers = [("antigo (bs4 por linha)", legacy_parse),
+               ("parse_listing bs4", lambda html: parse_listing(html, use_lxml=False))]
+    if tjpr_listing.lxml is not None:
+        parsers.append(("parse_listing lxml", lambda html: parse_listing(html, use_lxml=True)))
+    else:
+        print("lxml não instalado: medindo só a leitura com BeautifulSoup\n")
+
+    pages = {}
+    failures = 0
+    for path in sorted(glob.glob(os.path.join(FIXTURES_DIR, "listagem_*.html"))):
+        with open(path, 'r', encoding='utf-8') as f:
+            html = f.read()
+        with open(os.path.splitext(path)[0] + ".json", 'r', encoding='utf-8') as f:
+            expected = [tjpr_listing.ListingRow(tuple(row['celulas']), row['caminho']) for row in json.load(f)]
+        name = os.path.basename(path)
+        # A varredura antiga toma <tr> de tabelas de layout por linhas (listagem_aninhada) e não é conferida
+        for label, parse in parsers[1:]:
+            if parse(html) != expected:
+                print(f"DIVERGÊNCIA: {label} em {name}")
+                failures += 1
+        pages[name] = html
+    print(f"{len(pages)} fixtures conferidas, {failures} divergências\n")
+
+    portal = FakePortal(editions=num_rows, per_page=num_rows)
+    pages[f"portal falso ({num_rows} linhas)"] = portal.listing_html(1)
+
+    for name, html in pages.items():
+        print(f"{name} ({len(html) / 1024:.1f} KB)")
+        baseline = None
+        for label, parse in parsers:
+            elapsed, rows = _rate(parse, html, repeat)
+            baseline = baseline or elapsed
+            print(f"  {label:<24} {elapsed * 1000:8.2f} ms/página  {rows / elapsed:10.0f} linhas/s  "
+                  f"{baseline / elapsed:5.1f}x")
+    return failures == 0
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,123 @@
+"""Compara o fluxo em duas etapas (baixar tudo, depois processar) com o ProcessingPipeline, que
+processa cada PDF assim que o download termina; as duas execuções usam o mesmo pool de extração.
+O portal falso (fake_portal) serve os PDFs reais dados em --pdfs, em rodízio, com a latência e a
+banda pedidas; as saídas dos dois fluxos são conferidas.
+
+Uso: python benchmark_pipeline.py --pdfs=a.pdf,b.pdf [--editions=6] [--concurrency=2] [--process-workers=1]
+                                  [--queue-size=2] [--latency=0.2] [--bandwidth-kb=32] [--backend=pdfplumber]
+"""
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmark_downloads import _get_option, load_autodownloader
+from download_pipeline import DEFAULT_QUEUE_SIZE, ProcessingPipeline
+from fake_portal import FakePortal
+
+# O downloader automático configura o logging no console antes do document_processor (que loga em arquivo)
+autodownloader = load_autodownloader()
+import document_processor  # noqa: E402
+
+DIRECTORIES = ['00 - para leitura', '01 - arquivos lidos', '02 - arquivos com leilões', '03 - arquivos com decretos']
+
+
+def _prepare(base_dir):
+    for name in DIRECTORIES:
+        os.makedirs(os.path.join(base_dir, name))
+    document_processor.BASE_DIR = base_dir
+    # Repositório de PDFs próprio de cada execução, fora do repositório local do usuário
+    document_processor.STORE_DIR = os.path.join(base_dir, "pdfs")
+    return os.path.join(base_dir, DIRECTORIES[0])
+
+
+def _outputs(base_dir):
+    """Conteúdo dos .txt gerados (os nomes podem mudar com edições repetidas, o conteúdo não)"""
+    contents = []
+    for root, _, files in os.walk(base_dir):
+        for name in files:
+            if name.endswith('.txt') and name != 'processing_log.txt':
+                with open(os.path.join(root, name), 'r', encoding='utf-8') as f:
+                    contents.append(f.read())
+    return sorted(contents)
+
+
+def main():
+    pdfs = _get_option("pdfs", "")
+    if not pdfs:
+        print(__doc__)
+        return
+    pdf_files = pdfs.split(",")
+    num_editions = _get_option("editions", 2 * len(pdf_files))
+    concurrency = _get_option("concurrency", 2)
+    process_workers = _get_option("process-workers", 1)
+    queue_size = _get_option("queue-size", DEFAULT_QUEUE_SIZE)
+    latency = _get_option("latency", 0.2)
+    bandwidth = _get_option("bandwidth-kb", 32) * 1024
+    backend = _get_option("backend", "pdfplumber")
+    options = dict(force=True, cache=None, metrics_log=None, backend=backend)
+
+    # Só avisos no console: o processamento loga cada PDF no logger raiz
+    logging.getLogger().setLevel(logging.WARNING)
+    work_dir = tempfile.mkdtemp(prefix="benchmark_pipeline_")
+    portal = FakePortal(editions=num_editions, per_page=10, latency=latency, bandwidth=bandwidth,
+                        pdf_files=pdf_files).start()
+    stdout, stderr = sys.stdout, sys.stderr
+    try:
+        print(f"{num_editions} edições ({len(pdf_files)} PDFs em rodízio), latência {latency * 1000:.0f} ms, "
+              f"{bandwidth // 1024} KB/s por conexão, {concurrency} downloads e {process_workers} processos "
+              f"de extração\n")
+        # Esconde as mensagens e as barras de progresso do document_processor
+        sys.stdout = sys.stderr = open(os.devnull, 'w')
+
+        # Duas etapas: todos os downloads, depois todos os PDFs na extração
+        base_dir = os.path.join(work_dir, "duas_etapas")
+        read_directory = _prepare(base_dir)
+        downloader = autodownloader.DiarioDownloader(read_directory, os.path.join(base_dir, "script"),
+                                                     base_url=portal.base_url, concurrency=concurrency,
+                                                     store_dir=document_processor.STORE_DIR)
+        with ProcessingPipeline(process_workers, queue_size, **options) as pipeline:
+            start = time.perf_counter()
+            downloaded = downloader.check_and_download_new_editions()
+            download_elapsed = time.perf_counter() - start
+            start = time.perf_counter()
+            for edition in downloaded:
+                pipeline.submit(os.path.join(read_directory, edition['filename']))
+        process_elapsed = time.perf_counter() - start
+        sequential = _outputs(base_dir)
+
+        # Pipeline: cada PDF vai para a extração assim que termina de baixar
+        base_dir = os.path.join(work_dir, "pipeline")
+        downloader = autodownloader.DiarioDownloader(_prepare(base_dir), os.path.join(base_dir, "script"),
+                                                     base_url=portal.base_url, concurrency=concurrency,
+                                                     store_dir=document_processor.STORE_DIR)
+        start = time.perf_counter()
+        with ProcessingPipeline(process_workers, queue_size, **options) as pipeline:
+            downloader.check_and_download_new_editions(pipeline)
+        pipeline_elapsed = time.perf_counter() - start
+        overlapped = _outputs(base_dir)
+    finally:
+        if sys.stdout is not stdout:
+            sys.stdout.close()
+            sys.stdout, sys.stderr = stdout, stderr
+        portal.stop()
+
+    try:
+        print(f"download                 {download_elapsed:7.2f} s  ({len(downloaded)} PDFs)")
+        print(f"processamento            {process_elapsed:7.2f} s")
+        print(f"duas etapas (soma)       {download_elapsed + process_elapsed:7.2f} s")
+        print(f"pipeline                 {pipeline_elapsed:7.2f} s  (maior etapa: "
+              f"{max(download_elapsed, process_elapsed):.2f} s; downloads esperaram {pipeline.waited:.2f} s "
+              f"pela fila)")
+        print(f"\nGanho: {(download_elapsed + process_elapsed) / pipeline_elapsed:.2f}x; saídas "
+              + ("idênticas" if sequential == overlapped else "DIFERENTES"))
+        return sequential == overlapped
+    finally:
+        logging.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() in (None, True) else 1)
@@ -1,9 +1,27 @@
 import os
+import sys
+import time
 import shutil
 import pdfplumber
 import re
 import logging
+import tempfile
+import concurrent.futures
+import difflib
+import bisect
+from collections import namedtuple
 from tqdm import tqdm
+from keyword_classifier import KeywordClassifier, load_keywords
+from page_cache import PageTextCache, file_sha256
+from pdf_store import PdfStore, default_store_dir
+from memory_monitor import MemoryMonitor
+from metrics import MetricsLog, StageMetrics
+
+try:
+    # pypdfium2 é opcional; sem ele só o backend pdfplumber fica disponível
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
 
 # Configuração do caminho base
 BASE_DIR = r"C:\Users\manoel\OneDrive\AmbVir\ARQUIVOS\pdfai"
@@ -12,32 +30,273 @@ BASE_DIR = r"C:\Users\manoel\OneDrive\AmbVir\ARQUIVOS\pdfai"
 logging.basicConfig(filename=os.path.join(BASE_DIR, 'processing_log.txt'), level=logging.INFO,
                     format='%(asctime)s:%(levelname)s:%(message)s')
 
+# Geometria do recorte das colunas (frações da largura e da altura da página)
+COLUMN_SPLIT = 0.488
+CROP_TOP = 0.015
+CROP_BOTTOM = 0.96
+
+# Detecção do vão entre colunas: faixa da largura onde procurar e largura mínima do vão (pontos)
+GUTTER_SEARCH = (0.35, 0.65)
+GUTTER_MIN_WIDTH = 4
+# Fração da cobertura máxima abaixo da qual um ponto ainda conta como vão (linhas de largura total)
+GUTTER_NOISE_RATIO = 0.1
+
+# Versão do extrator; mudar sempre que a extração de texto mudar, para invalidar o cache de páginas
+EXTRACTOR_VERSION = f"pdfplumber-{pdfplumber.__version__}-1"
+PDFIUM_EXTRACTOR_VERSION = f"pypdfium2-{pdfium.version.PYPDFIUM_INFO}-1" if pdfium is not None else None
+
+# Cache do texto extraído de cada página; fica fora de BASE_DIR, que é sincronizado pelo OneDrive (um arquivo
+# SQLite de até 2 GB reenviado a cada gravação), em LOCALAPPDATA ou na pasta temporária. --cache-file=... muda o local.
+PAGE_CACHE_FILE = os.path.join(os.environ.get('LOCALAPPDATA') or tempfile.gettempdir(), 'pdfai',
+                               'cache_paginas.sqlite3')
+# Repositório de PDFs compartilhado com os downloaders, também fora de BASE_DIR (ver default_store_dir)
+STORE_DIR = default_store_dir()
+
+# Métricas por arquivo (tempo por etapa, páginas, caracteres, blocos), uma linha JSON por PDF
+METRICS_FILE = os.path.join(BASE_DIR, 'metricas_processamento.jsonl')
+
+# Quantidade de lotes de páginas por worker na extração paralela
+CHUNKS_PER_WORKER = 4
+
+# Classificador com o vocabulário original ('leilão', 'leilões')
+DEFAULT_CLASSIFIER = KeywordClassifier()
+
+MONTH_NUMBERS = {
+    'janeiro': '01', 'fevereiro': '02', 'março': '03', 'abril': '04',
+    'maio': '05', 'junho': '06', 'julho': '07', 'agosto': '08',
+    'setembro': '09', 'outubro': '10', 'novembro': '11', 'dezembro': '12'
+}
+
+DATE_PATTERN = re.compile(r'Curitiba, (\d{1,2}) de (\w+) de (\d{4})')
+NUMBER_PATTERN = re.compile(r'Edição nº (\d+)')
+MATERIA_PATTERN = re.compile(r'IDMATERIA\d+IDMATERIA')
+# Pontos de corte de extract_blocks (início de cada marcador, inclusive sobrepostos)
+MATERIA_SPLIT_PATTERN = re.compile(r'(?=IDMATERIA\d+IDMATERIA)')
+PAGE_MARKER_PATTERN = re.compile(r'- \d+ -')
+# Índice no preâmbulo (texto antes do primeiro marcador); sem marcador vai até o fim do texto
+INDEX_PATTERN = re.compile(r'(Índice de Publicação[\s\S]*?)(?=IDMATERIA|$)')
+
+# Substituições de preprocess_text, na ordem em que são aplicadas
+PREPROCESS_STEPS = [
+    (re.compile(r'Curitiba, \d{1,2} de \w+ de \d{4} - Edição nº \d+'), ''),
+    (re.compile(r'Diário Eletrônico do Tr[^\n]*'), ''),
+    (re.compile(r'ribunal de Justiça do Paraná'), ''),
+    (re.compile(r'- \d+ -'), ''),
+    (re.compile(r'\n-+\n'), '\n'),
+    (re.compile(r'\(\#Pag\) -'), ''),
+    (re.compile(r'\n+'), ' '),
+]
+# Trecho que cada padrão de PREPROCESS_STEPS exige; sem ele a substituição não muda nada
+PREPROCESS_LITERALS = ['Curitiba, ', 'Diário Eletrônico do Tr', 'ribunal de Justiça do Paraná', '- ', '\n-', '(#Pag) -',
+                       '\n']
+
+# Varredura única do limpador: uma alternância plana encontra o ruído (cabeçalhos, rodapés,
+# marcadores de página, linhas de hífens e quebras de linha duplas) e os tokens mantidos e registrados
+# (marcadores IDMATERIA, datas e números de edição). Sem grupos de captura o re mantém a busca rápida
+# pelo primeiro caractere; o tipo do token é decidido pelo seu início.
+CLEAN_PATTERN = re.compile(
+    r'Curitiba, \d{1,2} de \w+ de \d{4}(?: - Edição nº \d+)?'
+    r'|IDMATERIA\d+IDMATERIA'
+    r'|Edição nº \d+'
+    r'|\n(?:\n|-+\n)|- \d+ -|\(\#Pag\) -|ribunal de Justiça do Paraná|Diário Eletrônico do Tr[^\n]*'
+)
+# Texto bruto, de cada lado de um trecho de ruído reescrito, conferido contra preprocess_text; cobre o
+# maior prefixo fixo de um padrão que uma remoção pode formar ao juntar os dois lados
+SEAM_WINDOW = 80
+
+# Metadados lidos pela sondagem do início do diário
+EditionProbe = namedtuple('EditionProbe', ['pub_date', 'pub_number', 'index_text', 'pages_read', 'elapsed'])
+
+# Páginas lidas no máximo pela sondagem à procura do fim do índice (primeiro IDMATERIA)
+PROBE_MAX_PAGES = 3
+# O cabeçalho sai igual nos dois backends; o PDFium abre a primeira página em milissegundos
+PROBE_BACKEND = 'pdfium' if pdfium is not None else 'pdfplumber'
+
+CleanedText = namedtuple('CleanedText', ['text', 'pub_date', 'pub_number', 'materia_offsets'])
+
+# Retorno de process_single_file para um PDF ignorado porque a edição já foi processada; conta como sucesso
+SKIPPED = 'ignorado'
+
+def format_publication_date(day, month, year):
+    return f"{day.zfill(2)}/{MONTH_NUMBERS.get(month.lower(), '00')}/{year}"
+
 def extract_publication_date(text):
-    match = re.search(r'Curitiba, (\d{1,2}) de (\w+) de (\d{4})', text)
+    match = DATE_PATTERN.search(text)
     if match:
-        day, month, year = match.groups()
-        month_number = {
-            'janeiro': '01', 'fevereiro': '02', 'março': '03', 'abril': '04',
-            'maio': '05', 'junho': '06', 'julho': '07', 'agosto': '08',
-            'setembro': '09', 'outubro': '10', 'novembro': '11', 'dezembro': '12'
-        }.get(month.lower(), '00')
-        return f"{day.zfill(2)}/{month_number}/{year}"
+        return format_publication_date(*match.groups())
     return "Data não encontrada"
 
 def extract_publication_number(text):
-    match = re.search(r'Edição nº (\d+)', text)
+    match = NUMBER_PATTERN.search(text)
     return match.group(1) if match else "Número não encontrado"
 
+def extract_index(preamble):
+    """Texto do índice no preâmbulo; o mesmo critério no processamento completo, no streaming e na sondagem"""
+    index_match = INDEX_PATTERN.search(preamble)
+    return index_match.group(1).strip() if index_match else None
+
 def preprocess_text(text):
-    text = re.sub(r'Curitiba, \d{1,2} de \w+ de \d{4} - Edição nº \d+', '', text)
-    text = re.sub(r'Diário Eletrônico do Tr[^\n]*', '', text)
-    text = re.sub(r'ribunal de Justiça do Paraná', '', text)
-    text = re.sub(r'- \d+ -', '', text)
-    text = re.sub(r'\n-+\n', '\n', text)
-    text = re.sub(r'\(\#Pag\) -', '', text)
-    text = re.sub(r'\n+', ' ', text)
+    for pattern, replacement in PREPROCESS_STEPS:
+        text = pattern.sub(replacement, text)
     return text
 
+def _clean_noise(noise):
+    """Limpa um trecho de ruído; quebras de linha puras evitam as sete substituições"""
+    if not noise.strip('\n'):
+        return ' '
+    return preprocess_text(noise)
+
+def clean_text(text):
+    """Equivalente a preprocess_text em uma única varredura.
+
+    Tokens de ruído vizinhos, junto com as quebras de linha e hífens entre eles, formam um trecho
+    que é reescrito como preprocess_text faria; quebras de linha isoladas viram espaço. Na mesma
+    passada registra a data e o número da publicação (None se ausentes) e as posições dos
+    marcadores IDMATERIA no texto limpo. Quando uma remoção junta pedaços que formam outro padrão
+    (ex.: "-" + cabeçalho removido + " 5 -"), o texto é limpo de novo pelo caminho antigo.
+    """
+    parts = []
+    # Trechos de ruído reescritos: início e fim no texto bruto, início e fim no texto limpo e se o trecho é
+    # só de quebras de linha
+    rewritten = []
+    length = 0
+    last_end = 0
+    noise = noise_start = None
+    pub_date = pub_number = None
+    materia_offsets = []
+
+    def emit(chunk):
+        nonlocal length
+        parts.append(chunk)
+        length += len(chunk)
+
+    def emit_noise(noise, raw_end):
+        start = length
+        emit(_clean_noise(noise))
+        rewritten.append((noise_start, raw_end, start, length, not noise.strip('\n')))
+
+    while match := CLEAN_PATTERN.search(text, last_end):
+        start, end = match.span()
+        # Em "(#Pag) - 5 -" preprocess_text remove primeiro o marcador de página, que usa o mesmo hífen
+        if text[start] == '(' and (page_marker := PAGE_MARKER_PATTERN.match(text, end - 1)):
+            end = page_marker.end()
+        gap = text[last_end:start]
+        token = text[start:end]
+        last_end = end
+
+        first = token[0]
+        is_noise = first not in 'CIE' or ' - Edição nº ' in token
+        if is_noise:
+            if pub_date is None and 'Curitiba' in token and (date_match := DATE_PATTERN.search(token)):
+                pub_date = format_publication_date(*date_match.groups())
+            if pub_number is None and 'Edição' in token and (number_match := NUMBER_PATTERN.search(token)):
+                pub_number = number_match.group(1)
+
+        if noise is not None:
+            if is_noise and not gap.strip('\n-'):
+                noise += gap + token
+                continue
+            # Quebras de linha e hífens logo após o ruído fazem parte do mesmo trecho
+            head = len(gap) - len(gap.lstrip('\n-'))
+            emit_noise(noise + gap[:head], start - len(gap) + head)
+            gap = gap[head:]
+            noise = None
+
+        if is_noise:
+            tail = len(gap.rstrip('\n-'))
+            emit(gap[:tail].replace('\n', ' '))
+            noise = gap[tail:] + token
+            noise_start = start - len(gap) + tail
+            continue
+
+        emit(gap.replace('\n', ' '))
+        if first == 'I':
+            materia_offsets.append(length)
+        elif first == 'C':
+            if pub_date is None:
+                pub_date = format_publication_date(*DATE_PATTERN.match(token).groups())
+            # O nome do mês (\w+) pode engolir marcadores colados a ele
+            if 'IDMATERIA' in token:
+                materia_offsets.extend(length + match.start() for match in MATERIA_SPLIT_PATTERN.finditer(token))
+        elif pub_number is None:
+            pub_number = NUMBER_PATTERN.match(token).group(1)
+        emit(token)
+
+    gap = text[last_end:]
+    if noise is not None:
+        head = len(gap) - len(gap.lstrip('\n-'))
+        emit_noise(noise + gap[:head], last_end + head)
+        gap = gap[head:]
+    emit(gap.replace('\n', ' '))
+    cleaned = ''.join(parts)
+    if not _rewrites_agree(text, cleaned, rewritten):
+        return _clean_text_multipass(text)
+
+    # Um marcador seguido de dígitos e outro IDMATERIA forma um segundo marcador sobreposto,
+    # que o re.split com lookahead de extract_blocks também considera
+    overlapping = []
+    for offset in materia_offsets:
+        while (match := MATERIA_PATTERN.match(cleaned, offset)) and \
+                MATERIA_PATTERN.match(cleaned, match.end() - len('IDMATERIA')):
+            offset = match.end() - len('IDMATERIA')
+            overlapping.append(offset)
+    if overlapping:
+        materia_offsets = sorted(set(materia_offsets + overlapping))
+    return CleanedText(cleaned, pub_date, pub_number, materia_offsets)
+
+def _rewrites_agree(text, cleaned, rewritten):
+    """Confere se nenhuma remoção juntou pedaços que formam outro padrão (de ruído ou IDMATERIA).
+
+    Fora dos trechos de ruído o texto limpo corresponde caractere a caractere ao bruto, então para cada
+    grupo de trechos próximos preprocess_text sobre o texto bruto em volta deles, com até SEAM_WINDOW de
+    cada lado, deve dar exatamente o texto limpo correspondente; e nenhum marcador pode atravessar as
+    pontas de um trecho reescrito, o que só acontece quando a remoção o formou. Trechos só de quebras de
+    linha não juntam padrões (nenhum atravessa uma linha em branco) e limitam a janela.
+    """
+    previous_end = 0
+    i = 0
+    while i < len(rewritten):
+        raw_start, _, out_start, _, blank = rewritten[i]
+        if blank:
+            previous_end = rewritten[i][1]
+            i += 1
+            continue
+        first = i
+        while i + 1 < len(rewritten) and not rewritten[i + 1][4] and \
+                rewritten[i + 1][0] - rewritten[i][1] < 2 * SEAM_WINDOW:
+            i += 1
+        _, raw_end, _, out_end, _ = rewritten[i]
+        next_start = rewritten[i + 1][0] if i + 1 < len(rewritten) else len(text)
+        left = min(SEAM_WINDOW, raw_start - previous_end)
+        right = min(SEAM_WINDOW, next_start - raw_end)
+        previous_end = raw_end
+        i += 1
+
+        window = text[raw_start - left:raw_end + right]
+        for (pattern, replacement), literal in zip(PREPROCESS_STEPS, PREPROCESS_LITERALS):
+            if literal in window:
+                window = pattern.sub(replacement, window)
+        if window != cleaned[out_start - left:out_end + right]:
+            return False
+        if 'IDMATERIA' not in window:
+            continue
+        for _, _, chunk_start, chunk_end, _ in rewritten[first:i]:
+            for match in MATERIA_SPLIT_PATTERN.finditer(cleaned, max(0, chunk_start - SEAM_WINDOW)):
+                if match.start() >= chunk_end:
+                    break
+                if MATERIA_PATTERN.match(cleaned, match.start()).end() > chunk_start:
+                    return False
+    return True
+
+def _clean_text_multipass(text):
+    """clean_text pelo caminho antigo: preprocess_text, extract_publication_* e os cortes de extract_blocks"""
+    cleaned = preprocess_text(text)
+    date_match = DATE_PATTERN.search(text)
+    number_match = NUMBER_PATTERN.search(text)
+    return CleanedText(cleaned, format_publication_date(*date_match.groups()) if date_match else None,
+                       number_match.group(1) if number_match else None,
+                       [match.start() for match in MATERIA_SPLIT_PATTERN.finditer(cleaned)])
+
 def extract_blocks(text):
     blocks = re.split(r'(?=IDMATERIA\d+IDMATERIA)', text)
     result = []
@@ -48,137 +307,1365 @@ def extract_blocks(text):
             result.append((id_materia, content.strip()))
     return result
 
-def classify_blocks(blocks, keywords=['leilão', 'leilões']):
+def blocks_from_offsets(text, materia_offsets):
+    """Mesmo resultado de extract_blocks usando as posições registradas por clean_text"""
+    result = []
+    ends = materia_offsets[1:] + [len(text)]
+    for start, end in zip(materia_offsets, ends):
+        match = MATERIA_PATTERN.match(text, start, end)
+        if match:
+            result.append((match.group(), text[match.end():end].strip()))
+    return result
+
+class BlockSpan:
+    """Bloco como posições no texto limpo: marcador IDMATERIA em [id_start, id_end) e conteúdo, já sem
+    espaços nas pontas, em [start, end). As strings só são criadas na escrita."""
+    __slots__ = ('id_start', 'id_end', 'start', 'end')
+
+    def __init__(self, id_start, id_end, start, end):
+        self.id_start = id_start
+        self.id_end = id_end
+        self.start = start
+        self.end = end
+
+    def id_materia(self, text):
+        return text[self.id_start:self.id_end]
+
+    def content(self, text):
+        return text[self.start:self.end]
+
+def block_spans(text, materia_offsets):
+    """Mesmos blocos de blocks_from_offsets, como BlockSpan sobre text em vez de cópias"""
+    spans = []
+    ends = materia_offsets[1:] + [len(text)]
+    for offset, end in zip(materia_offsets, ends):
+        match = MATERIA_PATTERN.match(text, offset, end)
+        if not match:
+            continue
+        # Equivalente ao strip() sem copiar o trecho
+        start = match.end()
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        spans.append(BlockSpan(offset, match.end(), start, end))
+    return spans
+
+def classify_blocks(blocks, keywords=None, classifier=None):
+    """Separa leilões e decretos; keywords aceita lista de termos ou dicionário {termo: peso}"""
+    if classifier is None:
+        classifier = KeywordClassifier(keywords) if keywords is not None else DEFAULT_CLASSIFIER
     leiloes, decretos = [], []
-    for id_materia, block in blocks:
-        if any(keyword in block.lower() for keyword in keywords):
+    results = classifier.classify_batch([block for _, block in blocks])
+    for (id_materia, block), (is_auction, _) in zip(blocks, results):
+        if is_auction:
             leiloes.append((id_materia, block))
         else:
             decretos.append((id_materia, block))
     return leiloes, decretos
 
-def write_blocks_to_file(blocks, filepath, pub_date, pub_number):
-    with open(filepath, 'w', encoding='utf-8') as file:
-        for block_number, (id_materia, block) in enumerate(blocks, 1):
-            id_number = id_materia.replace('IDMATERIA', '')
-            header = f"""************************************************************
+def classify_block_spans(text, spans, classifier=None):
+    """classify_blocks para BlockSpan: uma varredura sobre o texto inteiro; retorna (leilões, decretos)"""
+    classifier = classifier or DEFAULT_CLASSIFIER
+    leiloes, decretos = [], []
+    for span, (is_auction, _) in zip(spans, classifier.classify_spans(text, spans)):
+        (leiloes if is_auction else decretos).append(span)
+    return leiloes, decretos
+
+def write_block(file, block_number, id_materia, block, pub_date, pub_number):
+    id_number = id_materia.replace('IDMATERIA', '')
+    header = f"""************************************************************
 ID: {id_number}
 Data Pub.: {pub_date}
 Número Pub.: {pub_number}
 Número Bloco: {block_number:05d}
 
 """
-            file.write(header)
-            file.write(block + '\n\n')
+    file.write(header)
+    file.write(block + '\n\n')
+
+def write_full_text_header(file, pub_date, pub_number, index_text):
+    file.write(f"Data de Publicação: {pub_date}\n")
+    file.write(f"Número da Publicação: {pub_number}\n\n")
+    file.write("ÍNDICE\n")
+    file.write(f"{index_text}\n\n")
+    file.write("************************************************************\n\n")
+
+def write_spans_to_file(text, spans, filepath, pub_date, pub_number):
+    """write_blocks_to_file para BlockSpan; cada bloco é copiado só no momento da escrita"""
+    with open(filepath, 'w', encoding='utf-8') as file:
+        for block_number, span in enumerate(spans, 1):
+            write_block(file, block_number, span.id_materia(text), span.content(text), pub_date, pub_number)
+
+def write_blocks_to_file(blocks, filepath, pub_date, pub_number):
+    with open(filepath, 'w', encoding='utf-8') as file:
+        for block_number, (id_materia, block) in enumerate(blocks, 1):
+            write_block(file, block_number, id_materia, block, pub_date, pub_number)
+
+def extract_page_columns(page):
+    """Extrai o texto das colunas esquerda e direita de uma página"""
+    largura = page.width
+    coluna_esquerda = page.crop((0, page.height * CROP_TOP, largura * COLUMN_SPLIT, page.height * CROP_BOTTOM))
+    coluna_direita = page.crop((largura * COLUMN_SPLIT, page.height * CROP_TOP, largura, page.height * CROP_BOTTOM))
+    texto_esquerda = coluna_esquerda.extract_text() or ''
+    texto_direita = coluna_direita.extract_text() or ''
+    return texto_esquerda, texto_direita
+
+def find_column_gutter(chars, width):
+    """Procura o vão entre as colunas na distribuição horizontal dos caracteres.
 
-def process_pdf_file(pdf_path):
-    text = ''
+    Cada ponto da largura conta quantos caracteres o cobrem; pontos com contagem até
+    GUTTER_NOISE_RATIO do máximo contam como vazios, para que cabeçalhos e rodapés de largura
+    total não fechem o vão. Retorna o centro da faixa vazia mais larga na região central ou
+    None se não houver faixa de pelo menos GUTTER_MIN_WIDTH (página de coluna única).
+    """
+    bins = int(width) + 1
+    coverage = [0] * bins
+    for char in chars:
+        for x in range(max(0, int(char['x0'])), min(bins, int(char['x1']) + 1)):
+            coverage[x] += 1
+    threshold = max(coverage, default=0) * GUTTER_NOISE_RATIO
+
+    low, high = int(width * GUTTER_SEARCH[0]), min(bins, int(width * GUTTER_SEARCH[1]))
+    best_start, best_width = None, 0
+    run_start = None
+    # O x = high funciona como sentinela e fecha a última faixa vazia
+    for x in range(low, high + 1):
+        if x < high and coverage[x] <= threshold:
+            if run_start is None:
+                run_start = x
+            continue
+        if run_start is not None and x - run_start > best_width:
+            best_start, best_width = run_start, x - run_start
+        run_start = None
+    if best_start is None or best_width < GUTTER_MIN_WIDTH:
+        return None
+    return best_start + best_width / 2
+
+def extract_page_columns_gutter(page):
+    """Extrai as colunas lendo os caracteres da página uma única vez.
+
+    A divisão é feita no vão encontrado por find_column_gutter; páginas sem vão (como o índice)
+    vão inteiras para a coluna esquerda.
+    """
+    top, bottom = page.height * CROP_TOP, page.height * CROP_BOTTOM
+    # Mesmo recorte vertical do layout 'crop' (caracteres que tocam a faixa, aparados a ela);
+    # só os que cruzam a borda da faixa precisam ser aparados
+    band = (0, top, page.width, bottom)
+    chars = []
+    for char in page.chars:
+        if top <= char['top'] and char['bottom'] <= bottom:
+            chars.append(char)
+        elif char['bottom'] >= top and char['top'] <= bottom:
+            clipped = pdfplumber.utils.clip_obj(char, band)
+            if clipped:
+                chars.append(clipped)
+    gutter = find_column_gutter(chars, page.width)
+    if gutter is None:
+        left, right = chars, []
+        gutter = page.width
+    else:
+        left, right = [], []
+        for char in chars:
+            (left if (char['x0'] + char['x1']) / 2 < gutter else right).append(char)
+
+    def column_text(column_chars, x0, x1):
+        if not column_chars:
+            return ''
+        return pdfplumber.utils.chars_to_textmap(column_chars, layout_bbox=(x0, top, x1, bottom),
+                                                 layout_width=x1 - x0, layout_height=bottom - top).as_string
+
+    return column_text(left, 0, gutter), column_text(right, gutter, page.width)
+
+def extract_page_columns_pdfium(page):
+    """Extrai as colunas de uma página do pypdfium2 com o mesmo recorte de extract_page_columns.
+
+    O PDFium mede a altura a partir da base da página, por isso as frações do recorte são invertidas.
+    """
+    largura, altura = page.get_size()
+    textpage = page.get_textpage()
+    try:
+        top, bottom = altura * (1 - CROP_TOP), altura * (1 - CROP_BOTTOM)
+        texto_esquerda = textpage.get_text_bounded(0, bottom, largura * COLUMN_SPLIT, top)
+        texto_direita = textpage.get_text_bounded(largura * COLUMN_SPLIT, bottom, largura, top)
+    finally:
+        textpage.close()
+    return texto_esquerda.replace('\r\n', '\n'), texto_direita.replace('\r\n', '\n')
+
+def extract_page_text(page):
+    """Extrai o texto das duas colunas de uma página, esquerda antes da direita"""
+    texto_esquerda, texto_direita = extract_page_columns(page)
+    return texto_esquerda + ' ' + texto_direita
+
+# Layouts de extração das colunas: recorte fixo em COLUMN_SPLIT ou vão detectado por página
+EXTRACTION_LAYOUTS = {
+    'crop': extract_page_columns,
+    'gutter': extract_page_columns_gutter,
+}
+
+def extraction_variant(layout='crop', backend='pdfplumber'):
+    """Descreve como o texto é extraído; entra na chave do cache de páginas"""
+    if backend == 'pdfium':
+        return f"{PDFIUM_EXTRACTOR_VERSION}|crop={COLUMN_SPLIT},{CROP_TOP},{CROP_BOTTOM}"
+    if layout == 'gutter':
+        return (f"{EXTRACTOR_VERSION}|gutter={CROP_TOP},{CROP_BOTTOM},{GUTTER_SEARCH[0]},{GUTTER_SEARCH[1]},"
+                f"{GUTTER_MIN_WIDTH},{GUTTER_NOISE_RATIO}")
+    return f"{EXTRACTOR_VERSION}|crop={COLUMN_SPLIT},{CROP_TOP},{CROP_BOTTOM}"
+
+def processing_variant(auctions_only=False, layout='crop', backend='pdfplumber', classifier=None):
+    """Descreve as saídas do processamento e a configuração que as produziu; entra na chave com que o
+    repositório de PDFs marca o conteúdo já processado. Completo e streaming geram as mesmas saídas."""
+    mode = 'leiloes' if auctions_only else 'completo'
+    return f"{mode}|{extraction_variant(layout, backend)}|{(classifier or DEFAULT_CLASSIFIER).fingerprint()}"
+
+def _iter_pdfplumber_pages(pdf_path, start=0, end=None, layout='crop', release_pages=False, metrics=None):
+    extract_columns = EXTRACTION_LAYOUTS[layout]
+    opened = time.perf_counter()
+    with pdfplumber.open(pdf_path) as pdf:
+        pages = pdf.pages[start:end]
+        if metrics is not None:
+            metrics.add_time('abrir_pdf', time.perf_counter() - opened)
+        for page in pages:
+            columns = extract_columns(page)
+            if release_pages:
+                page.close()
+            yield columns
+
+def _iter_pdfium_pages(pdf_path, start=0, end=None, layout='crop', release_pages=False, metrics=None):
+    # O PDFium não mantém o layout das páginas; cada página é fechada logo após a extração
+    opened = time.perf_counter()
+    pdf = pdfium.PdfDocument(pdf_path)
+    if metrics is not None:
+        metrics.add_time('abrir_pdf', time.perf_counter() - opened)
+    try:
+        for index in range(start, len(pdf) if end is None else min(end, len(pdf))):
+            page = pdf[index]
+            try:
+                yield extract_page_columns_pdfium(page)
+            finally:
+                page.close()
+    finally:
+        pdf.close()
+
+# Backends de extração: geram (texto_esquerda, texto_direita) das páginas [start, end)
+PDF_BACKENDS = {
+    'pdfplumber': _iter_pdfplumber_pages,
+    'pdfium': _iter_pdfium_pages,
+}
+
+def check_backend(backend, layout='crop'):
+    """Valida a combinação de backend e layout; levanta ValueError se não for suportada"""
+    if backend not in PDF_BACKENDS:
+        raise ValueError(f"Backend desconhecido: {backend}. Opções: {', '.join(PDF_BACKENDS)}")
+    if layout not in EXTRACTION_LAYOUTS:
+        raise ValueError(f"Layout desconhecido: {layout}. Opções: {', '.join(EXTRACTION_LAYOUTS)}")
+    if backend == 'pdfium':
+        if pdfium is None:
+            raise ValueError("O backend 'pdfium' requer o pacote pypdfium2 (pip install pypdfium2).")
+        if layout != 'crop':
+            raise ValueError("O backend 'pdfium' só suporta o layout 'crop'.")
+
+def count_pages(pdf_path, backend='pdfplumber'):
+    if backend == 'pdfium':
+        pdf = pdfium.PdfDocument(pdf_path)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+    with pdfplumber.open(pdf_path) as pdf:
+        return len(pdf.pages)
+
+def _extract_page_range(pdf_path, start, end, layout='crop', backend='pdfplumber'):
+    """Worker: abre o PDF e extrai as colunas das páginas [start, end) em ordem"""
+    return list(PDF_BACKENDS[backend](pdf_path, start, end, layout=layout))
+
+def _split_page_range(num_pages, workers):
+    """Divide as páginas em lotes contíguos, alguns por worker para equilibrar a carga"""
+    chunk_size = max(1, -(-num_pages // (workers * CHUNKS_PER_WORKER)))
+    return [(start, min(start + chunk_size, num_pages)) for start in range(0, num_pages, chunk_size)]
+
+def _iter_columns_bounded(pdf_path, num_pages, memory, layout='crop', backend='pdfplumber', metrics=None):
+    """Modo de memória limitada: descarta cada página após a extração, lê o documento em janelas
+    de memory.page_window páginas e o reabre antes da próxima página quando o RSS passa do limite.
+    Reabrir não adianta se a memória não volta para baixo do limite; nesse caso o documento fica aberto
+    por pelo menos memory.reopen_interval páginas, que dobra a cada reabertura inútil."""
+    position = 0
+    while position < num_pages:
+        window_start = position
+        window_end = min(num_pages, position + memory.page_window) if memory.page_window else num_pages
+        pages = PDF_BACKENDS[backend](pdf_path, position, window_end, layout=layout, release_pages=True,
+                                      metrics=metrics)
+        try:
+            for columns in pages:
+                position += 1
+                rss = memory.sample()
+                yield columns
+                if memory.over_budget(rss) and position < num_pages and \
+                        position - window_start >= memory.reopen_interval:
+                    pages.close()
+                    memory.release(rss)
+                    break
+        finally:
+            pages.close()
+
+def _iter_columns_serial(pdf_path, release_pages=False, layout='crop', backend='pdfplumber', memory=None,
+                         metrics=None):
+    num_pages = count_pages(pdf_path, backend)
+    if memory is not None:
+        pages = _iter_columns_bounded(pdf_path, num_pages, memory, layout=layout, backend=backend, metrics=metrics)
+    else:
+        pages = PDF_BACKENDS[backend](pdf_path, layout=layout, release_pages=release_pages, metrics=metrics)
+    yield from tqdm(pages, total=num_pages, desc="Processing PDF", unit="page", leave=False)
+
+def _iter_columns_parallel(pdf_path, workers, layout='crop', backend='pdfplumber'):
+    """Extração multiprocesso; os lotes voltam na ordem das páginas"""
+    num_pages = count_pages(pdf_path, backend)
+    ranges = _split_page_range(num_pages, workers)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=min(workers, len(ranges) or 1)) as executor:
+        futures = [executor.submit(_extract_page_range, pdf_path, start, end, layout, backend)
+                   for start, end in ranges]
+        with tqdm(total=num_pages, desc="Processing PDF", unit="page", leave=False) as progress:
+            # Percorre os futures na ordem de submissão para manter a ordem das páginas
+            for future in futures:
+                page_columns = future.result()
+                yield from page_columns
+                progress.update(len(page_columns))
+
+def _timed_pages(source, metrics):
+    """Mede o tempo de obtenção de cada página (etapa 'extracao', que inclui 'abrir_pdf') e conta
+    páginas e caracteres brutos"""
+    source = iter(source)
+    while True:
+        start = time.perf_counter()
+        columns = next(source, None)
+        if columns is None:
+            return
+        elapsed = time.perf_counter() - start
+        metrics.add_time('extracao', elapsed)
+        metrics.observe('pagina_segundos', elapsed)
+        metrics.count('paginas')
+        metrics.count('caracteres_brutos', len(columns[0]) + len(columns[1]))
+        yield columns
+
+def iter_page_columns(pdf_path, workers=1, cache=None, release_pages=False, layout='crop', backend='pdfplumber',
+                      memory=None, metrics=None, sha256=None):
+    """Gera (texto_esquerda, texto_direita) de cada página em ordem.
+
+    Com cache, um acerto dispensa a extração; numa falha cada página extraída é gravada no cache. sha256,
+    se quem chama já calculou o hash do PDF, é reaproveitado na chave do cache.
+    Com um MemoryMonitor a extração serial roda no modo de memória limitada e o pico de RSS vai para o log.
+    Com StageMetrics o tempo de cada página é registrado.
+    """
+    doc_key = None
+    if cache is not None:
+        variant = extraction_variant(layout, backend)
+        doc_key, sha256 = cache.document_key(pdf_path, variant, sha256)
+        if cache.has(doc_key):
+            logging.info(f"Texto de {os.path.basename(pdf_path)} lido do cache de páginas.")
+            pages = cache.iter_pages(doc_key)
+            if metrics is not None:
+                metrics.count('cache_acertos')
+                pages = _timed_pages(pages, metrics)
+            yield from pages
+            return
+        cache.begin(doc_key, sha256, variant, os.path.basename(pdf_path))
+
+    if workers > 1:
+        if memory is not None:
+            # Cada lote já é lido por um processo que abre e fecha o documento
+            logging.warning("Modo de memória limitada ignorado na extração paralela de páginas.")
+            memory = None
+        source = _iter_columns_parallel(pdf_path, workers, layout=layout, backend=backend)
+    else:
+        if memory is not None:
+            memory.reset()
+        source = _iter_columns_serial(pdf_path, release_pages=release_pages, layout=layout, backend=backend,
+                                      memory=memory, metrics=metrics)
+    if metrics is not None:
+        source = _timed_pages(source, metrics)
+
+    num_pages = 0
+    for columns in source:
+        if doc_key is not None:
+            cache.store_page(doc_key, num_pages, *columns)
+        num_pages += 1
+        yield columns
+
+    if doc_key is not None:
+        cache.finish(doc_key, num_pages)
+    if memory is not None:
+        memory.log_peak(os.path.basename(pdf_path))
+
+def iter_page_texts(pdf_path, release_pages=False, workers=1, cache=None, layout='crop', backend='pdfplumber',
+                    memory=None, metrics=None, sha256=None):
+    """Gera o texto de cada página em ordem; release_pages descarta o layout da página após a extração"""
+    for texto_esquerda, texto_direita in iter_page_columns(pdf_path, workers=workers, cache=cache,
+                                                          release_pages=release_pages, layout=layout,
+                                                          backend=backend, memory=memory, metrics=metrics,
+                                                          sha256=sha256):
+        yield texto_esquerda + ' ' + texto_direita
+
+def process_pdf_file(pdf_path, workers=1, cache=None, layout='crop', backend='pdfplumber', memory=None,
+                     metrics=None, sha256=None):
+    """Extrai o texto do PDF; com workers > 1 as páginas são divididas entre processos.
+
+    backend escolhe o motor de extração ('pdfplumber' ou 'pdfium'); ver PDF_BACKENDS. memory (MemoryMonitor)
+    ativa o modo de memória limitada e metrics (StageMetrics) registra o tempo de cada página.
+    """
+    parts = []
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in tqdm(pdf.pages, desc="Processing PDF", unit="page", leave=False):
-                largura = page.width
-                coluna_esquerda = page.crop((0, page.height * 0.015, largura * 0.488, page.height * 0.96))
-                coluna_direita = page.crop((largura * 0.488, page.height * 0.015, largura, page.height * 0.96))
-                texto_esquerda = coluna_esquerda.extract_text() or ''
-                texto_direita = coluna_direita.extract_text() or ''
-                text += texto_esquerda + ' ' + texto_direita
+        for page_text in iter_page_texts(pdf_path, workers=workers, cache=cache, layout=layout, backend=backend,
+                                         memory=memory, metrics=metrics, sha256=sha256):
+            parts.append(page_text)
     except Exception as e:
         logging.error(f"Erro ao processar o arquivo PDF: {e}")
-    return text
+    return ''.join(parts)
+
+def benchmark_extraction(pdf_path, worker_counts=(1, 2, 4, 8), layout='crop', backend='pdfplumber'):
+    """Mede páginas/segundo para cada quantidade de workers e confere a saída com a serial"""
+    num_pages = count_pages(pdf_path, backend)
+
+    reference = None
+    results = []
+    for workers in worker_counts:
+        start = time.perf_counter()
+        text = process_pdf_file(pdf_path, workers=workers, layout=layout, backend=backend)
+        elapsed = time.perf_counter() - start
+        if reference is None:
+            reference = text
+        identical = text == reference
+        pages_per_second = num_pages / elapsed if elapsed else 0.0
+        results.append((workers, elapsed, pages_per_second, identical))
+        print(f"workers={workers:2d}  tempo={elapsed:8.2f}s  páginas/s={pages_per_second:8.2f}  "
+              f"idêntico={'sim' if identical else 'NÃO'}")
+    return results
+
+def benchmark_layouts(pdf_path):
+    """Compara o tempo por página dos layouts de extração e conta as páginas com texto diferente do 'crop'"""
+    timings = {layout: 0.0 for layout in EXTRACTION_LAYOUTS}
+    differing = []
+    with pdfplumber.open(pdf_path) as pdf:
+        num_pages = len(pdf.pages)
+        for number, page in enumerate(tqdm(pdf.pages, desc="Comparando layouts", unit="page", leave=False), 1):
+            columns = {}
+            for layout, extract_columns in EXTRACTION_LAYOUTS.items():
+                start = time.perf_counter()
+                columns[layout] = extract_columns(page)
+                timings[layout] += time.perf_counter() - start
+                # Descarta o layout em cache para que cada modo pague a própria leitura da página
+                page.flush_cache()
+            if any(value != columns['crop'] for value in columns.values()):
+                differing.append(number)
+            page.close()
+
+    for layout, elapsed in timings.items():
+        per_page = elapsed / num_pages * 1000 if num_pages else 0.0
+        print(f"layout={layout:7s}  tempo={elapsed:8.2f}s  ms/página={per_page:8.2f}")
+    print(f"Páginas com texto diferente do 'crop': {len(differing)}/{num_pages}"
+          + (f" ({', '.join(map(str, differing[:20]))}{'...' if len(differing) > 20 else ''})" if differing else ""))
+    return timings, differing
+
+def _materia_ids(text):
+    """Sequência dos marcadores IDMATERIA que sobrevivem à limpeza, na ordem do texto"""
+    cleaned = clean_text(text)
+    return [cleaned.text[start:end] for start, end in
+            (MATERIA_PATTERN.match(cleaned.text, offset).span() for offset in cleaned.materia_offsets
+             if MATERIA_PATTERN.match(cleaned.text, offset))]
+
+def benchmark_backends(pdf_paths, backends=None):
+    """Compara os backends disponíveis nos mesmos diários.
+
+    Para cada backend informa páginas/segundo, a fração de páginas cujo texto difere do pdfplumber,
+    a semelhança média do texto dessas páginas e se a sequência de IDMATERIA após a limpeza é a mesma.
+    """
+    if backends is None:
+        backends = [backend for backend in PDF_BACKENDS if backend != 'pdfium' or pdfium is not None]
+    reference_backend = backends[0]
+    totals = {backend: {'paginas': 0, 'tempo': 0.0, 'diferentes': 0, 'semelhanca': 0.0, 'idmateria_ok': 0}
+              for backend in backends}
+
+    for pdf_path in pdf_paths:
+        pages, ids = {}, {}
+        for backend in backends:
+            start = time.perf_counter()
+            pages[backend] = [left + ' ' + right for left, right in PDF_BACKENDS[backend](pdf_path)]
+            totals[backend]['tempo'] += time.perf_counter() - start
+            totals[backend]['paginas'] += len(pages[backend])
+            ids[backend] = _materia_ids(''.join(pages[backend]))
+
+        reference = pages[reference_backend]
+        for backend in backends:
+            for page_text, reference_text in zip(pages[backend], reference):
+                if page_text != reference_text:
+                    totals[backend]['diferentes'] += 1
+                    totals[backend]['semelhanca'] += difflib.SequenceMatcher(
+                        None, page_text, reference_text, autojunk=False).ratio()
+            same_ids = ids[backend] == ids[reference_backend]
+            totals[backend]['idmateria_ok'] += same_ids
+            print(f"{os.path.basename(pdf_path)}  backend={backend:10s}  páginas={len(pages[backend])}  "
+                  f"IDMATERIA={len(ids[backend])}  {'iguais' if same_ids else 'DIFERENTES'}")
+
+    for backend, total in totals.items():
+        pages_per_second = total['paginas'] / total['tempo'] if total['tempo'] else 0.0
+        diff_rate = total['diferentes'] / total['paginas'] if total['paginas'] else 0.0
+        similarity = total['semelhanca'] / total['diferentes'] if total['diferentes'] else 1.0
+        print(f"backend={backend:10s}  páginas/s={pages_per_second:8.2f}  páginas diferentes={diff_rate:7.2%}  "
+              f"semelhança média={similarity:6.3f}  IDMATERIA iguais={total['idmateria_ok']}/{len(pdf_paths)}")
+    return totals
+
+def _opens_chunk(line):
+    """Se a linha completa line pode abrir um trecho limpo à parte.
+
+    Nenhum padrão de preprocess_text atravessa uma quebra de linha, exceto a linha só de hífens e as
+    quebras de linha seguidas; se a linha não some na limpeza nem vira só hífens, limpar o texto antes
+    dela e o texto a partir dela separadamente dá o mesmo resultado que limpar tudo junto.
+    """
+    for pattern, replacement in PREPROCESS_STEPS[:4]:
+        line = pattern.sub(replacement, line)
+    if not line.strip('-'):
+        return False
+    return bool(PREPROCESS_STEPS[5][0].sub('', line))
+
+def _clean_cut(raw):
+    """Início da última linha completa de raw que pode abrir um trecho limpo à parte; 0 se não houver"""
+    end = raw.rfind('\n')
+    while end > 0:
+        start = raw.rfind('\n', 0, end) + 1
+        if start and _opens_chunk(raw[start:end]):
+            return start
+        end = start - 1
+    return 0
+
+def _iter_raw_chunks(page_texts):
+    """Junta o texto bruto das páginas e gera trechos que clean_text limpa igual ao texto inteiro.
+
+    O final de cada página (em geral a última linha, que continua na página seguinte) fica retido até
+    aparecer uma linha em que o texto pode ser cortado.
+    """
+    raw = ''
+    for page_text in page_texts:
+        raw += page_text
+        cut = _clean_cut(raw)
+        if cut:
+            yield raw[:cut]
+            raw = raw[cut:]
+    if raw:
+        yield raw
+
+def iter_cleaned_segments(page_texts, metadata, metrics=None):
+    """Limpa o texto página a página e gera cada segmento entre marcadores IDMATERIA assim que ele se completa.
+
+    O primeiro segmento gerado é o preâmbulo (índice), mesmo que vazio. Os segmentos são os mesmos do
+    texto inteiro limpo de uma vez: o texto é limpo em trechos cortados só onde nenhuma substituição
+    atravessa o corte (_iter_raw_chunks), e os marcadores de cada trecho vêm de clean_text, sem varrer de
+    novo o bloco em aberto. Data e número da publicação são gravados em metadata assim que aparecem no
+    texto bruto.
+    """
+    metrics = metrics or StageMetrics()
+    # Texto limpo do segmento em aberto, desde o último marcador
+    pending = []
+    preamble_done = False
+    for chunk in _iter_raw_chunks(page_texts):
+        with metrics.stage('limpeza'):
+            cleaned = clean_text(chunk)
+        text = cleaned.text
+        metrics.count('caracteres', len(text))
+        if 'pub_date' not in metadata and cleaned.pub_date:
+            metadata['pub_date'] = cleaned.pub_date
+        if 'pub_number' not in metadata and cleaned.pub_number:
+            metadata['pub_number'] = cleaned.pub_number
+
+        starts = cleaned.materia_offsets
+        if not starts:
+            pending.append(text)
+            continue
+        pending.append(text[:starts[0]])
+        segment = ''.join(pending)
+        if not preamble_done or segment:
+            yield segment
+        preamble_done = True
+        # O último marcador ainda pode receber texto das próximas páginas
+        for start, end in zip(starts, starts[1:]):
+            yield text[start:end]
+        pending = [text[starts[-1]:]]
+
+    segment = ''.join(pending)
+    if not preamble_done or segment:
+        yield segment
+
+def stream_edition(page_texts, full_text_path, leiloes_directory, decretos_directory, output_path=lambda path: path,
+                   classifier=None, metrics=None):
+    """Limpa, classifica e grava cada bloco assim que ele se completa; retorna data, número e contagem de blocos"""
+    classifier = classifier or DEFAULT_CLASSIFIER
+    metrics = metrics or StageMetrics()
+    metadata = {}
+    segments = iter_cleaned_segments(page_texts, metadata, metrics)
 
+    preamble = next(segments, '')
+    pub_date = metadata.get('pub_date', "Data não encontrada")
+    pub_number = metadata.get('pub_number', "Número não encontrado")
+    index_text = extract_index(preamble) or "Índice não encontrado"
 
-def process_single_file(selected_file):
+    leiloes_path = output_path(os.path.join(leiloes_directory, f'Leilões_{pub_date.replace("/", "_")}.txt'))
+    decretos_path = output_path(os.path.join(decretos_directory, f'Decretos_{pub_date.replace("/", "_")}.txt'))
+
+    counts = {'blocos': 0, 'leilões': 0, 'decretos': 0}
+    with open(full_text_path, 'w', encoding='utf-8') as full_file, \
+            open(leiloes_path, 'w', encoding='utf-8') as leiloes_file, \
+            open(decretos_path, 'w', encoding='utf-8') as decretos_file:
+        write_full_text_header(full_file, pub_date, pub_number, index_text)
+        for segment in segments:
+            with metrics.stage('blocos'):
+                blocks = extract_blocks(segment)
+            for id_materia, block in blocks:
+                counts['blocos'] += 1
+                with metrics.stage('escrita'):
+                    write_block(full_file, counts['blocos'], id_materia, block, pub_date, pub_number)
+
+                with metrics.stage('classificacao'):
+                    is_auction, _ = classifier.classify(block)
+                kind, target = ('leilões', leiloes_file) if is_auction else ('decretos', decretos_file)
+                counts[kind] += 1
+                with metrics.stage('escrita'):
+                    write_block(target, counts[kind], id_materia, block, pub_date, pub_number)
+
+    return pub_date, pub_number, counts
+
+def probe_edition(pdf_path, max_pages=PROBE_MAX_PAGES, backend=None):
+    """Lê só as primeiras páginas do diário, até o primeiro IDMATERIA, e retorna data, número e índice.
+
+    Usa a mesma limpeza do processamento completo; campos não encontrados ficam como None.
+    """
+    start = time.perf_counter()
+    page_texts = []
+    for texto_esquerda, texto_direita in PDF_BACKENDS[backend or PROBE_BACKEND](pdf_path, 0, max_pages,
+                                                                               release_pages=True):
+        page_texts.append(texto_esquerda + ' ' + texto_direita)
+        if 'IDMATERIA' in page_texts[-1]:
+            break
+    cleaned = clean_text(''.join(page_texts))
+    index_text = extract_index(cleaned.text[:cleaned.materia_offsets[0]] if cleaned.materia_offsets else cleaned.text)
+    return EditionProbe(cleaned.pub_date, cleaned.pub_number, index_text, len(page_texts),
+                        time.perf_counter() - start)
+
+# Índice das edições já processadas por pasta: (mtime da pasta, {(data, número): arquivo .txt})
+_processed_editions = {}
+
+def processed_editions(processed_directory):
+    """Edições já processadas, lidas do cabeçalho dos .txt da pasta; relido só quando a pasta muda"""
+    stamp = os.stat(processed_directory).st_mtime_ns
+    cached = _processed_editions.get(processed_directory)
+    if cached and cached[0] == stamp:
+        return cached[1]
+
+    editions = {}
+    for filename in os.listdir(processed_directory):
+        if not filename.endswith('.txt'):
+            continue
+        path = os.path.join(processed_directory, filename)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                date_line, number_line = f.readline(), f.readline()
+        except (OSError, UnicodeDecodeError):
+            continue
+        if date_line.startswith('Data de Publicação: ') and number_line.startswith('Número da Publicação: '):
+            key = (date_line.split(': ', 1)[1].strip(), number_line.split(': ', 1)[1].strip())
+            editions.setdefault(key, path)
+    _processed_editions[processed_directory] = (stamp, editions)
+    return editions
+
+def find_processed_edition(probe, processed_directory):
+    """Caminho do .txt de uma edição já processada igual à sondada, ou None"""
+    if not probe.pub_date or not probe.pub_number or not os.path.isdir(processed_directory):
+        return None
+    return processed_editions(processed_directory).get((probe.pub_date, probe.pub_number))
+
+def run_probe(pdf_paths, backend=None):
+    """--probe: mostra data, número, índice e se a edição já foi processada, sem ler o diário inteiro"""
+    processed_directory = os.path.join(BASE_DIR, '01 - arquivos lidos')
+    for pdf_path in pdf_paths:
+        probe = probe_edition(pdf_path, backend=backend)
+        existing = find_processed_edition(probe, processed_directory)
+        print(f"{os.path.basename(pdf_path)}: data={probe.pub_date or 'não encontrada'}  "
+              f"número={probe.pub_number or 'não encontrado'}  páginas lidas={probe.pages_read}  "
+              f"tempo={probe.elapsed * 1000:.0f} ms")
+        print(f"  Já processada: {existing}" if existing else "  Ainda não processada.")
+        print(f"  Índice: {probe.index_text or 'não encontrado'}")
+
+def _merge_page_ranges(pages):
+    """Agrupa números de página ordenados em intervalos contíguos [início, fim)"""
+    ranges = []
+    for page in pages:
+        if ranges and page == ranges[-1][1]:
+            ranges[-1][1] = page + 1
+        else:
+            ranges.append([page, page + 1])
+    return [tuple(page_range) for page_range in ranges]
+
+def prefilter_auction_pages(pdf_path, classifier=None):
+    """Varredura barata com o PDFium que escolhe as páginas a extrair no modo só leilões.
+
+    Cada página é limpa à parte; todo bloco com algum termo de leilão (pontuação acima de zero, abaixo do
+    limite do classificador, por segurança) marca as páginas que ele ocupa. Os limites dos blocos aqui
+    são aproximados: iter_auction_blocks amplia os intervalos até os blocos das pontas ficarem completos
+    no texto do backend escolhido. Retorna (intervalos [(início, fim)], total de páginas, metadados).
+    """
+    classifier = classifier or DEFAULT_CLASSIFIER
+    metadata, page_starts, parts = {}, [], []
+    offset = 0
+    for texto_esquerda, texto_direita in _iter_pdfium_pages(pdf_path):
+        cleaned = clean_text(texto_esquerda + ' ' + texto_direita)
+        if cleaned.pub_date and 'pub_date' not in metadata:
+            metadata['pub_date'] = cleaned.pub_date
+        if cleaned.pub_number and 'pub_number' not in metadata:
+            metadata['pub_number'] = cleaned.pub_number
+        page_starts.append(offset)
+        parts.append(cleaned.text)
+        offset += len(cleaned.text)
+    text = ''.join(parts)
+    num_pages = len(parts)
+
+    bounds = [match.start() for match in MATERIA_PATTERN.finditer(text)] + [len(text)]
+    spans = list(zip(bounds, bounds[1:]))
+    selected = set()
+    for (start, end), (_, score) in zip(spans, classifier.classify_batch([text[a:b] for a, b in spans])):
+        if score > 0:
+            first = bisect.bisect_right(page_starts, start) - 1
+            last = bisect.bisect_right(page_starts, max(start, end - 1)) - 1
+            selected.update(range(first, last + 1))
+    return _merge_page_ranges(sorted(selected)), num_pages, metadata
+
+def _first_clean_cut(raw, position=0):
+    """Início da primeira linha completa de raw depois de position que pode abrir um trecho limpo à parte;
+    None se não houver"""
+    start = raw.find('\n', position) + 1
+    while start:
+        end = raw.find('\n', start)
+        if end < 0:
+            return None
+        if _opens_chunk(raw[start:end]):
+            return start
+        start = end + 1
+    return None
+
+def _has_marker(raw):
+    return bool(raw) and MATERIA_PATTERN.search(clean_text(raw).text) is not None
+
+def _range_blocks(raw, at_document_start, at_document_end):
+    """Blocos completos de um trecho contíguo de páginas, limpos como no documento inteiro.
+
+    Só a parte entre cortes em que a limpeza não muda (_opens_chunk) é limpa; antes do primeiro marcador
+    fica o fim de um bloco anterior e, se o trecho não chega ao fim do documento, o último bloco pode
+    continuar; os dois ficam de fora.
+    """
+    first = 0 if at_document_start else _first_clean_cut(raw)
+    last = len(raw) if at_document_end else _clean_cut(raw)
+    if first is None or last <= first:
+        return []
+    cleaned = clean_text(raw[first:last])
+    text, starts = cleaned.text, cleaned.materia_offsets
+    if not at_document_end and starts:
+        text, starts = text[:starts[-1]], starts[:-1]
+    return [(span.id_materia(text), span.content(text)) for span in block_spans(text, starts)]
+
+def iter_auction_blocks(pdf_path, page_ranges, num_pages, layout='crop', backend='pdfplumber', metrics=None):
+    """Extrai só os intervalos escolhidos e gera (id_materia, bloco) dos blocos que tocam cada um.
+
+    A varredura prévia usa o texto do PDFium, que pode diferir do backend escolhido; por isso cada
+    intervalo é ampliado, página a página, até o bloco da primeira página começar dentro dele e o da
+    última terminar dentro dele. Intervalos que se encontram são unidos, cada página é extraída uma vez
+    e os blocos saem limpos como no caminho completo (_range_blocks).
+    """
+    metrics = metrics or StageMetrics()
+    texts = {}
+
+    def load(start, end):
+        missing = [page for page in range(start, end) if page not in texts]
+        if missing:
+            pages = _timed_pages(PDF_BACKENDS[backend](pdf_path, missing[0], missing[-1] + 1, layout=layout,
+                                                       release_pages=True, metrics=metrics), metrics)
+            for page, (texto_esquerda, texto_direita) in enumerate(pages, missing[0]):
+                texts[page] = texto_esquerda + ' ' + texto_direita
+        return ''.join(texts[page] for page in range(start, end))
+
+    widened = []
+    for start, end in page_ranges:
+        first_page, last_page = start, end
+        raw = load(start, end)
+        while start > 0:
+            cut = _first_clean_cut(raw)
+            before = len(raw) - sum(len(texts[page]) for page in range(first_page, end))
+            if cut is not None and cut < before and _has_marker(raw[cut:before]):
+                break
+            start -= 1
+            raw = load(start, end)
+        while end < num_pages:
+            after = sum(len(texts[page]) for page in range(start, last_page))
+            cut, last = _first_clean_cut(raw, max(0, after - 1)), _clean_cut(raw)
+            if cut is not None and cut < last and _has_marker(raw[cut:last]):
+                break
+            end += 1
+            raw = load(start, end)
+        if (start, end) != (first_page, last_page):
+            logging.info(f"Intervalo de páginas {first_page}-{last_page} ampliado para {start}-{end} para "
+                         f"completar os blocos das pontas.")
+        while widened and start <= widened[-1][1]:
+            previous_start, previous_end = widened.pop()
+            start, end = min(start, previous_start), max(end, previous_end)
+        widened.append((start, end))
+
+    for start, end in widened:
+        raw = load(start, end)
+        for page in range(start, end):
+            del texts[page]
+        with metrics.stage('limpeza'):
+            blocks = _range_blocks(raw, start == 0, end == num_pages)
+        yield from blocks
+
+def process_single_file_auctions(selected_file, exclusive_names=False, classifier=None, layout='crop',
+                                 backend='pdfplumber', metrics=None):
+    """Modo só leilões: extração completa apenas das páginas com blocos candidatos; grava o mesmo
+    Leilões_*.txt do caminho completo e não gera o texto completo nem o arquivo de decretos"""
+    classifier = classifier or DEFAULT_CLASSIFIER
+    metrics = metrics or StageMetrics()
+    processed_directory = os.path.join(BASE_DIR, '01 - arquivos lidos')
+    leiloes_directory = os.path.join(BASE_DIR, '02 - arquivos com leilões')
+    output_path = _reserve_output_path if exclusive_names else (lambda path: path)
+
+    try:
+        with metrics.stage('pre_filtro'):
+            page_ranges, num_pages, metadata = prefilter_auction_pages(selected_file, classifier)
+        selected_pages = sum(end - start for start, end in page_ranges)
+        metrics.count('paginas_total', num_pages)
+        metrics.count('paginas_ignoradas', num_pages - selected_pages)
+
+        leiloes = []
+        for id_materia, block in iter_auction_blocks(selected_file, page_ranges, num_pages, layout=layout,
+                                                     backend=backend, metrics=metrics):
+            with metrics.stage('classificacao'):
+                is_auction, _ = classifier.classify(block)
+            if is_auction:
+                leiloes.append((id_materia, block))
+    except Exception as e:
+        logging.error(f"Falha ao processar o arquivo {selected_file}: {e}")
+        return False
+    if not num_pages:
+        logging.error(f"Falha ao processar o arquivo {selected_file}.")
+        return False
+
+    pub_date = metadata.get('pub_date', "Data não encontrada")
+    pub_number = metadata.get('pub_number', "Número não encontrado")
+    metrics.count('leiloes', len(leiloes))
+    leiloes_path = output_path(os.path.join(leiloes_directory, f'Leilões_{pub_date.replace("/", "_")}.txt'))
+    with metrics.stage('escrita'):
+        write_blocks_to_file(leiloes, leiloes_path, pub_date, pub_number)
+
+    shutil.move(selected_file, output_path(os.path.join(processed_directory, os.path.basename(selected_file))))
+
+    message = (f"Processamento só de leilões concluído para {os.path.basename(selected_file)}: "
+               f"{num_pages - selected_pages} de {num_pages} páginas ignoradas, {len(leiloes)} leilões.")
+    logging.info(message)
+    print(message)
+    print(f"Arquivo de leilões salvo em: {leiloes_path}")
+    return True
+
+def process_single_file_streaming(selected_file, exclusive_names=False, classifier=None, cache=None, layout='crop',
+                                   backend='pdfplumber', memory=None, metrics=None, sha256=None):
+    """Variante de process_single_file que não monta o texto do diário inteiro em memória"""
     processed_directory = os.path.join(BASE_DIR, '01 - arquivos lidos')
     leiloes_directory = os.path.join(BASE_DIR, '02 - arquivos com leilões')
     decretos_directory = os.path.join(BASE_DIR, '03 - arquivos com decretos')
+    output_path = _reserve_output_path if exclusive_names else (lambda path: path)
 
-    text = process_pdf_file(selected_file)
+    full_text_filename = os.path.splitext(os.path.basename(selected_file))[0] + '.txt'
+    full_text_path = output_path(os.path.join(processed_directory, full_text_filename))
+    try:
+        _, _, counts = stream_edition(iter_page_texts(selected_file, release_pages=True, cache=cache, layout=layout,
+                                                      backend=backend, memory=memory, metrics=metrics,
+                                                      sha256=sha256),
+                                      full_text_path,
+                                      leiloes_directory, decretos_directory, output_path, classifier, metrics)
+    except Exception as e:
+        logging.error(f"Falha ao processar o arquivo {selected_file}: {e}")
+        return False
+    if metrics is not None:
+        for name, value in counts.items():
+            metrics.count(name.replace('õ', 'o'), value)
+    if not counts['blocos']:
+        logging.error(f"Falha ao processar o arquivo {selected_file}.")
+        return False
+
+    shutil.move(selected_file, output_path(os.path.join(processed_directory, os.path.basename(selected_file))))
+
+    logging.info(f"Processamento concluído para {os.path.basename(selected_file)}.")
+    print(f"Processamento concluído para {os.path.basename(selected_file)}.")
+    print(f"Arquivo de texto completo salvo em: {full_text_path}")
+    return True
+
+def _load_raw_texts(paths):
+    """Lê textos brutos de diários: PDFs são extraídos, .txt são lidos como texto bruto já extraído"""
+    for path in paths:
+        if os.path.isdir(path):
+            yield from _load_raw_texts(sorted(os.path.join(path, name) for name in os.listdir(path)
+                                              if name.lower().endswith(('.pdf', '.txt'))))
+        elif path.lower().endswith('.pdf'):
+            yield path, process_pdf_file(path)
+        else:
+            with open(path, 'r', encoding='utf-8') as file:
+                yield path, file.read()
+
+def verify_cleaner(paths):
+    """Teste diferencial: clean_text deve reproduzir preprocess_text, extract_blocks e os metadados"""
+    all_equal = True
+    for path, text in _load_raw_texts(paths):
+        cleaned = clean_text(text)
+        reference_text = preprocess_text(text)
+        checks = {
+            'texto': cleaned.text == reference_text,
+            'data': (cleaned.pub_date or "Data não encontrada") == extract_publication_date(text),
+            'número': (cleaned.pub_number or "Número não encontrado") == extract_publication_number(text),
+            'blocos': blocks_from_offsets(cleaned.text, cleaned.materia_offsets) == extract_blocks(reference_text),
+            'spans': [(span.id_materia(cleaned.text), span.content(cleaned.text))
+                      for span in block_spans(cleaned.text, cleaned.materia_offsets)] == extract_blocks(reference_text),
+        }
+        failed = [name for name, ok in checks.items() if not ok]
+        all_equal = all_equal and not failed
+        print(f"{os.path.basename(path)}: {'OK' if not failed else 'DIVERGE em ' + ', '.join(failed)}")
+    return all_equal
+
+def benchmark_cleaner(paths, repeat=5):
+    """Compara o tempo das funções atuais com o limpador de varredura única"""
+    texts = [text for _, text in _load_raw_texts(paths)]
+    total_chars = sum(len(text) for text in texts)
+
+    def current(text):
+        extract_publication_date(text)
+        extract_publication_number(text)
+        extract_blocks(preprocess_text(text))
+
+    def fused(text):
+        cleaned = clean_text(text)
+        blocks_from_offsets(cleaned.text, cleaned.materia_offsets)
+
+    results = {}
+    for name, run in (('atual', current), ('varredura única', fused)):
+        best = min(_time_call(lambda: [run(text) for text in texts]) for _ in range(repeat))
+        results[name] = best
+        print(f"{name:16s}  {best * 1000:9.1f} ms  {total_chars / best / 1e6:7.1f} M caracteres/s")
+    print(f"Aceleração: {results['atual'] / results['varredura única']:.2f}x")
+    return results
+
+def benchmark_blocks(paths, classifier=None):
+    """Compara tempo e pico de memória (tracemalloc) de blocos copiados e classify_blocks contra
+    BlockSpan e classify_block_spans, do texto limpo até a classificação"""
+    import tracemalloc
+
+    classifier = classifier or DEFAULT_CLASSIFIER
+    cleaned_texts = [clean_text(text) for _, text in _load_raw_texts(paths)]
+
+    def copied(cleaned):
+        blocks = blocks_from_offsets(cleaned.text, cleaned.materia_offsets)
+        return classify_blocks(blocks, classifier=classifier)
+
+    def spans(cleaned):
+        block_list = block_spans(cleaned.text, cleaned.materia_offsets)
+        return classify_block_spans(cleaned.text, block_list, classifier=classifier)
+
+    for name, run in (('cópias', copied), ('spans', spans)):
+        tracemalloc.start()
+        elapsed = _time_call(lambda: [run(cleaned) for cleaned in cleaned_texts])
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"{name:8s}  {elapsed * 1000:9.1f} ms  pico={peak / 1024 ** 2:8.1f} MB")
+
+def _time_call(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+def benchmark_memory(pdf_path):
+    """Compara o pico de memória (tracemalloc) do caminho atual com o caminho em streaming"""
+    import tracemalloc
+
+    def full_path(output_dir):
+        cleaned = clean_text(process_pdf_file(pdf_path))
+        pub_date, pub_number = cleaned.pub_date, cleaned.pub_number
+        blocks = blocks_from_offsets(cleaned.text, cleaned.materia_offsets)
+        leiloes, decretos = classify_blocks(blocks)
+        write_blocks_to_file(blocks, os.path.join(output_dir, 'completo.txt'), pub_date, pub_number)
+        write_blocks_to_file(leiloes, os.path.join(output_dir, 'leiloes.txt'), pub_date, pub_number)
+        write_blocks_to_file(decretos, os.path.join(output_dir, 'decretos.txt'), pub_date, pub_number)
+
+    def streaming_path(output_dir):
+        stream_edition(iter_page_texts(pdf_path, release_pages=True), os.path.join(output_dir, 'completo.txt'),
+                       output_dir, output_dir)
+
+    results = {}
+    for name, run in (('atual', full_path), ('streaming', streaming_path)):
+        with tempfile.TemporaryDirectory() as output_dir:
+            tracemalloc.start()
+            start = time.perf_counter()
+            run(output_dir)
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        results[name] = peak
+        print(f"{name:10s}  pico={peak / 1024 / 1024:8.1f} MB  tempo={elapsed:8.2f}s")
+    return results
+
+def _reserve_output_path(path):
+    """Reserva atomicamente um nome de saída livre, acrescentando _2, _3... se já existir"""
+    root, ext = os.path.splitext(path)
+    candidate, counter = path, 1
+    while True:
+        try:
+            os.close(os.open(candidate, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return candidate
+        except FileExistsError:
+            counter += 1
+            candidate = f"{root}_{counter}{ext}"
+
+def process_single_file(selected_file, workers=1, exclusive_names=False, streaming=False, classifier=None,
+                        cache=None, layout='crop', backend='pdfplumber', memory=None, metrics_log=None, force=False,
+                        auctions_only=False):
+    """Processa um PDF; com metrics_log (MetricsLog) grava uma linha de métricas por etapa ao final.
+
+    Sem force, o PDF é pulado se o mesmo conteúdo (SHA-256) já foi processado no mesmo modo e com a mesma
+    configuração (processing_variant), ou está sendo processado por outro worker, segundo o repositório de
+    PDFs em STORE_DIR, ou se uma sondagem das primeiras páginas achar a edição em '01 - arquivos lidos'.
+    PDFs pulados por já terem sido processados vão para '01 - arquivos lidos' e o retorno é SKIPPED.
+    auctions_only gera só o arquivo de leilões, extraindo apenas as páginas com blocos candidatos.
+    """
+    if auctions_only and pdfium is None:
+        logging.warning("Modo só leilões requer pypdfium2 para a varredura prévia; usando o caminho completo.")
+        auctions_only = False
+    mode = 'leiloes' if auctions_only else 'streaming' if streaming else 'completo'
+    variant = processing_variant(auctions_only, layout, backend, classifier)
+    metrics = StageMetrics(arquivo=os.path.basename(selected_file), backend=backend, layout=layout, modo=mode)
+    success = False
+    filename = os.path.basename(selected_file)
+    store, sha256, same_content = _content_store(), None, None
+    try:
+        with metrics.stage('sondagem'):
+            try:
+                sha256 = file_sha256(selected_file)
+            except OSError as e:
+                logging.warning(f"Não foi possível calcular o hash de {selected_file}: {e}")
+            if sha256 and not force:
+                same_content = store.claim_processing(sha256, filename, variant)
+            # Conteúdo já processado em outra variante (modo, vocabulário, layout ou backend) é processado de
+            # novo; a sondagem fica para a mesma edição com outro conteúdo
+            other_variant = bool(sha256) and not same_content and bool(store.processed_variants(sha256))
+            existing = (None if force or same_content or other_variant
+                        else _find_already_processed(selected_file))
+        if same_content:
+            metrics.count('ignorados')
+            if variant in store.processed_variants(sha256):
+                # Sai da pasta de leitura; se outro worker ainda está processando o conteúdo, fica onde está
+                output_path = _reserve_output_path if exclusive_names else (lambda path: path)
+                shutil.move(selected_file, output_path(os.path.join(BASE_DIR, '01 - arquivos lidos', filename)))
+                logging.info(f"{filename} tem o mesmo conteúdo de {same_content}, já processado; ignorado e "
+                             f"movido para '01 - arquivos lidos'.")
+                print(f"Conteúdo já processado ({same_content}); arquivo ignorado: {filename}")
+            else:
+                logging.info(f"{filename} tem o mesmo conteúdo de {same_content}, em processamento; ignorado.")
+                print(f"Conteúdo em processamento ({same_content}); arquivo ignorado: {filename}")
+            success = SKIPPED
+            return success
+        if existing:
+            metrics.count('ignorados')
+            # Sai da pasta de leitura para não ser sondado de novo a cada execução
+            output_path = _reserve_output_path if exclusive_names else (lambda path: path)
+            shutil.move(selected_file, output_path(os.path.join(BASE_DIR, '01 - arquivos lidos', filename)))
+            logging.info(f"Edição de {filename} já processada em {existing}; ignorada e movida para "
+                         f"'01 - arquivos lidos'.")
+            print(f"Edição já processada ({os.path.basename(existing)}); arquivo ignorado: {filename}")
+            success = SKIPPED
+            return success
+        if auctions_only:
+            success = process_single_file_auctions(selected_file, exclusive_names=exclusive_names,
+                                                   classifier=classifier, layout=layout, backend=backend,
+                                                   metrics=metrics)
+        elif streaming:
+            success = process_single_file_streaming(selected_file, exclusive_names=exclusive_names,
+                                                    classifier=classifier, cache=cache, layout=layout,
+                                                    backend=backend, memory=memory, metrics=metrics, sha256=sha256)
+        else:
+            success = _process_single_file_full(selected_file, workers=workers, exclusive_names=exclusive_names,
+                                                classifier=classifier, cache=cache, layout=layout,
+                                                backend=backend, memory=memory, metrics=metrics, sha256=sha256)
+        return success
+    finally:
+        if sha256 and not same_content:
+            store.finish_processing(sha256, filename, success, variant)
+        store.close()
+        stages = ', '.join(f"{name}={seconds:.2f}s" for name, seconds in metrics.stages.items())
+        logging.info(f"Métricas de {os.path.basename(selected_file)}: {stages}; {metrics.counters}")
+        if metrics_log is not None:
+            metrics_log.write(metrics.record(sucesso=bool(success)))
+
+def _content_store():
+    """Repositório de PDFs compartilhado com os downloaders; registra o conteúdo já processado"""
+    return PdfStore(STORE_DIR)
+
+def _find_already_processed(selected_file):
+    processed_directory = os.path.join(BASE_DIR, '01 - arquivos lidos')
+    # Sem edições processadas não há o que comparar; evita abrir o PDF só para a sondagem
+    if not os.path.isdir(processed_directory) or not processed_editions(processed_directory):
+        return None
+    try:
+        probe = probe_edition(selected_file)
+    except Exception as e:
+        # Sem sondagem o arquivo segue para o processamento completo, que registra a falha se houver
+        logging.warning(f"Sondagem falhou para {selected_file}: {e}")
+        return None
+    return find_processed_edition(probe, processed_directory)
+
+def _process_single_file_full(selected_file, workers=1, exclusive_names=False, classifier=None, cache=None,
+                              layout='crop', backend='pdfplumber', memory=None, metrics=None, sha256=None):
+    metrics = metrics or StageMetrics()
+    processed_directory = os.path.join(BASE_DIR, '01 - arquivos lidos')
+    leiloes_directory = os.path.join(BASE_DIR, '02 - arquivos com leilões')
+    decretos_directory = os.path.join(BASE_DIR, '03 - arquivos com decretos')
+
+    text = process_pdf_file(selected_file, workers=workers, cache=cache, layout=layout, backend=backend,
+                            memory=memory, metrics=metrics, sha256=sha256)
     if text:
-        pub_date = extract_publication_date(text)
-        pub_number = extract_publication_number(text)
-        text_cleaned = preprocess_text(text)
+        # Limpeza, data, número e posições dos blocos em uma única varredura
+        with metrics.stage('limpeza'):
+            cleaned = clean_text(text)
+        del text
+        metrics.count('caracteres', len(cleaned.text))
+        pub_date = cleaned.pub_date or "Data não encontrada"
+        pub_number = cleaned.pub_number or "Número não encontrado"
+        text_cleaned = cleaned.text
 
-        # Extrair o índice
-        index_match = re.search(r'(Índice de Publicação[\s\S]*?)(?=IDMATERIA)', text_cleaned)
-        index_text = index_match.group(1).strip() if index_match else "Índice não encontrado"
+        # Extrair o índice do preâmbulo, como no streaming
+        preamble = text_cleaned[:cleaned.materia_offsets[0]] if cleaned.materia_offsets else text_cleaned
+        index_text = extract_index(preamble) or "Índice não encontrado"
 
-        blocks = extract_blocks(text_cleaned)
+        # Blocos como posições no texto limpo; o conteúdo só é copiado na escrita
+        with metrics.stage('blocos'):
+            spans = block_spans(text_cleaned, cleaned.materia_offsets)
+        metrics.count('blocos', len(spans))
 
         # Salvar o arquivo de texto completo
         full_text_filename = os.path.splitext(os.path.basename(selected_file))[0] + '.txt'
         full_text_path = os.path.join(processed_directory, full_text_filename)
 
-        with open(full_text_path, 'w', encoding='utf-8') as full_file:
-            full_file.write(f"Data de Publicação: {pub_date}\n")
-            full_file.write(f"Número da Publicação: {pub_number}\n\n")
-            full_file.write("ÍNDICE\n")
-            full_file.write(f"{index_text}\n\n")
-            full_file.write("************************************************************\n\n")
-
-            for block_number, (id_materia, block) in enumerate(blocks, 1):
-                id_number = id_materia.replace('IDMATERIA', '')
-                header = f"""************************************************************
-ID: {id_number}
-Data Pub.: {pub_date}
-Número Pub.: {pub_number}
-Número Bloco: {block_number:05d}
+        # No modo concorrente cada saída reserva o próprio nome para não sobrescrever outro worker
+        output_path = _reserve_output_path if exclusive_names else (lambda path: path)
+        full_text_path = output_path(full_text_path)
 
-"""
-                full_file.write(header)
-                full_file.write(block + '\n\n')
+        with metrics.stage('escrita'), open(full_text_path, 'w', encoding='utf-8') as full_file:
+            write_full_text_header(full_file, pub_date, pub_number, index_text)
+            for block_number, span in enumerate(spans, 1):
+                write_block(full_file, block_number, span.id_materia(text_cleaned), span.content(text_cleaned),
+                            pub_date, pub_number)
 
         # Continuar com a separação de leilões e decretos
-        leiloes, decretos = classify_blocks(blocks)
+        with metrics.stage('classificacao'):
+            leiloes, decretos = classify_block_spans(text_cleaned, spans, classifier=classifier)
+        metrics.count('leiloes', len(leiloes))
+        metrics.count('decretos', len(decretos))
 
-        write_blocks_to_file(leiloes, os.path.join(leiloes_directory, f'Leilões_{pub_date.replace("/", "_")}.txt'),
-                             pub_date, pub_number)
-        write_blocks_to_file(decretos, os.path.join(decretos_directory, f'Decretos_{pub_date.replace("/", "_")}.txt'),
-                             pub_date, pub_number)
+        with metrics.stage('escrita'):
+            write_spans_to_file(text_cleaned, leiloes, output_path(os.path.join(leiloes_directory, f'Leilões_{pub_date.replace("/", "_")}.txt')),
+                                pub_date, pub_number)
+            write_spans_to_file(text_cleaned, decretos, output_path(os.path.join(decretos_directory, f'Decretos_{pub_date.replace("/", "_")}.txt')),
+                                pub_date, pub_number)
 
         # Mover o arquivo PDF processado
-        shutil.move(selected_file, os.path.join(processed_directory, os.path.basename(selected_file)))
+        shutil.move(selected_file, output_path(os.path.join(processed_directory, os.path.basename(selected_file))))
 
         logging.info(f"Processamento concluído para {os.path.basename(selected_file)}.")
         print(f"Processamento concluído para {os.path.basename(selected_file)}.")
         print(f"Arquivo de texto completo salvo em: {full_text_path}")
+        return True
     else:
         logging.error(f"Falha ao processar o arquivo {selected_file}.")
-"""def process_single_file(selected_file):
-    processed_directory = os.path.join(BASE_DIR, '01 - arquivos lidos')
-    leiloes_directory = os.path.join(BASE_DIR, '02 - arquivos com leilões')
-    decretos_directory = os.path.join(BASE_DIR, '03 - arquivos com decretos')
+        return False
 
-    text = process_pdf_file(selected_file)
-    if text:
-        pub_date = extract_publication_date(text)
-        pub_number = extract_publication_number(text)
-        text_cleaned = preprocess_text(text)
-        blocks = extract_blocks(text_cleaned)
-        leiloes, decretos = classify_blocks(blocks)
+def _process_single_file_safe(selected_file, **options):
+    """Executa process_single_file isolando falhas; retorna (arquivo, sucesso, erro)"""
+    try:
+        return selected_file, process_single_file(selected_file, **options), None
+    except Exception as e:
+        logging.error(f"Erro ao processar o arquivo {selected_file}: {e}")
+        return selected_file, False, str(e)
 
-        write_blocks_to_file(leiloes, os.path.join(leiloes_directory, f'Leilões_{pub_date.replace("/", "_")}.txt'),
-                             pub_date, pub_number)
-        write_blocks_to_file(decretos, os.path.join(decretos_directory, f'Decretos_{pub_date.replace("/", "_")}.txt'),
-                             pub_date, pub_number)
+def process_all_files(workers=1, file_workers=1, streaming=False, classifier=None, cache=None, layout='crop',
+                      backend='pdfplumber', memory=None, metrics_log=None, force=False, auctions_only=False):
+    """Processa todos os PDFs da pasta de leitura; file_workers limita quantos PDFs ficam abertos ao mesmo tempo"""
+    read_directory = os.path.join(BASE_DIR, '00 - para leitura')
+    pdf_files = [os.path.join(read_directory, f) for f in os.listdir(read_directory) if f.endswith('.pdf')]
 
-        shutil.move(selected_file, os.path.join(processed_directory, os.path.basename(selected_file)))
-        logging.info(f"Processamento concluído para {os.path.basename(selected_file)}.")
-        print(f"Processamento concluído para {os.path.basename(selected_file)}.")
+    results = []
+    if file_workers > 1 and len(pdf_files) > 1:
+        if workers > 1:
+            # Processos do pool não podem abrir outro pool; cada PDF usa extração serial
+            logging.warning("Extração paralela de páginas desativada no modo de vários arquivos.")
+        with concurrent.futures.ProcessPoolExecutor(max_workers=min(file_workers, len(pdf_files))) as executor:
+            futures = [executor.submit(_process_single_file_safe, pdf_file, exclusive_names=True,
+                                       streaming=streaming, classifier=classifier, cache=cache, layout=layout,
+                                       backend=backend, memory=memory, metrics_log=metrics_log, force=force,
+                                       auctions_only=auctions_only)
+                       for pdf_file in pdf_files]
+            for future in tqdm(concurrent.futures.as_completed(futures), total=len(futures),
+                               desc="Processando arquivos PDF"):
+                results.append(future.result())
     else:
-        logging.error(f"Falha ao processar o arquivo {selected_file}.")
-"""
-def process_all_files():
-    read_directory = os.path.join(BASE_DIR, '00 - para leitura')
-    pdf_files = [f for f in os.listdir(read_directory) if f.endswith('.pdf')]
+        for pdf_file in tqdm(pdf_files, desc="Processando arquivos PDF"):
+            results.append(_process_single_file_safe(pdf_file, workers=workers, streaming=streaming,
+                                                     classifier=classifier, cache=cache, layout=layout,
+                                                     backend=backend, memory=memory, metrics_log=metrics_log,
+                                                     force=force, auctions_only=auctions_only))
+
+    failures = [(pdf_file, error) for pdf_file, ok, error in results if not ok]
+    skipped = sum(1 for _, ok, _ in results if ok == SKIPPED)
+    message = (f"Lote concluído: {len(results) - len(failures) - skipped}/{len(results)} arquivos processados com "
+               f"sucesso, {skipped} ignorados (já processados).")
+    logging.info(message)
+    print(message)
+    for pdf_file, error in failures:
+        print(f"Falha: {os.path.basename(pdf_file)}" + (f" ({error})" if error else ""))
+    return results
+
+def run_cache_command(cache, workers=1, layout='crop', backend='pdfplumber'):
+    """Executa --cache-info, --cache-invalidate=PDF|all ou --cache-rebuild=PDF; retorna True se executou"""
+    if "--cache-info" in sys.argv:
+        for name, value in cache.stats().items():
+            print(f"{name}: {value}")
+        return True
+
+    target = _get_option("cache-invalidate")
+    if target:
+        removed = cache.invalidate(None if target == 'all' else target)
+        print(f"Cache de páginas: {removed} documentos invalidados.")
+        return True
 
-    for pdf_file in tqdm(pdf_files, desc="Processando arquivos PDF"):
-        process_single_file(os.path.join(read_directory, pdf_file))
+    targets = _get_option("cache-rebuild")
+    if targets:
+        for pdf_path in targets.split(","):
+            cache.invalidate(pdf_path)
+            num_pages = sum(1 for _ in iter_page_columns(pdf_path, workers=workers, cache=cache,
+                                                              layout=layout, backend=backend))
+            print(f"Cache de páginas reconstruído para {os.path.basename(pdf_path)} ({num_pages} páginas).")
+        return True
+    return False
+
+def _get_option(name, default=None):
+    """Lê uma opção no formato --nome=valor da linha de comando"""
+    for arg in sys.argv[1:]:
+        if arg.startswith(f"--{name}="):
+            return arg.split("=", 1)[1]
+    return default
+
+def print_help():
+    """Exibe as opções da linha de comando"""
+    print("Processa os diários em '00 - para leitura' e grava texto completo, leilões e decretos.")
+    print("\nOpções principais:")
+    print("  --stream      Limpa e grava bloco a bloco, sem montar o texto do diário inteiro em memória")
+    print("  --leiloes     Só o arquivo de leilões, extraindo apenas as páginas com blocos candidatos")
+    print("  --workers=N   Processos de extração de páginas por PDF (padrão 1)")
+    print("  --file-workers=N  PDFs processados ao mesmo tempo (padrão 1)")
+    print("  --layout=crop|gutter  --backend=pdfplumber|pdfium  Recorte das colunas e extrator de texto")
+    print("  --keywords=NOME|ARQUIVO  --min-score=S  Vocabulário e pontuação mínima do classificador de leilões")
+    print("  --no-cache    Não usa o cache de páginas; --cache-file=ARQUIVO e --cache-max-mb=N mudam local e limite")
+    print("  --cache-info  --cache-invalidate=PDF|all  --cache-rebuild=PDF  Manutenção do cache de páginas")
+    print("  --probe=PDF[,PDF]  Mostra data, número e índice lendo só as primeiras páginas")
+    print("  --force       Reprocessa mesmo que o conteúdo ou a edição já tenham sido processados")
+    print("  --help        Exibe esta ajuda")
+    print("\nReexecução: um PDF cuja edição (data e número) já tem .txt em '01 - arquivos lidos' é ignorado")
+    print("e movido para lá, sem gerar saídas. Para reprocessar uma edição (outro modo, vocabulário ou layout),")
+    print("devolva o PDF a '00 - para leitura' e use --force; sem --force ele é ignorado de novo.")
 
 def main():
+    if "--help" in sys.argv:
+        print_help()
+        return
     read_directory = os.path.join(BASE_DIR, '00 - para leitura')
+    workers = int(_get_option("workers", "1"))
+    file_workers = int(_get_option("file-workers", "1"))
+    streaming = "--stream" in sys.argv
+    force = "--force" in sys.argv
+    # --leiloes: só o arquivo de leilões, com varredura prévia das páginas (requer pypdfium2)
+    auctions_only = "--leiloes" in sys.argv
+    layout = _get_option("layout", "crop")
+    backend = _get_option("backend", "pdfplumber")
+    try:
+        check_backend(backend, layout)
+    except ValueError as e:
+        print(e)
+        return
+    classifier = KeywordClassifier(load_keywords(_get_option("keywords", "padrao")),
+                                   min_score=float(_get_option("min-score", "1.0")))
+    cache = None
+    if "--no-cache" not in sys.argv:
+        cache = PageTextCache(_get_option("cache-file", PAGE_CACHE_FILE),
+                              max_bytes=int(float(_get_option("cache-max-mb", "2048")) * 1024 ** 2))
+
+    # Modo de memória limitada: --max-rss-mb=N (orçamento por processo) e/ou --page-window=N
+    memory = None
+    max_rss_mb, page_window = _get_option("max-rss-mb"), _get_option("page-window")
+    if max_rss_mb or page_window:
+        memory = MemoryMonitor(max_rss_bytes=int(float(max_rss_mb) * 1024 ** 2) if max_rss_mb else None,
+                               page_window=int(page_window) if page_window else None)
+
+    # Métricas por etapa: --metrics=arquivo.jsonl (padrão METRICS_FILE), --no-metrics,
+    # --metrics-prometheus=arquivo.prom para a exposição no formato texto do Prometheus
+    metrics_log = None
+    if "--no-metrics" not in sys.argv:
+        metrics_log = MetricsLog(_get_option("metrics", METRICS_FILE), _get_option("metrics-prometheus"))
+
+    if cache is not None and run_cache_command(cache, workers, layout, backend):
+        return
+
+    benchmark_pdf = _get_option("benchmark")
+    if benchmark_pdf:
+        worker_counts = [int(n) for n in _get_option("benchmark-workers", "1,2,4,8").split(",")]
+        benchmark_extraction(benchmark_pdf, worker_counts, layout, backend)
+        return
+
+    probe_paths = _get_option("probe")
+    if probe_paths:
+        run_probe(probe_paths.split(","), _get_option("backend"))
+        return
+
+    backend_paths = _get_option("benchmark-backends")
+    if backend_paths:
+        benchmark_backends(backend_paths.split(","))
+        return
+
+    benchmark_layout_pdf = _get_option("benchmark-layout")
+    if benchmark_layout_pdf:
+        benchmark_layouts(benchmark_layout_pdf)
+        return
+
+    cleaner_paths = _get_option("verify-cleaner")
+    if cleaner_paths:
+        sys.exit(0 if verify_cleaner(cleaner_paths.split(",")) else 1)
+
+    cleaner_paths = _get_option("benchmark-cleaner")
+    if cleaner_paths:
+        benchmark_cleaner(cleaner_paths.split(","))
+        return
+
+    block_paths = _get_option("benchmark-blocks")
+    if block_paths:
+        benchmark_blocks(block_paths.split(","), classifier)
+        return
+
+    benchmark_memory_pdf = _get_option("benchmark-memory")
+    if benchmark_memory_pdf:
+        benchmark_memory(benchmark_memory_pdf)
+        return
+
     choice = input("Deseja processar todos os arquivos? (S/N): ").strip().lower()
     if choice == 's':
-        process_all_files()
+        process_all_files(workers=workers, file_workers=file_workers, streaming=streaming,
+                          classifier=classifier, cache=cache, layout=layout, backend=backend, memory=memory,
+                          metrics_log=metrics_log, force=force, auctions_only=auctions_only)
     else:
         pdf_files = [f for f in os.listdir(read_directory) if f.endswith('.pdf')]
         if not pdf_files:
@@ -190,9 +1677,15 @@ def main():
         choice = input("Digite o número do arquivo que deseja processar: ").strip()
         if choice.isdigit() and 1 <= int(choice) <= len(pdf_files):
             selected_file = os.path.join(read_directory, pdf_files[int(choice) - 1])
-            process_single_file(selected_file)
+            process_single_file(selected_file, workers=workers, streaming=streaming, classifier=classifier,
+                                cache=cache, layout=layout, backend=backend, memory=memory, metrics_log=metrics_log,
+                                force=force, auctions_only=auctions_only)
         else:
             print("Escolha inválida.")
+            return
+
+    if metrics_log is not None and metrics_log.export_prometheus():
+        print(f"Métricas Prometheus gravadas em: {metrics_log.prometheus_path}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,89 @@
+import concurrent.futures
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger("tjpr_autodownloader.pipeline")
+
+# PDFs baixados que podem esperar na fila, além dos que já estão sendo processados
+DEFAULT_QUEUE_SIZE = 2
+
+
+class ProcessingPipeline:
+    """Processa os PDFs à medida que os downloads terminam, num pool de processos.
+
+    submit(path) põe o PDF numa fila limitada que alimenta process_workers processos rodando
+    document_processor.process_single_file (com nomes de saída exclusivos, como no process_all_files).
+    Quando a extração fica para trás e a fila enche, submit bloqueia a thread de download que o chamou,
+    segurando a rede até abrir uma vaga. waited acumula o tempo que os downloads passaram nessa espera.
+    Os demais argumentos nomeados vão para process_single_file; sem metrics_log e cache, usa o log de
+    métricas e o cache de páginas padrão do document_processor.
+    """
+
+    def __init__(self, process_workers=1, queue_size=DEFAULT_QUEUE_SIZE, **process_options):
+        # Importado aqui: o document_processor depende do pdfplumber, que o download sozinho não usa
+        import document_processor
+        from metrics import MetricsLog
+        from page_cache import PageTextCache
+
+        if process_workers < 1:
+            raise ValueError(f"Número de processos inválido: {process_workers}")
+        process_options.setdefault('metrics_log', MetricsLog(document_processor.METRICS_FILE))
+        process_options.setdefault('cache', PageTextCache(document_processor.PAGE_CACHE_FILE))
+        self.process_workers = process_workers
+        self.queue_size = queue_size
+        self.process_options = process_options
+        self._process = document_processor._process_single_file_safe
+        self._slots = threading.BoundedSemaphore(process_workers + queue_size)
+        self._executor = concurrent.futures.ProcessPoolExecutor(max_workers=process_workers)
+        self._futures = []
+        self._lock = threading.Lock()
+        self.waited = 0.0
+
+    def submit(self, path):
+        """Enfileira um PDF baixado; bloqueia enquanto a fila estiver cheia"""
+        start = time.perf_counter()
+        self._slots.acquire()
+        waited = time.perf_counter() - start
+        with self._lock:
+            self.waited += waited
+            future = self._executor.submit(self._process, path, exclusive_names=True, **self.process_options)
+            self._futures.append(future)
+        future.add_done_callback(self._done)
+        if waited > 0.1:
+            logger.info(f"Fila de processamento cheia: {os.path.basename(path)} esperou {waited:.1f} s")
+        return future
+
+    def _done(self, future):
+        self._slots.release()
+        try:
+            path, ok, error = future.result()
+        except Exception as e:
+            logger.error(f"Processo de extração falhou: {e}")
+            return
+        if ok:
+            logger.info(f"Processado: {os.path.basename(path)}")
+        else:
+            logger.error(f"Falha ao processar {os.path.basename(path)}" + (f": {error}" if error else ""))
+
+    def close(self):
+        """Espera o processamento de tudo o que foi enfileirado; retorna (arquivo, sucesso, erro) por PDF"""
+        self._executor.shutdown(wait=True)
+        results = []
+        for future in self._futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append((None, False, str(e)))
+        if results:
+            failures = sum(1 for _, ok, _ in results if not ok)
+            logger.info(f"Processamento concluído: {len(results) - failures}/{len(results)} PDFs "
+                        f"(downloads esperaram {self.waited:.1f} s pela fila)")
+        return results
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,155 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger("tjpr_autodownloader.registry")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS downloads (
+    id TEXT NOT NULL,
+    numero TEXT NOT NULL,
+    edition_number INTEGER,
+    data TEXT,
+    filename TEXT,
+    download_date TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS downloads_id ON downloads (id);
+CREATE INDEX IF NOT EXISTS downloads_edition_number ON downloads (edition_number);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_UPSERT = (
+    "INSERT INTO downloads (id, numero, edition_number, data, filename, download_date) VALUES (?, ?, ?, ?, ?, ?) "
+    "ON CONFLICT (id) DO UPDATE SET numero = excluded.numero, edition_number = excluded.edition_number, "
+    "data = excluded.data, filename = excluded.filename, download_date = excluded.download_date")
+
+# Tamanho dos lotes de ids consultados de uma vez em missing (limite de parâmetros do SQLite)
+_LOOKUP_BATCH = 500
+
+
+def _entry_row(entry):
+    try:
+        edition_number = int(entry['numero'])
+    except (TypeError, ValueError):
+        edition_number = None
+    return (entry['id'], str(entry['numero']), edition_number, entry.get('data'), entry.get('filename'),
+            entry.get('download_date'))
+
+
+class DownloadRegistry:
+    """Registro dos diários baixados em SQLite (modo WAL), no lugar do JSON reescrito a cada gravação.
+
+    Cada edição baixada é uma linha com índice único no id; add e add_many fazem upsert numa transação,
+    então o custo de consultar e gravar não cresce com o histórico. last_check e last_edition ficam na
+    tabela state. A conexão é compartilhada pelas threads de download, protegida por um lock.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._lock = threading.RLock()
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, timeout=60, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def get_state(self, key, default=None):
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_state(self, key, value):
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    @property
+    def last_edition(self):
+        return self.get_state('last_edition', 0)
+
+    @last_edition.setter
+    def last_edition(self, value):
+        self.set_state('last_edition', value)
+
+    @property
+    def last_check(self):
+        return self.get_state('last_check')
+
+    @last_check.setter
+    def last_check(self, value):
+        self.set_state('last_check', value)
+
+    def has(self, edition_id):
+        with self._lock:
+            return self.conn.execute("SELECT 1 FROM downloads WHERE id = ?", (edition_id,)).fetchone() is not None
+
+    def missing(self, editions):
+        """Edições (dicts com 'id') que ainda não estão no registro, na ordem recebida"""
+        known = set()
+        ids = [edition['id'] for edition in editions]
+        with self._lock:
+            for start in range(0, len(ids), _LOOKUP_BATCH):
+                batch = ids[start:start + _LOOKUP_BATCH]
+                known.update(row[0] for row in self.conn.execute(
+                    f"SELECT id FROM downloads WHERE id IN ({','.join('?' * len(batch))})", batch))
+        return [edition for edition in editions if edition['id'] not in known]
+
+    def add(self, entry):
+        self.add_many([entry])
+
+    def add_many(self, entries):
+        """Registra (ou atualiza) várias edições numa única transação"""
+        with self._lock, self.conn:
+            self.conn.executemany(_UPSERT, [_entry_row(entry) for entry in entries])
+
+    def count(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM downloads").fetchone()[0]
+
+    def entries(self):
+        """Todas as edições registradas, na ordem em que foram registradas"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT id, numero, data, filename, download_date FROM downloads ORDER BY rowid").fetchall()
+        return [{'id': row[0], 'numero': row[1], 'data': row[2], 'filename': row[3], 'download_date': row[4]}
+                for row in rows]
+
+    def import_json(self, json_path):
+        """Importa uma vez o registro JSON antigo ({"last_check", "last_edition", "downloaded_files"}).
+
+        O JSON não é alterado; a importação fica anotada em state e não se repete. Retorna quantas
+        edições foram importadas (0 se já importado ou se o arquivo não existe).
+        """
+        if not os.path.exists(json_path) or self.get_state('json_importado'):
+            return 0
+        with open(json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        entries = data.get('downloaded_files', [])
+        with self._lock, self.conn:
+            self.conn.executemany(_UPSERT, [_entry_row(entry) for entry in entries])
+            if data.get('last_edition', 0) > self.last_edition:
+                self.conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('last_edition', ?)",
+                                  (json.dumps(data['last_edition']),))
+            if data.get('last_check') and not self.last_check:
+                self.conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('last_check', ?)",
+                                  (json.dumps(data['last_check']),))
+            self.conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('json_importado', ?)",
+                              (json.dumps({'arquivo': json_path, 'edicoes': len(entries),
+                                           'em': time.strftime('%Y-%m-%d %H:%M:%S')}),))
+        logger.info(f"Registro JSON importado para o SQLite: {len(entries)} edições de {json_path}")
+        return len(entries)
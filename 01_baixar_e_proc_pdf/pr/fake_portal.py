@@ -0,0 +1,231 @@
+import datetime
+import hashlib
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+LISTING_PATH = "/e-dj/publico/diario/pesquisar.do"
+DOWNLOAD_PATH = "/e-dj/publico/diario/baixar.do"
+
+
+class FakePortal:
+    """Servidor HTTP local que imita o e-DJ do TJPR, para testar e medir os downloaders sem rede.
+
+    Serve as páginas de listagem (GET com numeroPagina, como o downloader automático, ou POST com
+    pageNumber, como o tjpr_downloader) com per_page edições cada, da mais recente para a mais antiga,
+    e os PDFs de cada edição com pdf_size bytes. latency atrasa cada resposta e bandwidth (bytes/s por
+    conexão) limita a velocidade de envio dos PDFs. Com failures, cada endereço responde failure_status
+    (503 por padrão; uma sequência de códigos é usada em rodízio, tentativa a tentativa) nas primeiras
+    failures requisições, com Retry-After se retry_after for dado, para testar as novas tentativas.
+    Requisições de PDF com Range (bytes=N-) recebem 206 se ranges for verdadeiro; com
+    drop_after, a primeira resposta de cada PDF é cortada depois desse número de bytes, para testar
+    a retomada. Com pdf_files (caminhos de PDFs reais), cada edição serve um desses arquivos, em rodízio,
+    no lugar do PDF sintético, com um comentário com o número da edição depois do fim do arquivo, para
+    que edições diferentes não tenham o mesmo conteúdo. Com validators, as listagens levam ETag e
+    respondem 304 a um If-None-Match igual, e os PDFs levam ETag e só atendem o Range se o If-Range
+    bater (senão, 200 com o arquivo inteiro). Mudar revision troca o conteúdo dos PDFs sintéticos sem
+    mudar o tamanho, como um arquivo republicado. Toda requisição fica registrada em requests, e cada
+    pedido de PDF, com o cabeçalho Range recebido (ou None), em range_requests.
+    """
+
+    def __init__(self, editions=20, first_edition=3851, per_page=10, pdf_size=256 * 1024,
+                 latency=0.05, bandwidth=None, first_date=datetime.date(2026, 9, 1), failures=0,
+                 retry_after=None, ranges=True, drop_after=None, pdf_files=None,
+                 validators=True, failure_status=503):
+        self.editions = editions
+        self.first_edition = first_edition
+        self.per_page = per_page
+        self.pdf_size = pdf_size
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.first_date = first_date
+        self.failures = failures
+        self.retry_after = retry_after
+        self.failure_status = (failure_status,) if isinstance(failure_status, int) else tuple(failure_status)
+        self.ranges = ranges
+        self.drop_after = drop_after
+        self.validators = validators
+        self.revision = 0
+        self.pdf_files = []
+        for path in pdf_files or []:
+            with open(path, 'rb') as f:
+                self.pdf_files.append(f.read())
+        self._attempts = {}
+        self._dropped = set()
+        self.requests = []
+        self.range_requests = []
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def edition_numbers(self):
+        """Números das edições publicadas, da mais recente para a mais antiga"""
+        last = self.first_edition + self.editions - 1
+        return list(range(last, self.first_edition - 1, -1))
+
+    def edition_date(self, numero):
+        # A data depende só do número: publicar novas edições (aumentar editions) não muda as antigas
+        return self.first_date + datetime.timedelta(days=numero - self.first_edition)
+
+    def pdf_bytes(self, numero):
+        if self.pdf_files:
+            return (self.pdf_files[(numero - self.first_edition) % len(self.pdf_files)]
+                    + f"\n% edicao {numero}\n".encode('ascii'))
+        header = f"%PDF-1.4\n% edicao {numero}\n".encode('ascii')
+        filler = bytes((numero + self.revision + i) % 251 for i in range(251))
+        body = header + filler * (self.pdf_size // len(filler) + 1)
+        return body[:max(self.pdf_size, len(header))]
+
+    def pdf_etag(self, numero):
+        return f'"{hashlib.sha256(self.pdf_bytes(numero)).hexdigest()[:16]}"'
+
+    def listing_html(self, page):
+        numbers = self.edition_numbers()[(page - 1) * self.per_page:page * self.per_page]
+        rows = "".join(
+            f"<tr><td>{numero}</td><td>{self.edition_date(numero).strftime('%d/%m/%Y')}</td>"
+            f"<td><a href=\"javascript:downloadWindow('{DOWNLOAD_PATH}?edicao={numero}')\">Baixar</a></td></tr>\n"
+            for numero in numbers)
+        return (f"<html><body><table><tr><th>Edição</th><th>Data</th><th></th></tr>\n{rows}</table>"
+                f"</body></html>")
+
+    def count(self, path_prefix):
+        with self._lock:
+            return sum(1 for _, path in self.requests if path.startswith(path_prefix))
+
+    def start(self):
+        portal = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                params = parse_qs(url.query)
+                portal._record('GET', self.path)
+                failure = portal._failure(self.path)
+                if failure:
+                    self._unavailable(failure)
+                elif url.path == LISTING_PATH:
+                    self._listing(int(params.get('numeroPagina', ['1'])[0]))
+                elif url.path == DOWNLOAD_PATH:
+                    self._pdf(int(params.get('edicao', ['0'])[0]))
+                else:
+                    self._send(404, b"", "text/plain")
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                form = parse_qs(self.rfile.read(length).decode('utf-8'))
+                portal._record('POST', self.path)
+                failure = portal._failure(self.path)
+                if failure:
+                    self._unavailable(failure)
+                elif urlparse(self.path).path == LISTING_PATH:
+                    self._listing(int(form.get('pageNumber', ['1'])[0]))
+                else:
+                    self._send(404, b"", "text/plain")
+
+            def _listing(self, page):
+                time.sleep(portal.latency)
+                body = portal.listing_html(page).encode('utf-8')
+                if not portal.validators:
+                    self._send(200, body, "text/html; charset=utf-8")
+                    return
+                etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+                if self.headers.get('If-None-Match') == etag:
+                    self._send(304, b"", "text/html; charset=utf-8", {'ETag': etag})
+                else:
+                    self._send(200, body, "text/html; charset=utf-8", {'ETag': etag})
+
+            def _pdf(self, numero):
+                time.sleep(portal.latency)
+                if numero not in portal.edition_numbers():
+                    self._send(404, b"", "text/plain")
+                    return
+                with portal._lock:
+                    portal.range_requests.append((numero, self.headers.get('Range')))
+                body = portal.pdf_bytes(numero)
+                limit = portal.drop_after if portal._should_drop(numero) else None
+                validator = {'ETag': portal.pdf_etag(numero)} if portal.validators else {}
+                match = re.fullmatch(r'bytes=(\d+)-', self.headers.get('Range', ''))
+                if_range = self.headers.get('If-Range')
+                if not (portal.ranges and match) or (if_range is not None and if_range != validator.get('ETag')):
+                    self._send(200, body, "application/pdf",
+                               {**validator, 'Accept-Ranges': 'bytes'} if portal.ranges else validator, limit=limit)
+                    return
+                start = int(match.group(1))
+                if start >= len(body):
+                    self._send(416, b"", "text/plain", {**validator, 'Content-Range': f"bytes */{len(body)}"})
+                    return
+                self._send(206, body[start:], "application/pdf",
+                           {**validator, 'Content-Range': f"bytes {start}-{len(body) - 1}/{len(body)}"}, limit=limit)
+
+            def _unavailable(self, status):
+                headers = {'Retry-After': str(portal.retry_after)} if portal.retry_after is not None else {}
+                self._send(status, b"", "text/plain", headers)
+
+            def _send(self, status, body, content_type, headers=None, limit=None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                step = 64 * 1024
+                for offset in range(0, len(body), step):
+                    chunk = body[offset:offset + step]
+                    if limit is not None and offset + len(chunk) > limit:
+                        # Corta a conexão no meio do corpo, depois de limit bytes
+                        self.wfile.write(chunk[:max(0, limit - offset)])
+                        self.wfile.flush()
+                        self.close_connection = True
+                        return
+                    self.wfile.write(chunk)
+                    if portal.bandwidth:
+                        time.sleep(len(chunk) / portal.bandwidth)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def _record(self, method, path):
+        with self._lock:
+            self.requests.append((method, path))
+
+    def _failure(self, path):
+        """Código de erro a responder nesta tentativa, ou None"""
+        with self._lock:
+            attempt = self._attempts[path] = self._attempts.get(path, 0) + 1
+            if attempt > self.failures:
+                return None
+            return self.failure_status[(attempt - 1) % len(self.failure_status)]
+
+    def _should_drop(self, numero):
+        with self._lock:
+            if self.drop_after is None or numero in self._dropped:
+                return False
+            self._dropped.add(numero)
+            return True
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,92 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger("tjpr_autodownloader.http_cache")
+
+# Respostas guardadas; as usadas há mais tempo saem primeiro
+DEFAULT_MAX_ENTRIES = 20
+
+
+class ConditionalCache:
+    """Cache em disco (JSON) de respostas já interpretadas, revalidado a cada requisição.
+
+    Para cada chave (método e endereço) guarda ETag, Last-Modified, o SHA-256 do corpo e o valor
+    extraído dele. headers(key) dá os cabeçalhos da requisição condicional; lookup(key, response)
+    devolve o valor guardado se o servidor respondeu 304 ou mandou exatamente o mesmo corpo (para
+    portais sem validadores), e None quando o corpo mudou e precisa ser interpretado de novo.
+    not_modified, hash_matches e misses contam os três casos.
+    """
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.entries = self._load()
+        self.not_modified = 0
+        self.hash_matches = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                logger.warning(f"Cache HTTP ignorado: {e}")
+        return {}
+
+    def save(self):
+        with self._lock:
+            newest = sorted(self.entries, key=lambda key: self.entries[key]['usado'], reverse=True)
+            self.entries = {key: self.entries[key] for key in newest[:self.max_entries]}
+            data = json.dumps(self.entries, ensure_ascii=False)
+        try:
+            with open(self.path + '.tmp', 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(self.path + '.tmp', self.path)
+        except Exception as e:
+            logger.error(f"Erro ao salvar cache HTTP: {e}")
+
+    def headers(self, key):
+        """Cabeçalhos If-None-Match / If-Modified-Since da resposta guardada, se houver"""
+        with self._lock:
+            entry = self.entries.get(key)
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def lookup(self, key, response):
+        """Valor guardado se a resposta não mudou (304 ou corpo com o mesmo hash); None se mudou ou se
+        veio um 304 sem valor guardado, caso em que quem chama precisa pedir de novo sem condição"""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and response.status_code == 304:
+                self.not_modified += 1
+            elif (entry is not None and response.status_code == 200
+                  and hashlib.sha256(response.content).hexdigest() == entry['sha256']):
+                self.hash_matches += 1
+                self._update_validators(entry, response)
+            else:
+                self.misses += 1
+                return None
+            entry['usado'] = time.time()
+            return entry['valor']
+
+    def store(self, key, response, value):
+        """Guarda o valor extraído de uma resposta 200, com os validadores e o hash do corpo"""
+        entry = {'sha256': hashlib.sha256(response.content).hexdigest(), 'valor': value, 'usado': time.time()}
+        self._update_validators(entry, response)
+        with self._lock:
+            self.entries[key] = entry
+
+    @staticmethod
+    def _update_validators(entry, response):
+        entry['etag'] = response.headers.get('ETag')
+        entry['last_modified'] = response.headers.get('Last-Modified')
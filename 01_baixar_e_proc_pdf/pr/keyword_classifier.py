@@ -0,0 +1,178 @@
+import bisect
+import hashlib
+import json
+import os
+import re
+
+try:
+    # pyahocorasick é opcional; sem ele a varredura usa uma única regex com lookahead
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+# Vocabulário original do classify_blocks
+DEFAULT_KEYWORDS = {'leilão': 1.0, 'leilões': 1.0}
+
+# Vocabulário ampliado; termos ambíguos ("praça", "avaliação") pesam menos e sozinhos não classificam
+AUCTION_KEYWORDS = {
+    'leilão': 1.0,
+    'leilões': 1.0,
+    'edital de leilão': 2.0,
+    'leilão eletrônico': 1.0,
+    'leilão judicial': 1.0,
+    'leiloeiro': 1.0,
+    'leiloeira': 1.0,
+    'leiloeiro oficial': 1.0,
+    'hasta pública': 1.0,
+    'hastas públicas': 1.0,
+    'arrematação': 1.0,
+    'arrematante': 1.0,
+    'arrematar': 0.5,
+    'lance mínimo': 1.0,
+    'primeira praça': 1.0,
+    'segunda praça': 1.0,
+    '1ª praça': 1.0,
+    '2ª praça': 1.0,
+    'praça': 0.25,
+    'praceamento': 1.0,
+    'alienação judicial': 1.0,
+    'venda judicial': 0.5,
+    'comissão do leiloeiro': 1.0,
+    'preço vil': 1.0,
+    'avaliação': 0.1,
+}
+
+KEYWORD_SETS = {
+    'padrao': DEFAULT_KEYWORDS,
+    'ampliado': AUCTION_KEYWORDS,
+}
+
+# Separador entre blocos na varredura em lote; não aparece em nenhum termo
+_BLOCK_SEPARATOR = '\x00'
+
+# Tamanho das faixas de texto convertidas para minúsculas de uma vez em classify_spans
+SPAN_CHUNK_CHARS = 64 * 1024
+
+
+def load_keywords(spec):
+    """Resolve um conjunto de termos: nome em KEYWORD_SETS ou caminho de um JSON {"termo": peso}"""
+    if spec in KEYWORD_SETS:
+        return dict(KEYWORD_SETS[spec])
+    if os.path.exists(spec):
+        with open(spec, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, list):
+            return {term: 1.0 for term in data}
+        return {term: float(weight) for term, weight in data.items()}
+    raise ValueError(f"Conjunto de palavras-chave desconhecido: {spec}")
+
+
+class KeywordClassifier:
+    """Classifica blocos por palavras-chave ponderadas com uma única varredura por texto.
+
+    Todas as ocorrências de todos os termos são contadas, inclusive sobrepostas ("edital de leilão"
+    conta também "leilão"), sem diferenciar maiúsculas. O bloco é leilão quando a soma dos pesos
+    atinge min_score.
+    """
+
+    def __init__(self, keywords=None, min_score=1.0):
+        if keywords is None:
+            keywords = DEFAULT_KEYWORDS
+        elif not isinstance(keywords, dict):
+            keywords = {term: 1.0 for term in keywords}
+        self.weights = {term.lower(): float(weight) for term, weight in keywords.items() if term}
+        self.min_score = min_score
+        self._terms = sorted(self.weights, key=len, reverse=True)
+
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for term in self._terms:
+                self._automaton.add_word(term, term)
+            self._automaton.make_automaton()
+        else:
+            self._automaton = None
+            # Com os termos do mais longo ao mais curto, o lookahead encontra o mais longo em cada
+            # posição; os demais termos que casam na mesma posição são prefixos dele
+            self._pattern = re.compile('(?=(' + '|'.join(re.escape(term) for term in self._terms) + '))')
+            self._prefixes = {term: [other for other in self._terms if term.startswith(other)]
+                              for term in self._terms}
+
+    def fingerprint(self):
+        """Resumo dos termos, pesos e pontuação mínima; muda sempre que a classificação pode mudar"""
+        data = json.dumps([sorted(self.weights.items()), self.min_score], ensure_ascii=False)
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()[:16]
+
+    def _iter_matches(self, text):
+        """Gera (posição final, termo) para cada ocorrência em texto já em minúsculas"""
+        if not self._terms:
+            return
+        if self._automaton is not None:
+            yield from self._automaton.iter(text)
+            return
+        for match in self._pattern.finditer(text):
+            start = match.start()
+            for term in self._prefixes[match.group(1)]:
+                yield start + len(term) - 1, term
+
+    def count_terms(self, text):
+        """Conta as ocorrências de cada termo no texto"""
+        counts = {}
+        for _, term in self._iter_matches(text.lower()):
+            counts[term] = counts.get(term, 0) + 1
+        return counts
+
+    def score(self, text):
+        return sum(self.weights[term] * count for term, count in self.count_terms(text).items())
+
+    def classify(self, text):
+        """Retorna (é_leilão, pontuação)"""
+        score = self.score(text)
+        return score >= self.min_score, score
+
+    def classify_batch(self, texts):
+        """Classifica todos os blocos de uma edição com uma única varredura; retorna [(é_leilão, pontuação)]"""
+        texts = [text.lower() for text in texts]
+        if not texts:
+            return []
+        ends, position = [], -1
+        for text in texts:
+            position += len(text) + 1
+            ends.append(position)
+
+        scores = [0.0] * len(texts)
+        for end, term in self._iter_matches(_BLOCK_SEPARATOR.join(texts)):
+            scores[bisect.bisect_left(ends, end)] += self.weights[term]
+        return [(score >= self.min_score, score) for score in scores]
+
+    def classify_spans(self, text, spans, chunk_chars=SPAN_CHUNK_CHARS):
+        """Classifica trechos de um único texto sem copiá-los um a um; spans são objetos com start e end,
+        em ordem e sem sobreposição. Retorna [(é_leilão, pontuação)].
+
+        Os trechos são agrupados em faixas de até chunk_chars caracteres, cada faixa passa para minúsculas
+        de uma vez e é varrida uma vez (o lower() do CPython reserva 12 bytes por caractere fora do ASCII,
+        por isso o texto inteiro não é convertido de uma só vez). Se a conversão mudar o tamanho da faixa
+        (alguns caracteres Unicode viram dois), as posições deixam de valer e os trechos dela são copiados
+        como em classify_batch.
+        """
+        scores = [0.0] * len(spans)
+        first = 0
+        while first < len(spans):
+            base = spans[first].start
+            last = first + 1
+            while last < len(spans) and spans[last].end - base <= chunk_chars:
+                last += 1
+            group = spans[first:last]
+            lowered = text[base:group[-1].end].lower()
+            if len(lowered) != group[-1].end - base:
+                for index, (_, score) in enumerate(
+                        self.classify_batch([text[span.start:span.end] for span in group]), first):
+                    scores[index] = score
+            else:
+                starts = [span.start - base for span in group]
+                for end, term in self._iter_matches(lowered):
+                    # Só conta o termo inteiro dentro de um trecho
+                    index = bisect.bisect_right(starts, end - len(term) + 1) - 1
+                    if index >= 0 and end < group[index].end - base:
+                        scores[first + index] += self.weights[term]
+            first = last
+        return [(score >= self.min_score, score) for score in scores]
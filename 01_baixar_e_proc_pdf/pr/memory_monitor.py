@@ -0,0 +1,85 @@
+import gc
+import logging
+import os
+import sys
+
+try:
+    # psutil é opcional; sem ele a memória residente vem de /proc ou do módulo resource
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def current_rss_bytes():
+    """Memória residente (RSS) atual do processo, em bytes; 0 se não houver como medir"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is not None:
+        # ru_maxrss é o pico, não o valor atual: em KB no Linux e em bytes no macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+    return 0
+
+
+class MemoryMonitor:
+    """Acompanha a memória residente durante a extração no modo de memória limitada.
+
+    page_window limita quantas páginas são lidas antes de reabrir o documento (o pdfminer guarda
+    os objetos já resolvidos enquanto o arquivo está aberto). max_rss_bytes é o orçamento: ao
+    passar dele, o documento é reaberto na próxima página. O limite vale por processo. Se reabrir não
+    traz a memória para baixo do limite, reopen_interval (páginas mínimas entre reaberturas) dobra a
+    cada tentativa, para não reabrir o documento a cada página.
+    """
+
+    def __init__(self, max_rss_bytes=None, page_window=None):
+        self.max_rss_bytes = max_rss_bytes
+        self.page_window = page_window
+        self.reset()
+
+    def reset(self):
+        self.peak_rss = 0
+        self.pages = 0
+        self.reopens = 0
+        self.reopen_interval = 1
+
+    def sample(self):
+        rss = current_rss_bytes()
+        self.peak_rss = max(self.peak_rss, rss)
+        self.pages += 1
+        return rss
+
+    def over_budget(self, rss):
+        return self.max_rss_bytes is not None and rss > self.max_rss_bytes
+
+    def release(self, rss_before):
+        """Chamado após fechar o documento por excesso de memória; se a liberação não bastou, dobra
+        reopen_interval e avisa. Retorna se a memória voltou para baixo do limite."""
+        self.reopens += 1
+        gc.collect()
+        rss = current_rss_bytes()
+        if not self.over_budget(rss):
+            return True
+        self.reopen_interval *= 2
+        logging.warning(f"Memória residente em {rss / 1024 ** 2:.0f} MB após liberar o documento "
+                        f"(antes {rss_before / 1024 ** 2:.0f} MB); acima do limite de "
+                        f"{self.max_rss_bytes / 1024 ** 2:.0f} MB. Próxima reabertura por limite só após "
+                        f"{self.reopen_interval} páginas.")
+        return False
+
+    def log_peak(self, label):
+        message = (f"Memória de {label}: pico de {self.peak_rss / 1024 ** 2:.1f} MB em {self.pages} páginas, "
+                   f"{self.reopens} reaberturas por limite")
+        if self.max_rss_bytes is not None:
+            message += f" (limite {self.max_rss_bytes / 1024 ** 2:.0f} MB)"
+        logging.info(message + ".")
+        return self.peak_rss
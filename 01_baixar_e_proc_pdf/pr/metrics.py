@@ -0,0 +1,183 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+def percentile(values, fraction):
+    """Percentil por interpolação linear; values não precisa estar ordenado"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class StageMetrics:
+    """Tempos por etapa, contadores e distribuições de uma unidade de trabalho (um PDF, um download).
+
+    labels identificam a unidade no registro (arquivo, backend...). Os tempos são somados por etapa,
+    então uma etapa pode ser medida em vários trechos (por exemplo, a cada página no modo streaming).
+    Pode ser alimentado por várias threads ao mesmo tempo (os downloads paralelos de uma execução).
+    """
+
+    def __init__(self, **labels):
+        self.labels = labels
+        self.stages = {}
+        self.counters = {}
+        self.samples = {}
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        with self._lock:
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def observe(self, name, value):
+        """Guarda uma amostra (por exemplo, o tempo de cada página) para os percentis do registro"""
+        with self._lock:
+            self.samples.setdefault(name, []).append(value)
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def record(self, **extra):
+        """Registro JSON da unidade: rótulos, duração total, etapas, contadores e resumo das amostras"""
+        with self._lock:
+            return self._record(extra)
+
+    def _record(self, extra):
+        distributions = {
+            name: {'n': len(values), 'soma': round(sum(values), 6), 'p50': round(percentile(values, 0.5), 6),
+                   'p95': round(percentile(values, 0.95), 6), 'max': round(max(values), 6)}
+            for name, values in self.samples.items() if values
+        }
+        return {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started_at)),
+            **self.labels,
+            **extra,
+            'duracao': round(time.perf_counter() - self._start, 6),
+            'etapas': {name: round(seconds, 6) for name, seconds in self.stages.items()},
+            'contadores': dict(self.counters),
+            'distribuicoes': distributions,
+        }
+
+
+def summarize_records(records, fractions=(0.5, 0.9)):
+    """Distribuição de cada medida entre os registros: {nome: [n, percentis..., máximo]}.
+
+    As medidas são a duração, os campos numéricos extras, o tempo de cada etapa, cada contador e o
+    p50/p95 de cada distribuição, ou seja, um valor por registro (por execução, por PDF).
+    """
+    # Etapa ou contador ausente num registro vale zero (nada baixado, nenhuma nova tentativa)
+    stages = {name for record in records for name in record.get('etapas', {})}
+    counters = {name for record in records for name in record.get('contadores', {})}
+    values = {}
+    for record in records:
+        measures = {'duracao': record.get('duracao')}
+        measures.update((name, value) for name, value in record.items()
+                        if isinstance(value, (int, float)) and not isinstance(value, bool))
+        measures.update((f"etapa {name}", record.get('etapas', {}).get(name, 0.0)) for name in stages)
+        measures.update((f"contador {name}", record.get('contadores', {}).get(name, 0)) for name in counters)
+        for name, summary in record.get('distribuicoes', {}).items():
+            measures[f"{name} p50"] = summary.get('p50')
+            measures[f"{name} p95"] = summary.get('p95')
+        for name, value in measures.items():
+            if value is not None:
+                values.setdefault(name, []).append(value)
+    return {name: [len(samples)] + [percentile(samples, fraction) for fraction in fractions] + [max(samples)]
+            for name, samples in values.items()}
+
+
+class MetricsLog:
+    """Arquivo JSON-lines de métricas, com exportação opcional no formato texto do Prometheus.
+
+    Cada registro é gravado com uma única escrita em modo append, então vários processos podem
+    compartilhar o arquivo. A exportação Prometheus agrega todo o histórico do arquivo e é gravada
+    de forma atômica, pronta para o textfile collector do node_exporter.
+    """
+
+    def __init__(self, path, prometheus_path=None, prefix='tjpr_processador'):
+        self.path = path
+        self.prometheus_path = prometheus_path
+        self.prefix = prefix
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+    def read_records(self):
+        if not os.path.exists(self.path):
+            return []
+        records = []
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    try:
+                        records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # Linha truncada por uma interrupção; as demais continuam válidas
+                        continue
+        return records
+
+    def prometheus_text(self, records=None):
+        records = self.read_records() if records is None else records
+        stage_totals, counter_totals, status_totals = {}, {}, {}
+        for record in records:
+            for name, seconds in record.get('etapas', {}).items():
+                stage_totals[name] = stage_totals.get(name, 0.0) + seconds
+            for name, value in record.get('contadores', {}).items():
+                counter_totals[name] = counter_totals.get(name, 0) + value
+            status = 'sucesso' if record.get('sucesso', True) else 'falha'
+            status_totals[status] = status_totals.get(status, 0) + 1
+
+        prefix = self.prefix
+        lines = [f"# HELP {prefix}_unidades_total Unidades registradas por resultado.",
+                 f"# TYPE {prefix}_unidades_total counter"]
+        lines += [f'{prefix}_unidades_total{{resultado="{status}"}} {value}'
+                  for status, value in sorted(status_totals.items())]
+        lines += [f"# HELP {prefix}_etapa_segundos_total Tempo acumulado por etapa.",
+                  f"# TYPE {prefix}_etapa_segundos_total counter"]
+        lines += [f'{prefix}_etapa_segundos_total{{etapa="{name}"}} {seconds:.6f}'
+                  for name, seconds in sorted(stage_totals.items())]
+        for name, value in sorted(counter_totals.items()):
+            lines += [f"# TYPE {prefix}_{name}_total counter", f"{prefix}_{name}_total {value}"]
+
+        if records:
+            last = records[-1]
+            lines += [f"# HELP {prefix}_ultima_etapa_segundos Tempo por etapa da unidade mais recente.",
+                      f"# TYPE {prefix}_ultima_etapa_segundos gauge"]
+            lines += [f'{prefix}_ultima_etapa_segundos{{etapa="{name}"}} {seconds:.6f}'
+                      for name, seconds in sorted(last.get('etapas', {}).items())]
+            for name, summary in sorted(last.get('distribuicoes', {}).items()):
+                lines.append(f"# TYPE {prefix}_ultima_{name} summary")
+                for quantile in ('p50', 'p95'):
+                    lines.append(f'{prefix}_ultima_{name}{{quantile="0.{quantile[1:]}"}} {summary[quantile]:.6f}')
+                lines.append(f"{prefix}_ultima_{name}_sum {summary['soma']:.6f}")
+                lines.append(f"{prefix}_ultima_{name}_count {summary['n']}")
+        return '\n'.join(lines) + '\n'
+
+    def export_prometheus(self):
+        """Grava a exposição Prometheus, se configurada; retorna o caminho ou None"""
+        if not self.prometheus_path:
+            return None
+        temp_path = self.prometheus_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text())
+        os.replace(temp_path, self.prometheus_path)
+        return self.prometheus_path
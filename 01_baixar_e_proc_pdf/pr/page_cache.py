@@ -0,0 +1,162 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import time
+import zlib
+
+# Tamanho padrão máximo do cache em disco
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    doc_key TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    pdf_name TEXT,
+    num_pages INTEGER,
+    size_bytes INTEGER NOT NULL DEFAULT 0,
+    complete INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_sha256 ON documents (sha256);
+CREATE INDEX IF NOT EXISTS documents_last_used ON documents (last_used);
+CREATE TABLE IF NOT EXISTS pages (
+    doc_key TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    left_text BLOB NOT NULL,
+    right_text BLOB NOT NULL,
+    PRIMARY KEY (doc_key, page)
+);
+"""
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """SHA-256 do conteúdo do arquivo, lido em blocos"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class PageTextCache:
+    """Cache em SQLite do texto das colunas esquerda e direita de cada página.
+
+    A chave é o SHA-256 do PDF mais uma variante que descreve como o texto foi extraído
+    (geometria do recorte, extrator e versão). Só documentos completos contam como acerto.
+    Quando o tamanho total passa de max_bytes, os documentos usados há mais tempo são removidos.
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._conn = None
+
+    def __getstate__(self):
+        # A conexão não atravessa processos; cada worker abre a sua
+        return {'path': self.path, 'max_bytes': self.max_bytes, '_conn': None}
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=60)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def document_key(self, pdf_path, variant, sha256=None):
+        """Chave do documento; sha256, se já calculado por quem chama, evita ler o PDF de novo"""
+        sha256 = sha256 or file_sha256(pdf_path)
+        return hashlib.sha256(f"{sha256}|{variant}".encode('utf-8')).hexdigest(), sha256
+
+    def has(self, doc_key):
+        row = self.conn.execute("SELECT complete FROM documents WHERE doc_key = ?", (doc_key,)).fetchone()
+        return bool(row and row[0])
+
+    def iter_pages(self, doc_key):
+        """Gera (texto_esquerda, texto_direita) de cada página em ordem"""
+        with self.conn:
+            self.conn.execute("UPDATE documents SET last_used = ? WHERE doc_key = ?", (time.time(), doc_key))
+        cursor = self.conn.execute(
+            "SELECT left_text, right_text FROM pages WHERE doc_key = ? ORDER BY page", (doc_key,))
+        for left, right in cursor:
+            yield zlib.decompress(left).decode('utf-8'), zlib.decompress(right).decode('utf-8')
+
+    def begin(self, doc_key, sha256, variant, pdf_name):
+        """Inicia (ou reinicia) a gravação de um documento"""
+        now = time.time()
+        with self.conn:
+            self.conn.execute("DELETE FROM pages WHERE doc_key = ?", (doc_key,))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO documents (doc_key, sha256, variant, pdf_name, num_pages, size_bytes, "
+                "complete, created_at, last_used) VALUES (?, ?, ?, ?, NULL, 0, 0, ?, ?)",
+                (doc_key, sha256, variant, pdf_name, now, now))
+
+    def store_page(self, doc_key, page, left, right):
+        left_blob = zlib.compress(left.encode('utf-8'))
+        right_blob = zlib.compress(right.encode('utf-8'))
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO pages (doc_key, page, left_text, right_text) VALUES (?, ?, ?, ?)",
+                              (doc_key, page, left_blob, right_blob))
+            self.conn.execute("UPDATE documents SET size_bytes = size_bytes + ? WHERE doc_key = ?",
+                              (len(left_blob) + len(right_blob), doc_key))
+
+    def finish(self, doc_key, num_pages):
+        """Marca o documento como completo e aplica o limite de tamanho"""
+        with self.conn:
+            self.conn.execute("UPDATE documents SET complete = 1, num_pages = ? WHERE doc_key = ?",
+                              (num_pages, doc_key))
+        self.evict()
+
+    def total_bytes(self):
+        return self.conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM documents").fetchone()[0]
+
+    def evict(self, max_bytes=None):
+        """Remove documentos menos usados até o total caber em max_bytes; retorna quantos saíram"""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        total = self.total_bytes()
+        removed = 0
+        if total <= max_bytes:
+            return removed
+        rows = self.conn.execute("SELECT doc_key, size_bytes FROM documents ORDER BY last_used").fetchall()
+        for doc_key, size_bytes in rows:
+            if total <= max_bytes:
+                break
+            self._delete(doc_key)
+            total -= size_bytes
+            removed += 1
+        logging.info(f"Cache de páginas: {removed} documentos removidos para respeitar o limite de tamanho.")
+        return removed
+
+    def invalidate(self, pdf_path=None):
+        """Remove as entradas de um PDF (todas as variantes) ou, sem argumento, o cache inteiro"""
+        if pdf_path is None:
+            with self.conn:
+                self.conn.execute("DELETE FROM pages")
+                count = self.conn.execute("DELETE FROM documents").rowcount
+            self.conn.execute("VACUUM")
+            return count
+        sha256 = file_sha256(pdf_path)
+        rows = self.conn.execute("SELECT doc_key FROM documents WHERE sha256 = ?", (sha256,)).fetchall()
+        for (doc_key,) in rows:
+            self._delete(doc_key)
+        return len(rows)
+
+    def _delete(self, doc_key):
+        with self.conn:
+            self.conn.execute("DELETE FROM pages WHERE doc_key = ?", (doc_key,))
+            self.conn.execute("DELETE FROM documents WHERE doc_key = ?", (doc_key,))
+
+    def stats(self):
+        documents, complete = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(complete), 0) FROM documents").fetchone()
+        return {'documentos': documents, 'completos': complete, 'bytes': self.total_bytes(),
+                'limite_bytes': self.max_bytes, 'arquivo': self.path}
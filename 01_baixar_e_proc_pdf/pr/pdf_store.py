@@ -0,0 +1,192 @@
+import datetime
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger("tjpr_autodownloader.pdf_store")
+
+# Pasta do repositório de PDFs, dentro da pasta local da aplicação
+STORE_DIRNAME = "pdfs"
+INDEX_FILENAME = "indice.sqlite3"
+
+# Depois desse tempo, um processamento marcado como em andamento é tido como abandonado
+CLAIM_TIMEOUT = 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    sha256 TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    first_name TEXT NOT NULL,
+    stored_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS names (
+    filename TEXT PRIMARY KEY,
+    edition_key TEXT,
+    sha256 TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS names_edition_key ON names (edition_key);
+CREATE TABLE IF NOT EXISTS processing (
+    sha256 TEXT NOT NULL,
+    variant TEXT NOT NULL,
+    pdf_name TEXT NOT NULL,
+    done INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (sha256, variant)
+);
+"""
+
+
+def edition_key(numero, data):
+    """Chave da edição que não depende do nome do arquivo: número e data ISO ('3851_2026-09-01').
+
+    data vem da listagem (dd/mm/aaaa); datas em outro formato entram como estão.
+    """
+    try:
+        data = datetime.datetime.strptime(data.strip(), '%d/%m/%Y').date().isoformat()
+    except (AttributeError, ValueError):
+        pass
+    return f"{str(numero).strip()}_{data}"
+
+
+def default_store_dir():
+    """Repositório compartilhado pelos downloaders e pelo document_processor.
+
+    Fica fora das pastas de leitura, que são sincronizadas pelo OneDrive (o índice SQLite seria reenviado a
+    cada gravação e os objetos, duplicados na nuvem); como o cache de páginas, em LOCALAPPDATA ou na pasta
+    temporária. Os hard links exigem o mesmo volume das pastas de leitura; em outro volume viram cópias.
+    """
+    return os.path.join(os.environ.get('LOCALAPPDATA') or tempfile.gettempdir(), 'pdfai', STORE_DIRNAME)
+
+
+class PdfStore:
+    """Repositório de PDFs endereçado pelo conteúdo: cada PDF fica uma vez em objects/ab/<sha256>.pdf.
+
+    O índice em SQLite (WAL) liga o nome dado por cada downloader e a chave da edição (edition_key)
+    ao SHA-256, então os dois downloaders reconhecem a mesma edição com nomes diferentes e o mesmo
+    conteúdo publicado duas vezes. O arquivo na pasta de leitura é um hard link para o objeto (cópia
+    se o sistema de arquivos não permitir). A tabela processing marca o conteúdo já extraído pelo
+    document_processor em cada variante (modo e configuração), para o mesmo PDF não ser processado duas
+    vezes do mesmo jeito.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._conn = None
+        self._lock = threading.RLock()
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            os.makedirs(self.root, exist_ok=True)
+            self._conn = sqlite3.connect(os.path.join(self.root, INDEX_FILENAME), timeout=60,
+                                         check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(processing)")]
+            if columns and 'variant' not in columns:
+                # Tabela antiga, só pelo SHA-256: não diz com que modo e configuração o conteúdo foi processado
+                self._conn.execute("DROP TABLE processing")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def blob_path(self, sha256):
+        return os.path.join(self.root, "objects", sha256[:2], sha256 + ".pdf")
+
+    def _intact(self, sha256, size):
+        path = self.blob_path(sha256)
+        return os.path.exists(path) and os.path.getsize(path) == size
+
+    def find(self, key):
+        """(sha256, nome) de uma edição já guardada com o objeto íntegro, ou None"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT names.sha256, names.filename, blobs.size FROM names JOIN blobs USING (sha256) "
+                "WHERE names.edition_key = ? ORDER BY names.rowid DESC LIMIT 1", (key,)).fetchone()
+        if row and self._intact(row[0], row[2]):
+            return row[0], row[1]
+        return None
+
+    def add(self, path, sha256, key=None):
+        """Guarda o PDF baixado em path, cujo SHA-256 é sha256, e o indexa pelo nome e pela edição.
+
+        Conteúdo novo vai para o repositório e path passa a apontar para ele. Se o mesmo conteúdo já
+        estiver guardado, o arquivo em path é apagado e o nome com que ele foi guardado é retornado;
+        para conteúdo novo, retorna None.
+        """
+        filename = os.path.basename(path)
+        size = os.path.getsize(path)
+        with self._lock:
+            row = self.conn.execute("SELECT first_name, size FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()
+            existing = row[0] if row and self._intact(sha256, row[1]) else None
+            if existing is not None:
+                os.remove(path)
+            else:
+                blob = self.blob_path(sha256)
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                shutil.move(path, blob)
+                try:
+                    os.link(blob, path)
+                except OSError:
+                    shutil.copy2(blob, path)
+            with self.conn:
+                if existing is None:
+                    self.conn.execute("INSERT OR REPLACE INTO blobs (sha256, size, first_name, stored_at) "
+                                      "VALUES (?, ?, ?, ?)",
+                                      (sha256, size, filename, time.strftime('%Y-%m-%d %H:%M:%S')))
+                self.conn.execute("INSERT OR REPLACE INTO names (filename, edition_key, sha256) VALUES (?, ?, ?)",
+                                  (filename, key, sha256))
+        if existing is not None:
+            logger.info(f"{filename} tem o mesmo conteúdo de {existing}; não será guardado de novo")
+        return existing
+
+    def claim_processing(self, sha256, pdf_name, variant=''):
+        """Reserva o conteúdo para processamento na variante dada; retorna None se conseguiu, ou o nome do
+        PDF com o mesmo conteúdo que já foi (ou está sendo) processado nessa variante"""
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute("SELECT pdf_name, done, updated_at FROM processing "
+                                        "WHERE sha256 = ? AND variant = ?", (sha256, variant)).fetchone()
+                if row and (row[1] or time.time() - row[2] < CLAIM_TIMEOUT):
+                    self.conn.rollback()
+                    return row[0]
+                self.conn.execute("INSERT OR REPLACE INTO processing (sha256, variant, pdf_name, done, updated_at) "
+                                  "VALUES (?, ?, ?, 0, ?)", (sha256, variant, pdf_name, time.time()))
+                self.conn.commit()
+            except BaseException:
+                self.conn.rollback()
+                raise
+        return None
+
+    def finish_processing(self, sha256, pdf_name, success, variant=''):
+        """Marca o conteúdo como processado na variante, ou libera a reserva se o processamento falhou"""
+        with self._lock, self.conn:
+            if success:
+                self.conn.execute("INSERT OR REPLACE INTO processing (sha256, variant, pdf_name, done, updated_at) "
+                                  "VALUES (?, ?, ?, 1, ?)", (sha256, variant, pdf_name, time.time()))
+            else:
+                self.conn.execute("DELETE FROM processing WHERE sha256 = ? AND variant = ? AND done = 0",
+                                  (sha256, variant))
+
+    def processed_variants(self, sha256):
+        """Variantes em que o conteúdo já foi processado até o fim"""
+        with self._lock:
+            rows = self.conn.execute("SELECT variant FROM processing WHERE sha256 = ? AND done = 1",
+                                     (sha256,)).fetchall()
+        return [row[0] for row in rows]
+
+    def stats(self):
+        with self._lock:
+            blobs, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+            names = self.conn.execute("SELECT COUNT(*) FROM names").fetchone()[0]
+            processed = self.conn.execute("SELECT COUNT(DISTINCT sha256) FROM processing WHERE done = 1").fetchone()[0]
+        return {'pdfs': blobs, 'bytes': size, 'nomes': names, 'processados': processed}
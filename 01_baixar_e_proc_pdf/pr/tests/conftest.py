@@ -0,0 +1,46 @@
+import logging
+import os
+import sys
+
+# Os módulos ficam na pasta acima de tests/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# document_processor chama logging.basicConfig com o arquivo de log em BASE_DIR (caminho do Windows); com um handler
+# já registrado a chamada não tem efeito e os testes não criam arquivos fora da pasta temporária
+logging.getLogger().addHandler(logging.NullHandler())
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures")
+
+def write_pdf(path, pages, right_x=310):
+    """Grava um PDF mínimo de duas colunas; pages é uma lista de (linhas da esquerda, linhas da direita).
+
+    Texto em Helvetica 6 pt com WinAnsiEncoding, largo o bastante para as linhas do fixture caberem em
+    cada coluna da página A4; a coluna direita começa em right_x pontos.
+    """
+    objects = [b'<< /Type /Catalog /Pages 2 0 R >>', None,
+               b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>']
+    kids = []
+    for left, right in pages:
+        commands = []
+        for x, lines in ((30, left), (right_x, right)):
+            for number, line in enumerate(lines):
+                escaped = line.encode('cp1252').replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+                commands.append(b'BT /F1 6 Tf %d %d Td (%s) Tj ET' % (x, 800 - 9 * number, escaped))
+        stream = b'\n'.join(commands)
+        objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(stream), stream))
+        objects.append(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 3 0 R >> '
+                       b'>> /Contents %d 0 R >>' % len(objects))
+        kids.append(b'%d 0 R' % len(objects))
+    objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (b' '.join(kids), len(kids))
+
+    data = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+    xref = len(data)
+    data += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    data += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    data += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    with open(path, 'wb') as f:
+        f.write(data)
@@ -0,0 +1,44 @@
+import datetime
+
+from adaptive_scheduler import AdaptiveScheduler, PublicationWindow, learn_publication_window
+
+def entry(published, downloaded):
+    return {'data': published.strftime('%d/%m/%Y'), 'download_date': downloaded.strftime('%Y-%m-%d %H:%M:%S')}
+
+def test_window_learned_from_same_day_downloads():
+    day = datetime.date(2026, 9, 1)
+    entries = [entry(day + datetime.timedelta(days=n), datetime.datetime.combine(
+        day + datetime.timedelta(days=n), datetime.time(hour, minute)))
+        for n, (hour, minute) in enumerate([(10, 0), (10, 20), (10, 40), (11, 0), (11, 20), (11, 40)])]
+    # Backfill: baixada dias depois da publicação, não diz nada sobre o horário
+    entries.append(entry(day, datetime.datetime(2026, 9, 20, 3, 0)))
+    entries.append({'data': '01/09/2026'})
+
+    # Do percentil 10 (10:00) ao 90 (11:20), com meia hora de folga
+    assert learn_publication_window(entries, margin=30) == PublicationWindow(9 * 60 + 30, 11 * 60 + 50, 6)
+    # Poucas amostras: janela padrão a partir do horário configurado
+    assert learn_publication_window(entries[:4], default_start="08:15") == PublicationWindow(495, 675, 0)
+
+def test_scheduler_backs_off_and_resets_on_new_edition():
+    scheduler = AdaptiveScheduler(check=None, learn_window=None, window_interval=60, window_max=400,
+                                  idle_interval=600, max_interval=3000)
+    scheduler.window = PublicationWindow(9 * 60, 12 * 60, 6)
+    inside = datetime.datetime(2026, 9, 1, 10, 0)
+
+    assert [scheduler.next_delay(inside, False) for _ in range(5)] == [60, 120, 240, 400, 400]
+    assert scheduler.next_delay(inside, True) == 60
+    # Fora da janela: intervalo longo, mas nunca depois do início da próxima janela
+    scheduler.misses = 0
+    assert scheduler.next_delay(datetime.datetime(2026, 9, 1, 13, 0), False) == 1200
+    assert scheduler.next_delay(datetime.datetime(2026, 9, 2, 8, 50), False) == 600
+    # A entrada na janela volta ao intervalo inicial
+    assert scheduler.next_delay(datetime.datetime(2026, 9, 2, 9, 0), False) == 60
+
+def test_run_relearns_window_after_new_edition():
+    results = iter([False, True, False])
+    windows = []
+    scheduler = AdaptiveScheduler(lambda: next(results), lambda: windows.append(1) or PublicationWindow(0, 1439, 0),
+                                  window_interval=0, window_max=0)
+
+    assert scheduler.run(max_checks=3) == 3
+    assert len(windows) == 2
@@ -0,0 +1,131 @@
+import os
+import time
+
+import pytest
+
+from async_downloader import PART_SUFFIX, VALIDATOR_SUFFIX, AsyncDownloadEngine, stream_to_file
+from fake_portal import DOWNLOAD_PATH, FakePortal
+from tjpr_http import TJPRHttpClient
+
+NUMERO = 3851
+
+@pytest.fixture
+def portal():
+    with FakePortal(editions=1, pdf_size=200 * 1024, latency=0) as portal:
+        yield portal
+
+@pytest.fixture
+def http():
+    client = TJPRHttpClient(rate=1000, burst=1000, backoff_base=0.01, backoff_max=0.05)
+    yield client
+    client.close()
+
+def pdf_url(portal):
+    return f"{portal.base_url}{DOWNLOAD_PATH}?edicao={NUMERO}"
+
+def write_part(filepath, data, validator=None):
+    with open(filepath + PART_SUFFIX, 'wb') as f:
+        f.write(data)
+    if validator is not None:
+        with open(filepath + PART_SUFFIX + VALIDATOR_SUFFIX, 'w', encoding='utf-8') as f:
+            f.write(validator)
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def assert_downloaded(filepath, expected, streamed):
+    assert read(filepath) == expected
+    assert streamed.size == len(expected)
+    assert not os.path.exists(filepath + PART_SUFFIX)
+    assert not os.path.exists(filepath + PART_SUFFIX + VALIDATOR_SUFFIX)
+
+def test_partial_file_resumed_when_validator_matches(portal, http, tmp_path):
+    filepath = str(tmp_path / 'diario.pdf')
+    expected = portal.pdf_bytes(NUMERO)
+    write_part(filepath, expected[:50000], portal.pdf_etag(NUMERO))
+
+    streamed = stream_to_file(http, pdf_url(portal), filepath)
+
+    assert_downloaded(filepath, expected, streamed)
+
+def test_complete_stale_part_is_not_finalized(portal, http, tmp_path):
+    # .part completo de uma versão anterior, com o mesmo tamanho: o 416 traz outro ETag
+    filepath = str(tmp_path / 'diario.pdf')
+    stale, stale_etag = portal.pdf_bytes(NUMERO), portal.pdf_etag(NUMERO)
+    portal.revision = 1
+    expected = portal.pdf_bytes(NUMERO)
+    assert len(stale) == len(expected) and stale != expected
+    write_part(filepath, stale, stale_etag)
+
+    streamed = stream_to_file(http, pdf_url(portal), filepath)
+
+    assert_downloaded(filepath, expected, streamed)
+
+def test_partial_stale_part_restarts_through_if_range(portal, http, tmp_path):
+    filepath = str(tmp_path / 'diario.pdf')
+    stale_etag = portal.pdf_etag(NUMERO)
+    stale = portal.pdf_bytes(NUMERO)[:50000]
+    portal.revision = 1
+    write_part(filepath, stale, stale_etag)
+
+    streamed = stream_to_file(http, pdf_url(portal), filepath)
+
+    assert_downloaded(filepath, portal.pdf_bytes(NUMERO), streamed)
+
+def test_part_without_validator_restarts(portal, http, tmp_path):
+    filepath = str(tmp_path / 'diario.pdf')
+    expected = portal.pdf_bytes(NUMERO)
+    # Mesmo um .part completo, sem validador, é baixado de novo
+    write_part(filepath, expected)
+
+    streamed = stream_to_file(http, pdf_url(portal), filepath)
+
+    assert_downloaded(filepath, expected, streamed)
+    assert portal.count(DOWNLOAD_PATH) == 1
+
+def portal_editions(portal):
+    return [{'url': f"{portal.base_url}{DOWNLOAD_PATH}?edicao={numero}", 'filename': f"PR_diario_{numero}.pdf",
+             'numero': str(numero), 'data': portal.edition_date(numero).strftime('%d/%m/%Y')}
+            for numero in portal.edition_numbers()]
+
+def download_all(portal, http, tmp_path):
+    # Blocos pequenos: numa queda, só os blocos já completos chegam ao .part
+    engine = AsyncDownloadEngine(http, str(tmp_path), concurrency=2, chunk_size=16 * 1024)
+    results = engine.download_all(portal_editions(portal))
+    assert [result.error for result in results] == [None] * len(results)
+    for result in results:
+        assert read(result.path) == portal.pdf_bytes(int(result.edition['numero']))
+        assert not os.path.exists(result.path + PART_SUFFIX)
+    return results
+
+def ranges_by_edition(portal):
+    requested = {}
+    for numero, range_header in portal.range_requests:
+        requested.setdefault(numero, []).append(range_header)
+    return requested
+
+def test_engine_resumes_after_dropped_connection(http, tmp_path):
+    with FakePortal(editions=3, pdf_size=200 * 1024, latency=0, drop_after=70000) as portal:
+        download_all(portal, http, tmp_path)
+    for numero, ranges in ranges_by_edition(portal).items():
+        # Primeira resposta cortada; a segunda continua de onde o .part parou
+        assert ranges[0] is None
+        assert len(ranges) == 2 and ranges[1].startswith('bytes=') and ranges[1] != 'bytes=0-'
+
+def test_engine_restarts_when_server_ignores_range(http, tmp_path):
+    with FakePortal(editions=3, pdf_size=200 * 1024, latency=0, drop_after=70000, ranges=False) as portal:
+        results = download_all(portal, http, tmp_path)
+    assert all(len(ranges) == 2 for ranges in ranges_by_edition(portal).values())
+    assert [result.bytes for result in results] == [200 * 1024] * 3
+
+def test_engine_waits_retry_after_on_429(http, tmp_path):
+    with FakePortal(editions=2, pdf_size=32 * 1024, latency=0, failures=1, failure_status=429,
+                    retry_after=1) as portal:
+        start = time.perf_counter()
+        download_all(portal, http, tmp_path)
+        elapsed = time.perf_counter() - start
+    # Uma nova tentativa por PDF, depois do Retry-After (bem maior que o backoff configurado no cliente)
+    assert http.retries == 2
+    assert portal.count(DOWNLOAD_PATH) == 4
+    assert elapsed >= 1.0
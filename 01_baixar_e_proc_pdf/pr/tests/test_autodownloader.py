@@ -0,0 +1,174 @@
+import os
+
+import pytest
+
+from async_downloader import DownloadResult
+from backfill import Backfill
+from benchmark_downloads import load_autodownloader
+from download_pipeline import ProcessingPipeline
+from fake_portal import DOWNLOAD_PATH, FakePortal
+from pdf_store import default_store_dir, edition_key
+
+autodownloader = load_autodownloader()
+
+@pytest.fixture
+def portal():
+    with FakePortal(editions=6, per_page=10, pdf_size=64 * 1024, latency=0) as portal:
+        yield portal
+
+def make_downloader(portal, tmp_path, **options):
+    return autodownloader.DiarioDownloader(str(tmp_path / '00 - para leitura'), str(tmp_path / 'script'),
+                                           base_url=portal.base_url, rate=1000, store_dir=str(tmp_path / 'pdfs'),
+                                           **options)
+
+def downloaded_files(downloader):
+    return sorted(name for name in os.listdir(downloader.download_dir) if name.endswith('.pdf'))
+
+def test_verify_missing_editions_shares_one_engine(portal, tmp_path, monkeypatch):
+    downloader = make_downloader(portal, tmp_path, concurrency=3)
+    engines = []
+    build_engine = downloader._download_engine
+    monkeypatch.setattr(downloader, '_download_engine', lambda: engines.append(build_engine()) or engines[-1])
+
+    downloaded = downloader.verify_missing_editions(limit=6)
+
+    assert len(downloaded) == 6
+    assert len(engines) == 1
+    assert len(downloaded_files(downloader)) == 6
+
+def check_pdf(path, **options):
+    """No lugar do process_single_file no pool do pipeline: confere o PDF que chegou à fila"""
+    with open(path, 'rb') as f:
+        return path, f.read(5) == b'%PDF-' and os.path.getsize(path) == 64 * 1024, None
+
+def test_pipeline_retries_5xx_and_429(tmp_path):
+    # Cada endereço (listagem e PDFs) responde 503 e depois 429 antes de funcionar
+    with FakePortal(editions=6, per_page=10, pdf_size=64 * 1024, latency=0, failures=2,
+                    failure_status=(503, 429), retry_after=0) as portal:
+        downloader = make_downloader(portal, tmp_path, concurrency=3)
+        downloader.http.backoff_base = 0.01
+        pipeline = ProcessingPipeline(process_workers=1, queue_size=1, metrics_log=None, cache=None)
+        pipeline._process = check_pdf
+        try:
+            downloaded = downloader.check_and_download_new_editions(pipeline)
+        finally:
+            results = pipeline.close()
+        paths = {path for _, path in portal.requests}
+
+    assert sorted(int(edition['numero']) for edition in downloaded) == sorted(portal.edition_numbers())
+    # Duas novas tentativas por endereço pedido: páginas da listagem e cada PDF
+    assert downloader.http.retries == 2 * len(paths)
+    assert sum(path.startswith(DOWNLOAD_PATH) for path in paths) == 6
+    assert sorted(os.path.basename(path) for path, ok, _ in results if ok) == downloaded_files(downloader)
+    assert len(results) == 6
+
+def test_backfill_retries_failed_editions_on_next_run(portal, tmp_path, monkeypatch):
+    downloader = make_downloader(portal, tmp_path, concurrency=2)
+    build_engine = downloader._download_engine
+
+    def failing_engine():
+        engine = build_engine()
+        fetch = engine.fetch
+        engine.fetch = lambda edition: (DownloadResult(edition, False, None, 0, 0.0, "falha simulada")
+                                        if edition['numero'] == '3853' else fetch(edition))
+        return engine
+
+    monkeypatch.setattr(downloader, '_download_engine', failing_engine)
+    Backfill(downloader, 3851, 3856, shard_size=3).run()
+    assert '3853' not in ' '.join(downloaded_files(downloader))
+    assert len(downloaded_files(downloader)) == 5
+
+    monkeypatch.setattr(downloader, '_download_engine', build_engine)
+    Backfill(downloader, 3851, 3856, shard_size=3).run()
+    assert len(downloaded_files(downloader)) == 6
+    assert downloader.registry.missing([{'id': edition['id']} for edition in
+                                        downloader.get_all_editions(max_editions=6)]) == []
+
+def test_download_file_registers_edition_key(portal, tmp_path):
+    downloader = make_downloader(portal, tmp_path)
+    edition = downloader.get_all_editions(max_editions=1)[0]
+
+    assert downloader.download_file(edition) is True
+    _, filename = downloader.store.find(edition_key(edition['numero'], edition['data']))
+    assert filename == edition['filename']
+
+def test_default_store_dir_is_local(monkeypatch, tmp_path):
+    monkeypatch.setenv('LOCALAPPDATA', str(tmp_path))
+    assert default_store_dir() == os.path.join(str(tmp_path), 'pdfai', 'pdfs')
+
+def test_last_edition_advances_only_to_downloaded_editions(portal, tmp_path, monkeypatch):
+    downloader = make_downloader(portal, tmp_path)
+    downloader.registry.last_edition = 3850
+    build_engine = downloader._download_engine
+
+    def failing_engine():
+        engine = build_engine()
+        fetch = engine.fetch
+        engine.fetch = lambda edition: (DownloadResult(edition, False, None, 0, 0.0, "falha simulada")
+                                        if edition['numero'] == '3856' else fetch(edition))
+        return engine
+
+    monkeypatch.setattr(downloader, '_download_engine', failing_engine)
+    assert len(downloader.check_and_download_new_editions()) == 5
+    assert downloader.registry.last_edition == 3855
+
+    monkeypatch.setattr(downloader, '_download_engine', build_engine)
+    assert [edition['numero'] for edition in downloader.check_and_download_new_editions()] == ['3856']
+    assert downloader.registry.last_edition == 3856
+
+def count_parses(downloader, monkeypatch, parsed):
+    parse_listing_page = downloader._parse_listing_page
+    monkeypatch.setattr(downloader, '_parse_listing_page', lambda html: parsed.append(1) or parse_listing_page(html))
+
+@pytest.mark.parametrize('validators', [True, False])
+def test_unchanged_listing_pages_are_not_parsed_again(tmp_path, monkeypatch, validators):
+    with FakePortal(editions=7, per_page=1, pdf_size=1024, latency=0, validators=validators) as portal:
+        parsed = []
+        downloader = make_downloader(portal, tmp_path)
+        count_parses(downloader, monkeypatch, parsed)
+        first = downloader.get_all_editions(max_editions=7, max_pages=7)
+        assert len(parsed) == 7
+
+        # Outra execução, com o cache relido do disco: nenhuma das sete páginas é interpretada de novo
+        downloader = make_downloader(portal, tmp_path)
+        count_parses(downloader, monkeypatch, parsed)
+        assert downloader.get_all_editions(max_editions=7, max_pages=7) == first
+        assert len(parsed) == 7
+
+def test_listing_304_without_stored_entry_is_requested_again(portal, tmp_path, monkeypatch):
+    cached = make_downloader(portal, tmp_path / 'a')
+    editions = cached.fetch_listing_page(1)
+    # Outro processo com o cache vazio, mas que mandou os validadores da entrada que já saiu do cache
+    downloader = make_downloader(portal, tmp_path / 'b')
+    monkeypatch.setattr(downloader.http_cache, 'headers', cached.http_cache.headers)
+    requests_before = len(portal.requests)
+
+    assert downloader.fetch_listing_page(1) == editions
+    assert len(portal.requests) - requests_before == 2
+    # A resposta completa ficou guardada: o próximo 304 já é atendido pelo cache
+    assert downloader.fetch_listing_page(1) == editions
+    assert downloader.http_cache.not_modified == 1
+
+def test_run_metrics_record_and_summary(portal, tmp_path, monkeypatch, capsys):
+    downloader = make_downloader(portal, tmp_path, concurrency=2)
+    with downloader.run_metrics('check'):
+        downloader.check_and_download_new_editions()
+    with downloader.run_metrics('check'):
+        downloader.check_and_download_new_editions()
+
+    first, second = downloader.metrics_log.read_records()
+    assert first['comando'] == 'check' and first['sucesso'] is True
+    assert first['contadores']['pdfs'] == 6 and first['contadores']['bytes'] == 6 * 64 * 1024
+    assert first['distribuicoes']['download_segundos']['n'] == 6
+    assert {'listagem', 'parse', 'download'} <= set(first['etapas'])
+    assert first['vazao_mb_s'] > 0
+    # Nada novo na segunda execução: a listagem é atendida pelo cache condicional
+    assert second['contadores'].get('pdfs', 0) == 0 and second['contadores']['listagem_304'] >= 1
+
+    monkeypatch.setattr(autodownloader, 'SCRIPT_DIR', str(tmp_path / 'script'))
+    autodownloader.print_metrics_summary(runs=2)
+    out = capsys.readouterr().out
+    assert 'Métricas das últimas 2 execuções' in out and 'check: 2 execuções' in out
+    [pdfs] = [line.split() for line in out.splitlines() if line.split()[:2] == ['contador', 'pdfs']]
+    # n, p50, p90 e máximo entre as duas execuções (6 e 0 PDFs)
+    assert pdfs[2:] == ['2', '3.000', '5.400', '6.000']
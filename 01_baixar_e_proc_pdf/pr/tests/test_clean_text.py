@@ -0,0 +1,96 @@
+import os
+
+import pytest
+
+from conftest import FIXTURES_DIR
+from document_processor import (block_spans, blocks_from_offsets, classify_block_spans, classify_blocks, clean_text,
+                                extract_blocks, extract_index, extract_publication_date, extract_publication_number,
+                                iter_cleaned_segments, preprocess_text, verify_cleaner)
+from keyword_classifier import AUCTION_KEYWORDS, KeywordClassifier
+
+FIXTURE = os.path.join(FIXTURES_DIR, "diario_texto_bruto.txt")
+
+def assert_same_as_legacy(text):
+    """clean_text deve reproduzir exatamente preprocess_text, extract_publication_* e extract_blocks"""
+    cleaned = clean_text(text)
+    reference = preprocess_text(text)
+    assert cleaned.text == reference
+    assert (cleaned.pub_date or "Data não encontrada") == extract_publication_date(text)
+    assert (cleaned.pub_number or "Número não encontrado") == extract_publication_number(text)
+    expected_blocks = extract_blocks(reference)
+    assert blocks_from_offsets(cleaned.text, cleaned.materia_offsets) == expected_blocks
+    assert [(span.id_materia(cleaned.text), span.content(cleaned.text))
+            for span in block_spans(cleaned.text, cleaned.materia_offsets)] == expected_blocks
+
+def test_fixture_matches_legacy():
+    with open(FIXTURE, encoding='utf-8') as file:
+        text = file.read()
+    assert_same_as_legacy(text)
+    cleaned = clean_text(text)
+    assert cleaned.pub_date == "05/05/2024"
+    assert cleaned.pub_number == "3850"
+    assert [id_materia for id_materia, _ in blocks_from_offsets(cleaned.text, cleaned.materia_offsets)] == [
+        'IDMATERIA1008IDMATERIA', 'IDMATERIA1009IDMATERIA', 'IDMATERIA1010IDMATERIA', 'IDMATERIA1011IDMATERIA',
+        'IDMATERIA1013IDMATERIA']
+
+def test_verify_cleaner_fixture(capsys):
+    assert verify_cleaner([FIXTURE])
+    assert 'OK' in capsys.readouterr().out
+
+# Casos em que uma remoção junta os dois lados e forma outro padrão; o caminho antigo remove de novo na passada
+# seguinte, então clean_text precisa chegar ao mesmo texto
+@pytest.mark.parametrize('text', [
+    '-ribunal de Justiça do Paraná 5 -',
+    '7IDMATERIA- 4 -7IDMATERIA',
+    '(#Pag) -ribunal de Justiça do Paraná 5 -',
+    'Diário Eletrônico do T- 3 -ribunal de Justiça do Paraná',
+    'Curitiba, 5 de aIDMATERIA7IDMATERIAmaio de 2024',
+    'texto\n- 12 -\n-\nIDMATERIA1IDMATERIA conteúdo',
+    'IDMATERIA- 1 -1IDMATERIA bloco (#Pag) -',
+])
+def test_joined_patterns_match_legacy(text):
+    assert_same_as_legacy(text)
+
+def full_path_index(text):
+    cleaned = clean_text(text)
+    return extract_index(cleaned.text[:cleaned.materia_offsets[0]] if cleaned.materia_offsets else cleaned.text)
+
+def streaming_index(pages):
+    return extract_index(next(iter_cleaned_segments(pages, {})))
+
+@pytest.mark.parametrize('pages', [
+    ['Índice de Publicação Tribunal Pleno 1 ', 'Câmaras 2 IDMATERIA1IDMATERIA bloco'],
+    ['Índice de Publicação Tribunal Pleno 1 Câmaras 2'],
+    ['Sem índice IDMATERIA1IDMATERIA bloco'],
+])
+def test_index_same_in_full_and_streaming(pages):
+    assert full_path_index(''.join(pages)) == streaming_index(pages)
+
+def test_index_fixture():
+    with open(FIXTURE, encoding='utf-8') as file:
+        text = file.read()
+    assert full_path_index(text).startswith('Índice de Publicação Tribunal de Justiça')
+    assert full_path_index(text).endswith('Comarcas do Interior .................................. 3')
+
+# "İ" vira dois caracteres em minúsculas: a faixa que o contém cai na cópia trecho a trecho
+SPAN_TEXT = ('Índice IDMATERIA1IDMATERIA  Edital de LEILÃO do imóvel. IDMATERIA2IDMATERIA Decisão sem termos, '
+             'edital de IDMATERIA3IDMATERIA leilão na borda IDMATERIA4IDMATERIA İntimação da hasta pública. '
+             'IDMATERIA5IDMATERIA Arrematação e leiloeiro oficial.\n IDMATERIA6IDMATERIA\n')
+
+@pytest.mark.parametrize('chunk_chars', [1, 40, 64 * 1024])
+def test_block_spans_classify_like_blocks(chunk_chars):
+    with open(FIXTURE, encoding='utf-8') as file:
+        fixture_text = file.read()
+    classifier = KeywordClassifier(AUCTION_KEYWORDS)
+    for text in (fixture_text, SPAN_TEXT):
+        cleaned = clean_text(text)
+        blocks = extract_blocks(cleaned.text)
+        spans = block_spans(cleaned.text, cleaned.materia_offsets)
+        assert (classifier.classify_spans(cleaned.text, spans, chunk_chars=chunk_chars)
+                == classifier.classify_batch([block for _, block in blocks]))
+        leiloes, decretos = classify_block_spans(cleaned.text, spans, classifier)
+        assert ([(span.id_materia(cleaned.text), span.content(cleaned.text)) for span in leiloes],
+                [(span.id_materia(cleaned.text), span.content(cleaned.text)) for span in decretos]) == (
+                    classify_blocks(blocks, classifier=classifier))
+    assert [id_materia for id_materia, _ in classify_blocks(extract_blocks(SPAN_TEXT), classifier=classifier)[0]] == [
+        'IDMATERIA1IDMATERIA', 'IDMATERIA3IDMATERIA', 'IDMATERIA4IDMATERIA', 'IDMATERIA5IDMATERIA']
@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+import keyword_classifier
+from keyword_classifier import AUCTION_KEYWORDS, KeywordClassifier, load_keywords
+
+BLOCKS = [
+    'EDITAL DE LEILÃO e intimação; o leiloeiro oficial fará a primeira praça.',
+    'Decisão: defiro a avaliação do imóvel.',
+    'Hasta Pública do veículo, lance mínimo de 60% da avaliação; arrematação em leilões eletrônicos.',
+    '',
+]
+
+@pytest.fixture(params=['automato', 'regex'])
+def make_classifier(request, monkeypatch):
+    if request.param == 'automato':
+        pytest.importorskip('ahocorasick')
+    else:
+        monkeypatch.setattr(keyword_classifier, 'ahocorasick', None)
+    return KeywordClassifier
+
+def test_overlapping_terms_are_all_weighted(make_classifier):
+    classifier = make_classifier(AUCTION_KEYWORDS)
+    # "edital de leilão" conta também "leilão"; "leiloeiro oficial" também "leiloeiro"; "primeira praça" também "praça"
+    assert classifier.count_terms(BLOCKS[0]) == {'edital de leilão': 1, 'leilão': 1, 'leiloeiro oficial': 1,
+                                                 'leiloeiro': 1, 'primeira praça': 1, 'praça': 1}
+    assert classifier.classify(BLOCKS[0]) == (True, 2.0 + 1.0 + 1.0 + 1.0 + 1.0 + 0.25)
+    # Termo ambíguo sozinho não classifica
+    assert classifier.classify(BLOCKS[1]) == (False, 0.1)
+
+def test_batch_matches_one_block_at_a_time(make_classifier):
+    classifier = make_classifier(AUCTION_KEYWORDS)
+    assert classifier.classify_batch(BLOCKS) == [classifier.classify(block) for block in BLOCKS]
+    assert classifier.classify_batch([]) == []
+
+def test_default_vocabulary_and_keyword_files(tmp_path):
+    assert KeywordClassifier().classify_batch(BLOCKS) == [(True, 1.0), (False, 0.0), (True, 1.0), (False, 0.0)]
+    path = tmp_path / 'termos.json'
+    path.write_text(json.dumps(['Praça']), encoding='utf-8')
+    assert KeywordClassifier(load_keywords(str(path))).classify(BLOCKS[0]) == (True, 1.0)
+    with pytest.raises(ValueError):
+        load_keywords('inexistente')
@@ -0,0 +1,45 @@
+import document_processor
+import memory_monitor
+from memory_monitor import MemoryMonitor
+
+def fake_backend(opens):
+    def pages(pdf_path, start=0, end=None, **options):
+        opens.append(start)
+        for number in range(start, end):
+            yield (f'página {number}', '')
+    return pages
+
+def test_bounded_extraction_stops_reopening_when_release_does_not_help(monkeypatch, caplog):
+    opens = []
+    monkeypatch.setitem(document_processor.PDF_BACKENDS, 'falso', fake_backend(opens))
+    # A memória nunca volta para baixo do limite, por mais que o documento seja reaberto
+    monkeypatch.setattr(memory_monitor, 'current_rss_bytes', lambda: 10 * 1024 ** 2)
+    memory = MemoryMonitor(max_rss_bytes=1024 ** 2)
+
+    pages = list(document_processor._iter_columns_bounded('diario.pdf', 100, memory, backend='falso'))
+
+    assert pages == [(f'página {number}', '') for number in range(100)]
+    # Reaberturas após 1, 2, 4, 8, 16 e 32 páginas em vez de uma por página
+    assert opens == [0, 1, 3, 7, 15, 31, 63]
+    assert memory.reopens == 6 and memory.reopen_interval == 64
+    assert len([record for record in caplog.records if 'Próxima reabertura' in record.getMessage()]) == 6
+
+def test_bounded_extraction_reopens_while_release_helps(monkeypatch):
+    opens = []
+    monkeypatch.setitem(document_processor.PDF_BACKENDS, 'falso', fake_backend(opens))
+    monkeypatch.setattr(memory_monitor, 'current_rss_bytes', lambda: 0)
+    memory = MemoryMonitor(max_rss_bytes=1024 ** 2)
+    # Passa do limite a cada 10 páginas e a liberação traz a memória de volta
+    sampled = []
+
+    def sample():
+        sampled.append(1)
+        return 10 * 1024 ** 2 if len(sampled) % 10 == 0 else 0
+
+    monkeypatch.setattr(memory, 'sample', sample)
+
+    pages = list(document_processor._iter_columns_bounded('diario.pdf', 35, memory, backend='falso'))
+
+    assert len(pages) == 35
+    assert opens == [0, 10, 20, 30]
+    assert memory.reopen_interval == 1
@@ -0,0 +1,51 @@
+import pytest
+
+import document_processor
+from conftest import write_pdf
+from page_cache import PageTextCache
+
+PAGES = [(['IDMATERIA1IDMATERIA', 'Edital de leilão.'], ['Decisão.']), (['IDMATERIA2IDMATERIA', 'Despacho.'], [])]
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = PageTextCache(str(tmp_path / 'cache' / 'paginas.sqlite3'))
+    yield cache
+    cache.close()
+
+def no_extraction(*args, **options):
+    raise AssertionError("extração com o documento no cache")
+
+def test_hit_skips_extraction_and_layout_is_part_of_the_key(tmp_path, cache, monkeypatch):
+    pdf_path = str(tmp_path / 'diario.pdf')
+    write_pdf(pdf_path, PAGES)
+    text = document_processor.process_pdf_file(pdf_path, cache=cache)
+    assert 'Edital de leilão.' in text and cache.stats()['completos'] == 1
+
+    monkeypatch.setattr(document_processor, '_iter_columns_serial', no_extraction)
+    assert document_processor.process_pdf_file(pdf_path, cache=cache) == text
+    # Outro layout de extração é outra entrada: a extração roda (e aqui falha)
+    assert document_processor.process_pdf_file(pdf_path, cache=cache, layout='gutter') == ''
+
+def test_incomplete_document_is_not_a_hit(cache):
+    cache.begin('doc', 'sha', 'variante', 'diario.pdf')
+    cache.store_page('doc', 0, 'esquerda', 'direita')
+    assert not cache.has('doc')
+    cache.finish('doc', 1)
+    assert cache.has('doc') and list(cache.iter_pages('doc')) == [('esquerda', 'direita')]
+
+def test_eviction_removes_least_recently_used_and_invalidate_by_pdf(tmp_path, cache):
+    for number, doc_key in enumerate(['antigo', 'usado', 'novo']):
+        cache.begin(doc_key, f'sha{number}', 'variante', f'{doc_key}.pdf')
+        cache.store_page(doc_key, 0, doc_key * 100, '')
+        cache.finish(doc_key, 1)
+    list(cache.iter_pages('antigo'))
+
+    # Um byte acima do limite: sai só o documento usado há mais tempo
+    assert cache.evict(max_bytes=cache.total_bytes() - 1) == 1
+    assert not cache.has('usado') and cache.has('antigo') and cache.has('novo')
+
+    pdf_path = str(tmp_path / 'diario.pdf')
+    write_pdf(pdf_path, PAGES)
+    document_processor.process_pdf_file(pdf_path, cache=cache)
+    assert cache.invalidate(pdf_path) == 1
+    assert cache.stats()['documentos'] == 2
@@ -0,0 +1,28 @@
+import pdfplumber
+
+from conftest import write_pdf
+from document_processor import extract_page_columns, extract_page_columns_gutter
+
+def columns(pdf_path, extract):
+    with pdfplumber.open(pdf_path) as pdf:
+        return [extract(page) for page in pdf.pages]
+
+def test_gutter_matches_crop_on_regular_two_column_page(tmp_path):
+    pdf_path = str(tmp_path / 'diario.pdf')
+    write_pdf(pdf_path, [(['IDMATERIA1IDMATERIA', 'Edital de leilão do imóvel.'], ['Decisão da coluna direita.'])])
+    assert columns(pdf_path, extract_page_columns_gutter) == columns(pdf_path, extract_page_columns) == [
+        ('IDMATERIA1IDMATERIA\nEdital de leilão do imóvel.', 'Decisão da coluna direita.')]
+
+def test_gutter_follows_shifted_column(tmp_path):
+    pdf_path = str(tmp_path / 'diario.pdf')
+    # A coluna direita começa antes do corte fixo (48,8% da largura): o recorte perde o começo das linhas
+    right = 'Decisão da coluna direita, com uma linha que segue até a margem.'
+    write_pdf(pdf_path, [(['Curto à esquerda.'], [right])], right_x=250)
+    assert columns(pdf_path, extract_page_columns)[0][1] != right
+    assert columns(pdf_path, extract_page_columns_gutter) == [('Curto à esquerda.', right)]
+
+def test_page_without_gutter_goes_to_left_column(tmp_path):
+    pdf_path = str(tmp_path / 'indice.pdf')
+    line = 'Índice de Publicação: Tribunal de Justiça, Comarca da Região Metropolitana de Curitiba e Comarcas do Interior'
+    write_pdf(pdf_path, [([line, line], [])])
+    assert columns(pdf_path, extract_page_columns_gutter) == [(line + '\n' + line, '')]
@@ -0,0 +1,260 @@
+import os
+
+import pytest
+
+import document_processor
+import page_cache
+from conftest import FIXTURES_DIR, write_pdf
+from document_processor import SKIPPED, EditionProbe, process_all_files, process_single_file, processing_variant
+from keyword_classifier import AUCTION_KEYWORDS, KeywordClassifier
+from metrics import MetricsLog
+from page_cache import file_sha256
+
+FOLDERS = ['00 - para leitura', '01 - arquivos lidos', '02 - arquivos com leilões', '03 - arquivos com decretos']
+
+@pytest.fixture(autouse=True)
+def store_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(document_processor, 'STORE_DIR', str(tmp_path / 'pdfs'))
+
+@pytest.fixture
+def base_dir(tmp_path, monkeypatch):
+    for folder in FOLDERS:
+        os.makedirs(tmp_path / folder)
+    monkeypatch.setattr(document_processor, 'BASE_DIR', str(tmp_path))
+    return tmp_path
+
+def add_pdf(base_dir, name, content=b'%PDF-1.4 diario'):
+    path = base_dir / '00 - para leitura' / name
+    path.write_bytes(content)
+    return str(path)
+
+def add_processed_edition(base_dir, pub_date, pub_number):
+    with open(base_dir / '01 - arquivos lidos' / 'diario_anterior.txt', 'w', encoding='utf-8') as f:
+        f.write(f"Data de Publicação: {pub_date}\nNúmero da Publicação: {pub_number}\n")
+
+def test_probe_match_is_moved_and_counted_as_skipped(base_dir, monkeypatch, capsys):
+    add_processed_edition(base_dir, '05/05/2024', '3850')
+    monkeypatch.setattr(document_processor, 'probe_edition',
+                        lambda path: EditionProbe('05/05/2024', '3850', None, 1, 0.0))
+    pdf_path = add_pdf(base_dir, 'copia.pdf')
+
+    results = process_all_files()
+
+    assert results == [(pdf_path, SKIPPED, None)]
+    assert not os.path.exists(pdf_path)
+    assert os.path.exists(base_dir / '01 - arquivos lidos' / 'copia.pdf')
+    assert "0/1 arquivos processados com sucesso, 1 ignorados" in capsys.readouterr().out
+
+def test_probe_skipped_without_processed_editions(base_dir, monkeypatch):
+    def fail(path):
+        raise AssertionError("sondagem sem edições processadas")
+
+    monkeypatch.setattr(document_processor, 'probe_edition', fail)
+    monkeypatch.setattr(document_processor, '_process_single_file_full', lambda path, **options: True)
+    assert process_single_file(add_pdf(base_dir, 'novo.pdf')) is True
+
+def test_same_content_skipped_only_in_same_variant(base_dir, monkeypatch):
+    runs = []
+    monkeypatch.setattr(document_processor, '_process_single_file_full',
+                        lambda path, **options: runs.append(os.path.basename(path)) or True)
+
+    assert process_single_file(add_pdf(base_dir, 'a.pdf')) is True
+    # Mesmo conteúdo, mesma configuração: ignorado e retirado da pasta de leitura
+    copy_path = add_pdf(base_dir, 'b.pdf')
+    assert process_single_file(copy_path) == SKIPPED
+    assert not os.path.exists(copy_path)
+    assert os.path.exists(base_dir / '01 - arquivos lidos' / 'b.pdf')
+    # Outro vocabulário: o mesmo conteúdo é processado de novo, sem sondagem
+    monkeypatch.setattr(document_processor, 'probe_edition', lambda path: pytest.fail("sondagem desnecessária"))
+    add_processed_edition(base_dir, '05/05/2024', '3850')
+    assert process_single_file(add_pdf(base_dir, 'c.pdf'),
+                               classifier=KeywordClassifier(AUCTION_KEYWORDS)) is True
+    assert runs == ['a.pdf', 'c.pdf']
+
+def test_auctions_run_does_not_mark_full_run_done(base_dir):
+    store = document_processor._content_store()
+    sha256 = file_sha256(add_pdf(base_dir, 'a.pdf'))
+    auctions = processing_variant(auctions_only=True)
+    assert store.claim_processing(sha256, 'a.pdf', auctions) is None
+    store.finish_processing(sha256, 'a.pdf', True, auctions)
+
+    assert store.claim_processing(sha256, 'b.pdf', processing_variant()) is None
+    assert store.claim_processing(sha256, 'c.pdf', auctions) == 'a.pdf'
+    store.close()
+
+def test_page_cache_reuses_content_hash(base_dir, monkeypatch):
+    with open(os.path.join(FIXTURES_DIR, 'diario_texto_bruto.txt'), encoding='utf-8') as f:
+        page_text = f.read()
+    monkeypatch.setattr(document_processor, '_iter_columns_serial',
+                        lambda pdf_path, **options: iter([(page_text, '')]))
+    hashes = []
+    monkeypatch.setattr(page_cache, 'file_sha256', lambda path: hashes.append(path) or 'x')
+    cache = page_cache.PageTextCache(str(base_dir / 'cache.sqlite3'))
+
+    assert process_single_file(add_pdf(base_dir, 'diario.pdf'), cache=cache) is True
+    assert hashes == []
+    assert cache.stats()['documentos'] == 1
+    assert os.path.exists(base_dir / '01 - arquivos lidos' / 'diario.txt')
+    cache.close()
+
+def fixture_pages(breaks):
+    """Texto bruto do fixture dividido em páginas logo após as linhas em breaks"""
+    with open(os.path.join(FIXTURES_DIR, 'diario_texto_bruto.txt'), encoding='utf-8') as f:
+        lines = f.read().splitlines(keepends=True)
+    bounds = [0] + list(breaks) + [len(lines)]
+    return [''.join(lines[start:end]) for start, end in zip(bounds, bounds[1:])]
+
+def read_outputs(base_dir):
+    return {os.path.join(folder, name): (base_dir / folder / name).read_text(encoding='utf-8')
+            for folder in FOLDERS[1:] for name in sorted(os.listdir(base_dir / folder)) if name.endswith('.txt')}
+
+@pytest.mark.parametrize('breaks', [
+    [13, 14, 19, 20, 33, 34, 35],
+    [1, 2, 6, 7, 22, 23, 39, 40],
+])
+def test_streaming_writes_same_outputs_as_full_path(tmp_path, monkeypatch, breaks):
+    pages = fixture_pages(breaks)
+    monkeypatch.setattr(document_processor, 'process_pdf_file', lambda path, **options: ''.join(pages))
+    monkeypatch.setattr(document_processor, 'iter_page_texts', lambda path, **options: iter(pages))
+    outputs = {}
+    for streaming in (False, True):
+        run_dir = tmp_path / ('streaming' if streaming else 'completo')
+        for folder in FOLDERS:
+            os.makedirs(run_dir / folder)
+        monkeypatch.setattr(document_processor, 'BASE_DIR', str(run_dir))
+        assert process_single_file(add_pdf(run_dir, 'diario.pdf'), streaming=streaming, force=True) is True
+        outputs[streaming] = read_outputs(run_dir)
+
+    assert len(outputs[False]) == 3
+    assert outputs[True] == outputs[False]
+
+def diario_pdf(path, blocks, lines_per_column=60):
+    """PDF de duas colunas com os blocos [(número, linhas)] e cabeçalho e rodapé em toda página, como no diário"""
+    lines = ['Índice de Publicação', 'Tribunal de Justiça .................................. 1']
+    for number, body in blocks:
+        lines += [f'IDMATERIA{number}IDMATERIA'] + body
+    header = ['Diário Eletrônico do Tribunal de Justiça do Paraná', 'Curitiba, 5 de maio de 2024 - Edição nº 3850']
+    per_page = 2 * lines_per_column - len(header) - 1
+    pages = []
+    for number, start in enumerate(range(0, len(lines), per_page), 1):
+        column = header + lines[start:start + per_page] + [f'- {number} -']
+        pages.append((column[:lines_per_column], column[lines_per_column:]))
+    write_pdf(path, pages)
+    return len(pages)
+
+def despacho(number, length=6):
+    return [f'Despacho {number}, linha {line}: intime-se a parte pelo procurador no prazo legal.' for line in range(length)]
+
+def test_auctions_only_writes_same_auctions_as_full_path(tmp_path, monkeypatch):
+    pytest.importorskip('pypdfium2')
+    leilao = ['EDITAL DE LEILÃO E INTIMAÇÃO - PRAZO DE 5 DIAS'] + despacho('do edital', 300)
+    blocks = ([(1000 + n, despacho(n)) for n in range(20)] + [(2000, leilao)] +
+              [(3000 + n, despacho(n)) for n in range(30)] + [(4000, ['Leilão do imóvel penhorado.'] + despacho(0))] +
+              [(5000 + n, despacho(n)) for n in range(10)])
+    pdf_path = str(tmp_path / 'diario.pdf')
+    num_pages = diario_pdf(pdf_path, blocks)
+
+    # O PDFium "vê" um marcador a mais no meio do edital, que para a varredura prévia termina antes
+    iter_pdfium_pages = document_processor._iter_pdfium_pages
+    def pdfium_pages(path, start=0, end=None, **options):
+        for page, (left, right) in enumerate(iter_pdfium_pages(path, start, end, **options), start):
+            yield (left.replace('do edital, linha 20:', 'IDMATERIA9999IDMATERIA\n'), right)
+    monkeypatch.setattr(document_processor, '_iter_pdfium_pages', pdfium_pages)
+    page_ranges, total, _ = document_processor.prefilter_auction_pages(pdf_path)
+    assert total == num_pages and sum(end - start for start, end in page_ranges) < num_pages
+
+    outputs = {}
+    for auctions_only in (False, True):
+        run_dir = tmp_path / ('leiloes' if auctions_only else 'completo')
+        for folder in FOLDERS:
+            os.makedirs(run_dir / folder)
+        monkeypatch.setattr(document_processor, 'BASE_DIR', str(run_dir))
+        with open(pdf_path, 'rb') as f:
+            copy_path = add_pdf(run_dir, 'diario.pdf', f.read())
+        assert process_single_file(copy_path, auctions_only=auctions_only, force=True) is True
+        outputs[auctions_only] = (run_dir / FOLDERS[2] / 'Leilões_05_05_2024.txt').read_text(encoding='utf-8')
+
+    assert 'ID: 2000' in outputs[False] and 'ID: 4000' in outputs[False]
+    assert outputs[True] == outputs[False]
+
+def test_parallel_extraction_writes_same_outputs_as_serial(tmp_path, monkeypatch):
+    blocks = [(1000 + n, (['EDITAL DE LEILÃO DO IMÓVEL'] if n % 5 == 0 else []) + despacho(n, 8)) for n in range(30)]
+    pdf_path = str(tmp_path / 'diario.pdf')
+    assert diario_pdf(pdf_path, blocks, lines_per_column=30) >= 4
+
+    outputs = {}
+    for workers in (1, 3):
+        run_dir = tmp_path / f'workers_{workers}'
+        for folder in FOLDERS:
+            os.makedirs(run_dir / folder)
+        monkeypatch.setattr(document_processor, 'BASE_DIR', str(run_dir))
+        with open(pdf_path, 'rb') as f:
+            copy_path = add_pdf(run_dir, 'diario.pdf', f.read())
+        assert process_single_file(copy_path, workers=workers, force=True) is True
+        outputs[workers] = read_outputs(run_dir)
+
+    assert len(outputs[1]) == 3 and 'ID: 1029' in outputs[1][os.path.join(FOLDERS[1], 'diario.txt')]
+    assert 'ID: 1025' in outputs[1][os.path.join(FOLDERS[2], 'Leilões_05_05_2024.txt')]
+    assert outputs[3] == outputs[1]
+
+def test_batch_pool_isolates_broken_pdf_and_reserves_output_names(base_dir):
+    for name, first in (('a.pdf', 1000), ('b.pdf', 2000)):
+        blocks = [(first + n, (['Edital de leilão.'] if n == 0 else []) + despacho(n)) for n in range(5)]
+        diario_pdf(str(base_dir / '00 - para leitura' / name), blocks)
+    broken_path = add_pdf(base_dir, 'quebrado.pdf', b'%PDF-1.4 truncado')
+
+    results = process_all_files(file_workers=3, force=True)
+
+    assert sorted((os.path.basename(path), ok) for path, ok, _ in results) == [
+        ('a.pdf', True), ('b.pdf', True), ('quebrado.pdf', False)]
+    assert os.path.exists(broken_path)
+    # As duas edições têm a mesma data: cada worker reservou o próprio nome de saída
+    assert sorted(os.listdir(base_dir / '02 - arquivos com leilões')) == [
+        'Leilões_05_05_2024.txt', 'Leilões_05_05_2024_2.txt']
+    leiloes = ''.join((base_dir / '02 - arquivos com leilões' / name).read_text(encoding='utf-8')
+                      for name in os.listdir(base_dir / '02 - arquivos com leilões'))
+    assert 'ID: 1000' in leiloes and 'ID: 2000' in leiloes
+    assert sorted(name for name in os.listdir(base_dir / '01 - arquivos lidos') if name.endswith('.pdf')) == [
+        'a.pdf', 'b.pdf']
+
+def test_pdfium_backend_writes_same_outputs_as_pdfplumber(tmp_path, monkeypatch):
+    pytest.importorskip('pypdfium2')
+    blocks = [(1000 + n, (['EDITAL DE LEILÃO DO IMÓVEL'] if n % 4 == 0 else []) + despacho(n, 8)) for n in range(20)]
+    pdf_path = str(tmp_path / 'diario.pdf')
+    num_pages = diario_pdf(pdf_path, blocks, lines_per_column=30)
+
+    totals = document_processor.benchmark_backends([pdf_path], ['pdfplumber', 'pdfium'])
+    assert totals['pdfium']['paginas'] == num_pages and totals['pdfium']['idmateria_ok'] == 1
+
+    outputs = {}
+    for backend in ('pdfplumber', 'pdfium'):
+        run_dir = tmp_path / backend
+        for folder in FOLDERS:
+            os.makedirs(run_dir / folder)
+        monkeypatch.setattr(document_processor, 'BASE_DIR', str(run_dir))
+        with open(pdf_path, 'rb') as f:
+            copy_path = add_pdf(run_dir, 'diario.pdf', f.read())
+        assert process_single_file(copy_path, backend=backend, force=True) is True
+        outputs[backend] = read_outputs(run_dir)
+
+    assert 'ID: 1016' in outputs['pdfplumber'][os.path.join(FOLDERS[2], 'Leilões_05_05_2024.txt')]
+    assert outputs['pdfium'] == outputs['pdfplumber']
+
+def test_metrics_log_records_stages_and_counters(base_dir):
+    blocks = [(1000 + n, (['Edital de leilão.'] if n == 0 else []) + despacho(n)) for n in range(12)]
+    num_pages = diario_pdf(str(base_dir / '00 - para leitura' / 'diario.pdf'), blocks, lines_per_column=30)
+    metrics_log = MetricsLog(str(base_dir / 'metricas.jsonl'), str(base_dir / 'metricas.prom'))
+
+    assert process_single_file(str(base_dir / '00 - para leitura' / 'diario.pdf'), metrics_log=metrics_log) is True
+    assert metrics_log.export_prometheus() == str(base_dir / 'metricas.prom')
+
+    [record] = metrics_log.read_records()
+    assert record['arquivo'] == 'diario.pdf' and record['sucesso'] is True
+    assert {'abrir_pdf', 'extracao', 'limpeza', 'blocos', 'classificacao', 'escrita'} <= set(record['etapas'])
+    assert record['contadores']['paginas'] == num_pages
+    assert record['contadores']['blocos'] == len(blocks) and record['contadores']['leiloes'] == 1
+    assert record['distribuicoes']['pagina_segundos']['n'] == num_pages
+    prometheus = (base_dir / 'metricas.prom').read_text(encoding='utf-8')
+    assert 'tjpr_processador_unidades_total{resultado="sucesso"} 1' in prometheus
+    assert f'tjpr_processador_paginas_total {num_pages}' in prometheus
+    assert 'tjpr_processador_etapa_segundos_total{etapa="extracao"}' in prometheus
@@ -0,0 +1,72 @@
+import email.utils
+import socket
+import time
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+from fake_portal import LISTING_PATH, FakePortal
+from tjpr_http import TJPRHttpClient, TokenBucket, retry_after_seconds
+
+def record_backoffs(client):
+    delays = []
+    backoff = client.backoff
+    client.backoff = lambda attempt, response=None: delays.append(backoff(attempt, response)) or delays[-1]
+    return delays
+
+def test_token_bucket_paces_after_burst():
+    bucket = TokenBucket(rate=20, burst=2)
+    start = time.monotonic()
+    waits = [bucket.acquire() for _ in range(6)]
+    elapsed = time.monotonic() - start
+
+    # A rajada sai sem espera; as outras quatro fichas chegam a 20 por segundo
+    assert waits[:2] == [0.0, 0.0] and all(wait > 0 for wait in waits[2:])
+    assert elapsed >= 4 / 20 * 0.9
+    assert bucket.waited == pytest.approx(sum(waits))
+
+def test_5xx_is_retried_honouring_retry_after():
+    with FakePortal(editions=1, latency=0, failures=2, failure_status=(503, 429), retry_after=0.2) as portal:
+        client = TJPRHttpClient(backoff_base=0.01)
+        delays = record_backoffs(client)
+        response = client.get(portal.base_url + LISTING_PATH)
+
+    assert response.status_code == 200 and 'Edição' in response.text
+    assert client.retries == 2 and delays == [0.2, 0.2]
+    assert portal.count(LISTING_PATH) == 3
+
+def test_backoff_grows_and_gives_up_after_max_retries():
+    with FakePortal(editions=1, latency=0, failures=10) as portal:
+        client = TJPRHttpClient(backoff_base=0.01, max_retries=3)
+        delays = record_backoffs(client)
+        response = client.get(portal.base_url + LISTING_PATH)
+
+    # Sem Retry-After, cada espera fica abaixo de base * 2^tentativa
+    assert response.status_code == 503
+    assert client.retries == 3 and portal.count(LISTING_PATH) == 4
+    assert [delay <= 0.01 * 2 ** attempt for attempt, delay in enumerate(delays)] == [True] * 3
+
+def test_client_error_is_not_retried():
+    with FakePortal(editions=1, latency=0) as portal:
+        client = TJPRHttpClient(backoff_base=0.01)
+        assert client.get(portal.base_url + '/inexistente').status_code == 404
+    assert client.retries == 0
+
+def test_stalled_server_times_out_and_is_retried():
+    # Servidor que aceita a conexão e nunca responde
+    with socket.socket() as server:
+        server.bind(('127.0.0.1', 0))
+        server.listen(4)
+        client = TJPRHttpClient(timeout=(1, 0.2), max_retries=1, backoff_base=0.01)
+        start = time.monotonic()
+        with pytest.raises(requests.Timeout):
+            client.get(f"http://127.0.0.1:{server.getsockname()[1]}/")
+    assert client.retries == 1
+    assert time.monotonic() - start < 5
+
+def test_retry_after_accepts_seconds_and_http_date():
+    assert retry_after_seconds(SimpleNamespace(headers={'Retry-After': '7'})) == 7.0
+    assert retry_after_seconds(SimpleNamespace(headers={})) is None
+    moment = email.utils.formatdate(time.time() + 30, usegmt=True)
+    assert 25 < retry_after_seconds(SimpleNamespace(headers={'Retry-After': moment})) <= 30
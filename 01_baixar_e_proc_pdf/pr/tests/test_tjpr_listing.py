@@ -0,0 +1,21 @@
+import glob
+import json
+import os
+
+import pytest
+
+import tjpr_listing
+from conftest import FIXTURES_DIR
+from tjpr_listing import ListingRow, parse_listing
+
+PARSERS = [False] + ([True] if tjpr_listing.lxml is not None else [])
+
+@pytest.mark.parametrize('use_lxml', PARSERS)
+@pytest.mark.parametrize('path', sorted(glob.glob(os.path.join(FIXTURES_DIR, "listagem_*.html"))),
+                         ids=os.path.basename)
+def test_listing_fixtures(path, use_lxml):
+    with open(path, 'r', encoding='utf-8') as f:
+        html = f.read()
+    with open(os.path.splitext(path)[0] + ".json", 'r', encoding='utf-8') as f:
+        expected = [ListingRow(tuple(row['celulas']), row['caminho']) for row in json.load(f)]
+    assert parse_listing(html, use_lxml=use_lxml) == expected
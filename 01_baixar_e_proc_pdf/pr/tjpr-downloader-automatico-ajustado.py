@@ -5,11 +5,18 @@ import json
 import logging
 import traceback
 import sys
-import schedule
-from bs4 import BeautifulSoup
-import requests
-import re
 import concurrent.futures
+from contextlib import contextmanager
+from async_downloader import AsyncDownloadEngine, CHUNK_SIZE, DEFAULT_CONCURRENCY, stream_to_file
+from tjpr_http import TJPRHttpClient, DEFAULT_RATE
+from tjpr_listing import parse_listing
+from download_registry import DownloadRegistry
+from download_pipeline import ProcessingPipeline, DEFAULT_QUEUE_SIZE
+from pdf_store import PdfStore, default_store_dir, edition_key
+from backfill import Backfill, DEFAULT_SHARD_SIZE
+from http_cache import ConditionalCache
+from adaptive_scheduler import AdaptiveScheduler, learn_publication_window
+from metrics import MetricsLog, StageMetrics, summarize_records
 
 # Configuração de logging
 log_format = '%(asctime)s - %(levelname)s - %(message)s'
@@ -26,16 +33,36 @@ DEFAULT_DOWNLOAD_DIR = r"C:\Users\manoel\OneDrive\AmbVir\ARQUIVOS\pdfai\00 - par
 # Pasta onde o script e arquivos de registro ficarão
 SCRIPT_DIR = r"C:\Users\manoel\OneDrive\AmbVir\pdfai\2 - Dwld_diario"
 
-# Arquivo de registro de downloads
-DOWNLOAD_REGISTRY_FILE = os.path.join(SCRIPT_DIR, "tjpr_download_registry.json")
+# Registro de downloads em SQLite e o registro JSON antigo, importado uma vez
+REGISTRY_DB_FILENAME = "tjpr_download_registry.db"
+REGISTRY_FILENAME = "tjpr_download_registry.json"
+DOWNLOAD_REGISTRY_FILE = os.path.join(SCRIPT_DIR, REGISTRY_FILENAME)
+
+# Cache das linhas já interpretadas da listagem, por número de edição
+LISTING_CACHE_FILENAME = "tjpr_listing_cache.json"
+LISTING_CACHE_SIZE = 1000
+
+# Validadores (ETag/Last-Modified), hash do corpo e edições de cada página da listagem: requisições condicionais e
+# nenhuma interpretação de uma página que não mudou. Ficam as HTTP_CACHE_PAGES páginas usadas mais recentemente
+HTTP_CACHE_FILENAME = "tjpr_http_cache.json"
+HTTP_CACHE_PAGES = 100
+
+# Métricas de cada execução (listagem, downloads, novas tentativas, fila), em JSON lines ao lado do registro
+METRICS_FILENAME = "tjpr_download_metrics.jsonl"
+METRICS_PREFIX = "tjpr_downloader"
+METRICS_SUMMARY_RUNS = 20
+
+# Endereço do portal do TJPR
+BASE_URL = 'https://portal.tjpr.jus.br'
 
 # Última edição conhecida
 LAST_KNOWN_EDITION = 3850
 
 
 class DiarioDownloader:
-    def __init__(self, download_dir=DEFAULT_DOWNLOAD_DIR, script_dir=SCRIPT_DIR):
-        self.base_url = 'https://portal.tjpr.jus.br'
+    def __init__(self, download_dir=DEFAULT_DOWNLOAD_DIR, script_dir=SCRIPT_DIR, base_url=BASE_URL,
+                 concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE, chunk_size=CHUNK_SIZE, store_dir=None):
+        self.base_url = base_url
         self.search_url = f"{self.base_url}/e-dj/publico/diario/pesquisar.do"
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
@@ -43,7 +70,11 @@ class DiarioDownloader:
         }
         self.download_dir = download_dir
         self.script_dir = script_dir
-        self.session = requests.Session()
+        # Listagem e downloads passam pelo mesmo limitador de taxa e política de novas tentativas
+        self.http = TJPRHttpClient(self.headers, rate=rate, pool_size=concurrency)
+        self.session = self.http.session
+        self.concurrency = concurrency
+        self.chunk_size = chunk_size
         
         # Create directories if they don't exist
         for directory in [download_dir, script_dir]:
@@ -57,48 +88,90 @@ class DiarioDownloader:
         file_handler.setFormatter(logging.Formatter(log_format))
         logger.addHandler(file_handler)
         
-        # Inicializar registro de downloads
-        self.registry_file = DOWNLOAD_REGISTRY_FILE
-        self.registry = self._load_registry()
+        # Inicializar registro de downloads, trazendo o histórico do JSON antigo na primeira execução
+        self.registry_file = os.path.join(script_dir, REGISTRY_DB_FILENAME)
+        self.registry = DownloadRegistry(self.registry_file)
+        self.registry.import_json(os.path.join(script_dir, REGISTRY_FILENAME))
+        
+        # PDFs guardados pelo SHA-256, com o índice de nomes compartilhado com o tjpr_downloader
+        self.store = PdfStore(store_dir or default_store_dir())
+        
+        # Linhas da listagem já vistas e primeira página recebida ao inicializar a sessão
+        self.listing_cache_file = os.path.join(script_dir, LISTING_CACHE_FILENAME)
+        self.listing_cache = self._load_listing_cache()
+        self.http_cache = ConditionalCache(os.path.join(script_dir, HTTP_CACHE_FILENAME),
+                                           max_entries=HTTP_CACHE_PAGES)
+        self._first_page_editions = None
+        
+        # Métricas da execução em andamento (ver run_metrics)
+        self.metrics_log = MetricsLog(os.path.join(script_dir, METRICS_FILENAME), prefix=METRICS_PREFIX)
+        self.metrics = None
         
         # Verificar se precisamos inicializar o registro com a última edição conhecida
-        if self.registry.get("last_edition", 0) == 0:
-            self.registry["last_edition"] = LAST_KNOWN_EDITION
+        if not self.registry.last_edition:
+            self.registry.last_edition = LAST_KNOWN_EDITION
             logger.info(f"Registro inicializado com a última edição conhecida: {LAST_KNOWN_EDITION}")
-            self._save_registry()
     
-    def _load_registry(self):
-        """Carrega o registro de downloads a partir do arquivo JSON"""
-        if os.path.exists(self.registry_file):
+    def _registry_entry(self, edition):
+        """Entrada do registro para uma edição baixada agora"""
+        return {
+            "id": edition["id"],
+            "numero": edition["numero"],
+            "data": edition["data"],
+            "filename": edition["filename"],
+            "download_date": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+    
+    @contextmanager
+    def run_metrics(self, command, pipeline=None):
+        """Mede uma execução (check, verify-all, backfill, cada verificação do schedule) e grava o registro.
+
+        Dentro do bloco, a listagem registra o tempo de cada requisição e de cada interpretação de página,
+        e o motor de download o tempo, a vazão e os bytes de cada PDF. Ao final entram as novas tentativas
+        do cliente http, o resultado das requisições condicionais e, com pipeline, o tempo que os
+        downloads esperaram pela fila de processamento.
+        """
+        self.metrics = metrics = StageMetrics(comando=command)
+        counters = {'novas_tentativas': lambda: self.http.retries,
+                    'listagem_304': lambda: self.http_cache.not_modified,
+                    'listagem_mesmo_conteudo': lambda: self.http_cache.hash_matches,
+                    'listagem_alterada': lambda: self.http_cache.misses}
+        initial = {name: value() for name, value in counters.items()}
+        waited = pipeline.waited if pipeline is not None else 0.0
+        success = False
+        try:
+            yield metrics
+            success = True
+        finally:
+            self.metrics = None
+            for name, value in counters.items():
+                metrics.count(name, value() - initial[name])
+            if pipeline is not None:
+                metrics.add_time('fila', pipeline.waited - waited)
+            record = metrics.record(sucesso=success)
+            megabytes = metrics.counters.get('bytes', 0) / 1024 ** 2
+            record['vazao_mb_s'] = round(megabytes / max(record['duracao'], 1e-9), 6)
             try:
-                with open(self.registry_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                self.metrics_log.write(record)
             except Exception as e:
-                logger.error(f"Erro ao carregar registro de downloads: {e}")
-                logger.error(traceback.format_exc())
-                return {"last_check": None, "last_edition": LAST_KNOWN_EDITION, "downloaded_files": []}
-        else:
-            return {"last_check": None, "last_edition": LAST_KNOWN_EDITION, "downloaded_files": []}
+                logger.error(f"Erro ao gravar métricas: {e}")
     
-    def _save_registry(self):
-        """Salva o registro de downloads no arquivo JSON"""
-        try:
-            with open(self.registry_file, 'w', encoding='utf-8') as f:
-                json.dump(self.registry, f, ensure_ascii=False, indent=2)
-            logger.info(f"Registro de downloads salvo em: {self.registry_file}")
-        except Exception as e:
-            logger.error(f"Erro ao salvar registro de downloads: {e}")
-            logger.error(traceback.format_exc())
+    def _timed(self, stage, start):
+        """Registra em stage (e na distribuição stage_segundos) o tempo desde start, se há métricas"""
+        if self.metrics is not None:
+            elapsed = time.perf_counter() - start
+            self.metrics.add_time(stage, elapsed)
+            self.metrics.observe(f"{stage}_segundos", elapsed)
     
     def initialize_session(self):
         """Initialize session and get cookies if needed"""
         try:
             logger.info("Inicializando sessão...")
-            response = self.session.get(self.search_url, headers=self.headers)
-            if response.status_code != 200:
-                logger.error(f"Falha ao inicializar sessão: código {response.status_code}")
+            # A página inicial já é a primeira página da listagem; fica guardada para não ser pedida de novo
+            self._first_page_editions = self.fetch_listing_page(1)
+            if self._first_page_editions is None:
+                logger.error("Falha ao inicializar sessão")
                 return False
-                
             logger.info("Sessão inicializada com sucesso")
             return True
         except Exception as e:
@@ -106,120 +179,184 @@ class DiarioDownloader:
             logger.error(traceback.format_exc())
             return False
 
-    def get_all_editions(self, max_editions=20):
-        """Get information for available editions up to max_editions"""
+    def _load_listing_cache(self):
+        """Carrega as linhas da listagem já interpretadas, indexadas pelo número da edição"""
+        if os.path.exists(self.listing_cache_file):
+            try:
+                with open(self.listing_cache_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                logger.warning(f"Cache da listagem ignorado: {e}")
+        return {}
+
+    def _save_listing_cache(self):
+        """Salva o cache da listagem, mantendo só as LISTING_CACHE_SIZE edições mais recentes, e o cache HTTP"""
+        self.http_cache.save()
+        newest = sorted(self.listing_cache, key=int, reverse=True)[:LISTING_CACHE_SIZE]
+        self.listing_cache = {numero: self.listing_cache[numero] for numero in newest}
+        try:
+            with open(self.listing_cache_file, 'w', encoding='utf-8') as f:
+                json.dump(self.listing_cache, f, ensure_ascii=False)
+        except Exception as e:
+            logger.error(f"Erro ao salvar cache da listagem: {e}")
+
+    def _parse_listing_page(self, html):
+        """Extrai as edições de uma página da listagem, na ordem da página (mais recente primeiro)"""
+        editions = []
+        for row in parse_listing(html):
+            numero = row.numero
+            data = row.data
+            
+            if not (numero and data):
+                continue
+            
+            # Linha já vista em outra verificação: reaproveita a edição montada
+            cached = self.listing_cache.get(numero)
+            if cached and cached['data'] == data:
+                editions.append(cached)
+                continue
+                
+            full_url = f"{self.base_url}{row.download_path}"
+            
+            # Format date for filename - com prefixo PR_
+            clean_data = data.replace('/', '_').replace('-', '_').replace(' ', '_')
+            filename = f"PR_diario_{numero}_{clean_data}.pdf"
+            
+            # Criar identificador único para este diário
+            edition_id = f"{numero}_{clean_data}"
+            
+            # Adicionar apenas se o número for um inteiro
+            try:
+                edition_number = int(numero)
+            except ValueError:
+                logger.warning(f"Ignorando edição com número inválido: {numero}")
+                continue
+            edition = {
+                'id': edition_id,
+                'url': full_url,
+                'filename': filename,
+                'numero': numero,
+                'edition_number': edition_number,
+                'data': data
+            }
+            self.listing_cache[numero] = edition
+            editions.append(edition)
+        return editions
+
+    def fetch_listing_page(self, page):
+        """Pede e interpreta uma página da listagem; None se o portal não a entregar.
+
+        As páginas são pedidas com If-None-Match / If-Modified-Since; se o portal responder 304, ou mandar
+        o mesmo corpo da última vez, as edições guardadas no cache HTTP são reaproveitadas sem interpretar
+        o HTML de novo.
+        """
+        key = f"GET {self.search_url}?numeroPagina={page}"
+        headers = {**self.headers, **self.http_cache.headers(key)}
+        logger.info(f"Requisitando página {page}...")
+        start = time.perf_counter()
+        response = self.http.get(self.search_url, params={'numeroPagina': page} if page > 1 else None,
+                                 headers=headers)
+        self._timed('listagem', start)
+        editions = self.http_cache.lookup(key, response)
+        if editions is not None:
+            logger.info(f"Página {page} da listagem não mudou "
+                        f"({'304' if response.status_code == 304 else 'mesmo conteúdo'})")
+            return editions
+        if response.status_code == 304:
+            # 304 sem resposta guardada (ex.: a entrada saiu do cache): pede a página sem condição
+            logger.warning(f"Página {page} da listagem respondeu 304 sem resposta guardada; pedindo de novo")
+            start = time.perf_counter()
+            response = self.http.get(self.search_url, params={'numeroPagina': page} if page > 1 else None,
+                                     headers=self.headers)
+            self._timed('listagem', start)
+        if response.status_code != 200:
+            logger.error(f"Falha ao obter página {page}: código {response.status_code}")
+            return None
+        start = time.perf_counter()
+        editions = self._parse_listing_page(response.text)
+        self._timed('parse', start)
+        self.http_cache.store(key, response, editions)
+        return editions
+
+    def _iter_listing_pages(self, max_pages):
+        """Gera (página, edições) da mais recente para a mais antiga, até max_pages ou o fim da listagem"""
         # Initialize session
         if not self.initialize_session():
             logger.error("Falha ao inicializar sessão, abortando")
-            return []
-            
-        editions = []
-        editions_found = 0
-        page = 1
-        max_pages = 5  # Limitamos a 5 páginas para verificação diária
+            return
         
-        logger.info(f"Buscando até {max_editions} edições mais recentes...")
-        
-        while editions_found < max_editions and page <= max_pages:
+        page = 1
+        while page <= max_pages:
             try:
-                logger.info(f"Requisitando página {page}...")
-                params = {'numeroPagina': page}
-                response = self.session.get(self.search_url, params=params, headers=self.headers)
-                
-                if response.status_code != 200:
-                    logger.error(f"Falha ao obter página {page}: código {response.status_code}")
-                    break
-                
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # Find rows with download links
-                edition_rows = []
-                tables = soup.find_all('table')
-                
-                for table in tables:
-                    rows = table.find_all('tr')
-                    for row in rows:
-                        # Check if row has download link
-                        link = row.find('a', href=re.compile(r'javascript:downloadWindow'))
-                        if link:
-                            edition_rows.append(row)
-                
-                if not edition_rows:
-                    logger.info(f"Nenhuma edição encontrada na página {page}")
-                    break
-                
-                logger.info(f"Encontradas {len(edition_rows)} possíveis edições na página {page}")
-                
-                # Process edition rows
-                page_editions = []
-                for row in edition_rows:
-                    cells = row.find_all('td')
-                    if len(cells) < 2:
-                        continue
-                        
-                    numero = cells[0].text.strip() if len(cells) > 0 else ""
-                    data = cells[1].text.strip() if len(cells) > 1 else ""
-                    
-                    # Find download link
-                    link = row.find('a', href=re.compile(r'javascript:downloadWindow'))
-                    
-                    if not (numero and data and link):
-                        continue
-                        
-                    # Extract download path
-                    download_js = link.get('href', '')
-                    download_path_match = re.search(r"downloadWindow\('([^']+)'\)", download_js)
-                    
-                    if download_path_match:
-                        download_path = download_path_match.group(1)
-                        full_url = f"{self.base_url}{download_path}"
-                        
-                        # Format date for filename - com prefixo PR_
-                        clean_data = data.replace('/', '_').replace('-', '_').replace(' ', '_')
-                        filename = f"PR_diario_{numero}_{clean_data}.pdf"
-                        
-                        # Criar identificador único para este diário
-                        edition_id = f"{numero}_{clean_data}"
-                        
-                        # Adicionar apenas se o número for um inteiro
-                        try:
-                            edition_number = int(numero)
-                            page_editions.append({
-                                'id': edition_id,
-                                'url': full_url,
-                                'filename': filename,
-                                'numero': numero,
-                                'edition_number': edition_number,
-                                'data': data
-                            })
-                        except ValueError:
-                            logger.warning(f"Ignorando edição com número inválido: {numero}")
-                
-                # Add new editions to the main list
-                for edition in page_editions:
-                    editions.append(edition)
-                    editions_found += 1
-                    
-                    if editions_found >= max_editions:
+                if page == 1 and self._first_page_editions is not None:
+                    page_editions, self._first_page_editions = self._first_page_editions, None
+                else:
+                    page_editions = self.fetch_listing_page(page)
+                    if page_editions is None:
                         break
                 
-                if editions_found >= max_editions:
+                if not page_editions:
+                    logger.info(f"Nenhuma edição encontrada na página {page}")
                     break
                 
-                page += 1
-                time.sleep(1)  # Be nice to the server
+                logger.info(f"Encontradas {len(page_editions)} edições na página {page}")
+                yield page, page_editions
                 
             except Exception as e:
                 logger.error(f"Erro ao processar página {page}: {e}")
                 logger.error(traceback.format_exc())
-                page += 1
-                time.sleep(2)
+            page += 1
+
+    def get_all_editions(self, max_editions=20, max_pages=5):
+        """Get information for available editions up to max_editions"""
+        logger.info(f"Buscando até {max_editions} edições mais recentes...")
         
+        editions = []
+        for _, page_editions in self._iter_listing_pages(max_pages):
+            editions.extend(page_editions[:max_editions - len(editions)])
+            if len(editions) >= max_editions:
+                break
+        
+        self._save_listing_cache()
         logger.info(f"Total de edições encontradas: {len(editions)}")
         return editions
 
-    def download_file(self, url, filename):
-        """Download a file from the given URL and save it with the given filename"""
+    def get_new_editions(self, max_editions=20, max_pages=5):
+        """Edições ainda não baixadas, percorrendo a listagem da mais recente para a mais antiga.
+
+        Para na primeira edição que já está no registro e não passa da última edição registrada
+        (registry.last_edition): daí para trás está tudo baixado, então as páginas seguintes
+        nem são pedidas. Numa verificação diária comum isso é uma requisição e uma página interpretada.
+        """
+        high_water = self.registry.last_edition
+        
+        new_editions = []
+        seen = 0
+        reached = False
+        for page, page_editions in self._iter_listing_pages(max_pages):
+            for edition in page_editions:
+                seen += 1
+                if self.registry.has(edition["id"]):
+                    if edition["edition_number"] <= high_water:
+                        reached = True
+                        break
+                    continue
+                new_editions.append(edition)
+                if seen >= max_editions:
+                    break
+            if reached or seen >= max_editions:
+                break
+        
+        self._save_listing_cache()
+        if reached:
+            logger.info(f"Listagem percorrida até a edição já registrada {edition['numero']} "
+                        f"(página {page}, {seen} linhas)")
+        logger.info(f"Edições novas encontradas: {len(new_editions)}")
+        return new_editions
+
+    def download_file(self, edition):
+        """Download one edition (dict from the listing) and register it in the PDF store under its edition key"""
+        filename = edition['filename']
         filepath = os.path.join(self.download_dir, filename)
         
         # Skip if file already exists
@@ -229,114 +366,77 @@ class DiarioDownloader:
             
         try:
             logger.info(f"Baixando: {filename}")
-            response = self.session.get(url, headers=self.headers, stream=True)
-            
-            if response.status_code != 200:
-                logger.error(f"Erro ao baixar {filename}: código {response.status_code}")
-                return False
-                
-            with open(filepath, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-            
-            # Verify file was downloaded and has content
-            if os.path.exists(filepath) and os.path.getsize(filepath) > 0:
-                filesize_kb = os.path.getsize(filepath) / 1024
-                logger.info(f"Baixado: {filename} ({filesize_kb:.1f} KB)")
-                return True
-            else:
-                logger.error(f"Erro: Arquivo baixado está vazio")
-                if os.path.exists(filepath):
-                    os.remove(filepath)
-                return False
+            # Grava em .part (retomando um download interrompido) e só renomeia depois de conferido
+            streamed = stream_to_file(self.http, edition['url'], filepath, headers=self.headers,
+                                      chunk_size=self.chunk_size)
+            self.store.add(filepath, streamed.sha256, edition_key(edition['numero'], edition['data']))
+            logger.info(f"Baixado: {filename} ({streamed.size / 1024:.1f} KB)")
+            return True
             
         except Exception as e:
             logger.error(f"Erro ao baixar {filename}: {e}")
             logger.error(traceback.format_exc())
-            if os.path.exists(filepath):
-                os.remove(filepath)
             return False
 
-    def check_and_download_new_editions(self):
-        """Verifica e baixa novas edições não registradas no histórico"""
+    def _download_engine(self):
+        return AsyncDownloadEngine(self.http, self.download_dir, headers=self.headers, concurrency=self.concurrency,
+                                   chunk_size=self.chunk_size, store=self.store, metrics=self.metrics)
+
+    def check_and_download_new_editions(self, pipeline=None):
+        """Verifica e baixa novas edições não registradas no histórico.
+
+        Com pipeline (ProcessingPipeline), cada PDF é enviado ao processamento assim que termina de baixar.
+        """
         logger.info("=" * 60)
         logger.info(f"Verificando novas edições em {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         logger.info("=" * 60)
         
         # Atualizar timestamp de verificação
-        self.registry["last_check"] = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.registry.last_check = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
-        # Obter edições disponíveis mais recentes
-        editions = self.get_all_editions(max_editions=20)  # Verificamos apenas as 20 mais recentes por vez
-        
-        if not editions:
-            logger.warning("Nenhuma edição encontrada para verificação")
-            self._save_registry()
-            return []
-        
-        # Ordenar edições por número (decrescente)
-        editions = sorted(editions, key=lambda x: int(x['numero']), reverse=True)
-        
-        # Verificar a edição mais recente
-        latest_edition = int(editions[0]['numero'])
-        if latest_edition > self.registry["last_edition"]:
-            logger.info(f"Nova edição mais recente encontrada: {latest_edition} (anterior: {self.registry['last_edition']})")
-            self.registry["last_edition"] = latest_edition
-        
-        # Identificar edições novas que não estão no registro
-        downloaded_ids = set([entry["id"] for entry in self.registry["downloaded_files"]])
-        new_editions = [edition for edition in editions if edition["id"] not in downloaded_ids]
+        # Percorrer a listagem só até alcançar o que já foi baixado (no máximo as 20 mais recentes)
+        new_editions = self.get_new_editions(max_editions=20)
         
         if not new_editions:
             logger.info("Nenhuma edição nova encontrada para download")
-            self._save_registry()
             return []
         
+        # Ordenar edições por número (decrescente)
+        new_editions = sorted(new_editions, key=lambda x: int(x['numero']), reverse=True)
+        
         logger.info(f"Encontradas {len(new_editions)} novas edições para download")
         
-        # Baixar novas edições
+        # Baixar novas edições ao mesmo tempo; o registro é atualizado na ordem da listagem
+        engine = self._download_engine()
         downloaded = []
-        for edition in new_editions:
-            try:
-                logger.info(f"Processando edição {edition['numero']} de {edition['data']}")
-                
-                # Verificar se o arquivo já existe
-                filepath = os.path.join(self.download_dir, edition['filename'])
-                if os.path.exists(filepath):
-                    logger.info(f"Arquivo já existe: {edition['filename']}")
-                    success = True
-                else:
-                    # Baixar o arquivo
-                    success = self.download_file(edition['url'], edition['filename'])
-                
-                if success:
-                    # Adicionar ao registro
-                    download_entry = {
-                        "id": edition["id"],
-                        "numero": edition["numero"],
-                        "data": edition["data"],
-                        "filename": edition["filename"],
-                        "download_date": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    }
-                    self.registry["downloaded_files"].append(download_entry)
-                    downloaded.append(edition)
-                    logger.info(f"Edição {edition['numero']} baixada e registrada com sucesso")
-                else:
-                    logger.error(f"Falha ao baixar edição {edition['numero']}")
-                
-            except Exception as e:
-                logger.error(f"Erro ao processar edição {edition['numero']}: {e}")
-                logger.error(traceback.format_exc())
+        download_entries = []
+        on_downloaded = (lambda result: pipeline.submit(result.path)) if pipeline is not None else None
+        for result in engine.download_all(new_editions, on_downloaded):
+            edition = result.edition
+            if result.success:
+                download_entries.append(self._registry_entry(edition))
+                downloaded.append(edition)
+                logger.info(f"Edição {edition['numero']} baixada com sucesso")
+            else:
+                logger.error(f"Falha ao baixar edição {edition['numero']}")
+        
+        # Registrar as edições baixadas numa única transação
+        self.registry.add_many(download_entries)
         
-        # Salvar registro atualizado
-        self._save_registry()
+        # A marca d'água só avança até a edição mais recente de fato baixada; uma falha continua nova
+        # na próxima verificação
+        if downloaded:
+            latest_edition = max(edition['edition_number'] for edition in downloaded)
+            if latest_edition > self.registry.last_edition:
+                logger.info(f"Nova edição mais recente baixada: {latest_edition} "
+                            f"(anterior: {self.registry.last_edition})")
+                self.registry.last_edition = latest_edition
         
         # Resumo
         logger.info(f"Download concluído: {len(downloaded)}/{len(new_editions)} novas edições baixadas")
         return downloaded
 
-    def verify_missing_editions(self, limit=170):
+    def verify_missing_editions(self, limit=170, pipeline=None):
         """Verifica edições que podem estar faltando no registro"""
         logger.info("=" * 60)
         logger.info(f"Verificando edições ausentes em {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
@@ -350,8 +450,7 @@ class DiarioDownloader:
             return []
         
         # Identificar edições ausentes do registro
-        downloaded_ids = set([entry["id"] for entry in self.registry["downloaded_files"]])
-        missing_editions = [edition for edition in all_editions if edition["id"] not in downloaded_ids]
+        missing_editions = self.registry.missing(all_editions)
         
         if not missing_editions:
             logger.info("Nenhuma edição ausente encontrada")
@@ -359,13 +458,14 @@ class DiarioDownloader:
         
         logger.info(f"Encontradas {len(missing_editions)} edições ausentes")
         
-        # Baixar edições ausentes com processamento paralelo
+        # Baixar edições ausentes com processamento paralelo; um único motor de download para todas
         downloaded = []
+        engine = self._download_engine()
         
-        with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.concurrency) as executor:
             # Submeter tarefas de download
             future_to_edition = {
-                executor.submit(self._download_missing_edition, edition): edition 
+                executor.submit(self._download_missing_edition, edition, pipeline, engine): edition 
                 for edition in missing_editions
             }
             
@@ -387,44 +487,32 @@ class DiarioDownloader:
         latest_numbers = [int(e["numero"]) for e in all_editions]
         if latest_numbers:
             latest_edition = max(latest_numbers)
-            if latest_edition > self.registry["last_edition"]:
-                self.registry["last_edition"] = latest_edition
+            if latest_edition > self.registry.last_edition:
+                self.registry.last_edition = latest_edition
                 logger.info(f"Atualizada última edição para: {latest_edition}")
         
-        # Salvar registro atualizado
-        self._save_registry()
-        
         # Resumo
         logger.info(f"Verificação concluída: {len(downloaded)}/{len(missing_editions)} edições ausentes baixadas")
         return downloaded
     
-    def _download_missing_edition(self, edition):
-        """Baixa uma edição ausente e atualiza o registro"""
+    def _download_missing_edition(self, edition, pipeline=None, engine=None):
+        """Baixa uma edição ausente, atualiza o registro e, com pipeline, a envia ao processamento.
+
+        engine (AsyncDownloadEngine) é compartilhado entre as threads de verify_missing_editions; sem ele,
+        um é criado só para esta edição.
+        """
         try:
             logger.info(f"Baixando edição ausente {edition['numero']} de {edition['data']}")
             
-            # Verificar se o arquivo já existe
-            filepath = os.path.join(self.download_dir, edition['filename'])
-            if os.path.exists(filepath):
-                logger.info(f"Arquivo já existe: {edition['filename']}")
-                success = True
-            else:
-                # Baixar o arquivo
-                success = self.download_file(edition['url'], edition['filename'])
+            # Baixar, a menos que a edição já esteja no repositório de PDFs
+            result = (engine or self._download_engine()).fetch(edition)
+            success = result.success
             
             if success:
-                # Adicionar ao registro
-                download_entry = {
-                    "id": edition["id"],
-                    "numero": edition["numero"],
-                    "data": edition["data"],
-                    "filename": edition["filename"],
-                    "download_date": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                }
-                
-                # Thread-safe update of registry
-                with concurrent.futures.ThreadPoolExecutor(max_workers=1) as ex:
-                    ex.submit(self._update_registry, download_entry)
+                # Adicionar ao registro (upsert numa transação, seguro entre as threads)
+                self.registry.add(self._registry_entry(edition))
+                if pipeline is not None and result.existing is None:
+                    pipeline.submit(result.path)
                 
                 logger.info(f"Edição ausente {edition['numero']} baixada com sucesso")
                 return True
@@ -436,14 +524,11 @@ class DiarioDownloader:
             logger.error(f"Erro ao baixar edição ausente {edition['numero']}: {e}")
             logger.error(traceback.format_exc())
             return False
-    
-    def _update_registry(self, entry):
-        """Atualiza o registro de forma thread-safe"""
-        self.registry["downloaded_files"].append(entry)
 
 
-def run_daily_check():
-    """Executa a verificação diária de novos diários"""
+def run_daily_check(concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE, chunk_size=CHUNK_SIZE, process_workers=0,
+                    queue_size=DEFAULT_QUEUE_SIZE):
+    """Executa a verificação diária de novos diários; com process_workers, processa os PDFs enquanto baixa"""
     download_dir = DEFAULT_DOWNLOAD_DIR
     script_dir = SCRIPT_DIR
     
@@ -452,10 +537,17 @@ def run_daily_check():
     print(f"Pasta de logs e registros: {script_dir}")
     
     try:
-        downloader = DiarioDownloader(download_dir, script_dir)
+        downloader = DiarioDownloader(download_dir, script_dir, concurrency=concurrency, rate=rate,
+                                      chunk_size=chunk_size)
         
-        # Verificar e baixar novas edições
-        new_editions = downloader.check_and_download_new_editions()
+        # Verificar e baixar novas edições, processando cada uma assim que termina de baixar
+        pipeline = ProcessingPipeline(process_workers, queue_size) if process_workers else None
+        try:
+            with downloader.run_metrics('check', pipeline):
+                new_editions = downloader.check_and_download_new_editions(pipeline)
+        finally:
+            if pipeline is not None:
+                pipeline.close()
         
         # Mostrar resumo
         if new_editions:
@@ -471,7 +563,8 @@ def run_daily_check():
         print(f"\nErro durante verificação: {e}")
 
 
-def verify_all_missing():
+def verify_all_missing(concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE, chunk_size=CHUNK_SIZE, process_workers=0,
+                       queue_size=DEFAULT_QUEUE_SIZE):
     """Verifica e baixa todas as edições ausentes"""
     download_dir = DEFAULT_DOWNLOAD_DIR
     script_dir = SCRIPT_DIR
@@ -482,10 +575,17 @@ def verify_all_missing():
     print("Esta operação pode levar vários minutos...")
     
     try:
-        downloader = DiarioDownloader(download_dir, script_dir)
+        downloader = DiarioDownloader(download_dir, script_dir, concurrency=concurrency, rate=rate,
+                                      chunk_size=chunk_size)
         
         # Verificar e baixar edições ausentes
-        missing_editions = downloader.verify_missing_editions(limit=170)
+        pipeline = ProcessingPipeline(process_workers, queue_size) if process_workers else None
+        try:
+            with downloader.run_metrics('verify-all', pipeline):
+                missing_editions = downloader.verify_missing_editions(limit=170, pipeline=pipeline)
+        finally:
+            if pipeline is not None:
+                pipeline.close()
         
         # Mostrar resumo
         if missing_editions:
@@ -499,24 +599,94 @@ def verify_all_missing():
         print(f"\nErro durante verificação: {e}")
 
 
-def schedule_daily_checks(hour="09:00"):
-    """Programa verificações diárias em um horário específico"""
-    schedule.every().day.at(hour).do(run_daily_check)
+def run_backfill(first=None, last=None, first_date=None, last_date=None, shard_size=DEFAULT_SHARD_SIZE, workers=None,
+                 concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE, chunk_size=CHUNK_SIZE, process_workers=0,
+                 queue_size=DEFAULT_QUEUE_SIZE):
+    """Baixa o histórico de um intervalo de edições (números ou datas dd/mm/aaaa) em shards com checkpoint.
+
+    Rodar de novo a mesma linha de comando retoma os shards de onde pararam.
+    """
+    print(f"Iniciando backfill em {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"Pasta de downloads: {DEFAULT_DOWNLOAD_DIR}")
     
-    print(f"Verificação diária programada para às {hour}")
+    try:
+        downloader = DiarioDownloader(DEFAULT_DOWNLOAD_DIR, SCRIPT_DIR, concurrency=concurrency, rate=rate,
+                                      chunk_size=chunk_size)
+        pipeline = ProcessingPipeline(process_workers, queue_size) if process_workers else None
+        try:
+            options = dict(shard_size=shard_size, workers=workers, pipeline=pipeline)
+            if first_date or last_date:
+                backfill = Backfill.for_dates(downloader, first_date or "01/01/2000",
+                                              last_date or datetime.date.today().strftime('%d/%m/%Y'), **options)
+                if backfill is None:
+                    print("\nNenhuma edição publicada no período.")
+                    return
+            else:
+                backfill = Backfill(downloader, first or 1, last or downloader.registry.last_edition, **options)
+            with downloader.run_metrics('backfill', pipeline):
+                progress = backfill.run()
+        finally:
+            if pipeline is not None:
+                pipeline.close()
+            downloader._save_listing_cache()
+        print(f"\nBackfill das edições {backfill.first} a {backfill.last}: {progress.summary()}")
+        
+    except Exception as e:
+        logger.error(f"Erro durante o backfill: {e}")
+        logger.error(traceback.format_exc())
+        print(f"\nErro durante o backfill: {e}")
+
+
+def schedule_daily_checks(hour="09:00", concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE, chunk_size=CHUNK_SIZE,
+                          process_workers=1, queue_size=DEFAULT_QUEUE_SIZE):
+    """Verifica novas edições continuamente, com mais frequência na janela de publicação.
+
+    Um único processo mantém a sessão HTTP, o registro e o pool de processamento abertos; cada PDF novo
+    vai para o processamento assim que é baixado. A janela é aprendida dos horários de download no
+    registro; hour é o início da janela enquanto não há histórico suficiente.
+    """
     print(f"Pasta de downloads: {DEFAULT_DOWNLOAD_DIR}")
     print(f"Pasta de logs e registros: {SCRIPT_DIR}")
     print("Pressione Ctrl+C para interromper o programa")
     
+    downloader = DiarioDownloader(DEFAULT_DOWNLOAD_DIR, SCRIPT_DIR, concurrency=concurrency, rate=rate,
+                                  chunk_size=chunk_size)
+    pipeline = ProcessingPipeline(process_workers, queue_size) if process_workers else None
+    
+    def check():
+        with downloader.run_metrics('schedule', pipeline):
+            new_editions = downloader.check_and_download_new_editions(pipeline)
+        for edition in new_editions:
+            print(f"- Diário {edition['numero']} de {edition['data']} baixado em "
+                  f"{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        return new_editions
+    
+    scheduler = AdaptiveScheduler(check, lambda: learn_publication_window(downloader.registry.entries(), hour))
     try:
-        # Executar verificação imediata
-        run_daily_check()
-        
-        while True:
-            schedule.run_pending()
-            time.sleep(60)  # Verifica a cada minuto
+        scheduler.run()
     except KeyboardInterrupt:
         print("\nPrograma interrompido pelo usuário")
+    finally:
+        if pipeline is not None:
+            pipeline.close()
+
+
+def print_metrics_summary(runs=METRICS_SUMMARY_RUNS):
+    """Mostra, para cada comando, a distribuição das métricas nas últimas runs execuções"""
+    records = MetricsLog(os.path.join(SCRIPT_DIR, METRICS_FILENAME)).read_records()[-runs:]
+    if not records:
+        print("Nenhuma métrica registrada ainda.")
+        return
+    commands = {}
+    for record in records:
+        commands.setdefault(record.get('comando', '?'), []).append(record)
+    print(f"Métricas das últimas {len(records)} execuções ({records[0]['timestamp']} a {records[-1]['timestamp']})")
+    for command, command_records in commands.items():
+        failures = sum(1 for record in command_records if not record.get('sucesso', True))
+        print(f"\n{command}: {len(command_records)} execuções" + (f", {failures} com erro" if failures else ""))
+        print(f"  {'medida':<34}{'n':>5}{'p50':>14}{'p90':>14}{'máx':>14}")
+        for name, (n, p50, p90, high) in sorted(summarize_records(command_records).items()):
+            print(f"  {name:<34}{n:>5}{p50:>14.3f}{p90:>14.3f}{high:>14.3f}")
 
 
 def print_help():
@@ -529,13 +699,31 @@ def print_help():
     print("\nOpções disponíveis:")
     print("  --check       Verifica e baixa novos diários disponíveis")
     print("  --verify-all  Verifica e baixa todos os diários ausentes (até 170)")
-    print("  --schedule    Programa verificações diárias automáticas")
-    print("  --hour=HH:MM  Define o horário da verificação diária (usar com --schedule)")
+    print("  --schedule    Verifica continuamente, com mais frequência na janela de publicação aprendida,")
+    print("                e processa cada edição nova assim que baixada (--no-process para só baixar)")
+    print("  --hour=HH:MM  Início da janela de publicação enquanto não há histórico (usar com --schedule)")
+    print(f"  --concurrency=N  Downloads simultâneos (padrão {DEFAULT_CONCURRENCY})")
+    print(f"  --rate=R      Máximo de requisições por segundo ao portal (padrão {DEFAULT_RATE:g})")
+    print(f"  --chunk-kb=N  Tamanho dos blocos de leitura dos downloads em KB (padrão {CHUNK_SIZE // 1024})")
+    print("  --process     Processa cada PDF (document_processor) assim que o download termina")
+    print("  --process-workers=N  Processos de extração no modo --process (padrão 1)")
+    print(f"  --queue-size=N  PDFs baixados aguardando extração antes de segurar os downloads (padrão {DEFAULT_QUEUE_SIZE})")
+    print("  --backfill    Baixa o histórico em shards com checkpoint (retoma se interrompido)")
+    print("  --from-edition=N --to-edition=M  Intervalo do backfill por número (padrão: até a última registrada)")
+    print("  --from-date=DD/MM/AAAA --to-date=DD/MM/AAAA  Intervalo do backfill por data de publicação")
+    print(f"  --shard-size=N  Edições por shard do backfill (padrão {DEFAULT_SHARD_SIZE})")
+    print("  --workers=N   Shards baixados ao mesmo tempo no backfill (padrão: --concurrency)")
+    print("  --metrics-summary  Percentis das métricas de download (listagem, parse, downloads, fila) por comando")
+    print(f"  --runs=N      Execuções consideradas em --metrics-summary (padrão {METRICS_SUMMARY_RUNS})")
+    print("  --store-info  Mostra quantos PDFs (e bytes) estão no repositório endereçado pelo conteúdo")
     print("  --help        Exibe esta ajuda")
     print("\nExemplos:")
     print("  python tjpr_autodownload.py --check")
     print("  python tjpr_autodownload.py --verify-all")
     print("  python tjpr_autodownload.py --schedule --hour=09:00")
+    print("  python tjpr_autodownload.py --check --process --process-workers=2")
+    print("  python tjpr_autodownload.py --backfill --from-date=01/01/2023 --to-date=31/12/2024")
+    print("  python tjpr_autodownload.py --metrics-summary --runs=50")
 
 
 def main():
@@ -552,11 +740,60 @@ def main():
         print_help()
         return
     
+    concurrency = DEFAULT_CONCURRENCY
+    rate = DEFAULT_RATE
+    chunk_size = CHUNK_SIZE
+    # --schedule processa por padrão; os outros comandos só com --process
+    processing = "--process" in sys.argv or ("--schedule" in sys.argv and "--no-process" not in sys.argv)
+    process_workers = 1 if processing else 0
+    queue_size = DEFAULT_QUEUE_SIZE
+    for arg in sys.argv:
+        if arg.startswith("--concurrency="):
+            concurrency = int(arg.split("=")[1])
+        elif arg.startswith("--rate="):
+            rate = float(arg.split("=")[1])
+        elif arg.startswith("--chunk-kb="):
+            chunk_size = int(arg.split("=")[1]) * 1024
+        elif arg.startswith("--process-workers=") and process_workers:
+            process_workers = int(arg.split("=")[1])
+        elif arg.startswith("--queue-size="):
+            queue_size = int(arg.split("=")[1])
+    
     if "--check" in sys.argv:
-        run_daily_check()
+        run_daily_check(concurrency, rate, chunk_size, process_workers, queue_size)
+    
+    elif "--metrics-summary" in sys.argv:
+        runs = METRICS_SUMMARY_RUNS
+        for arg in sys.argv:
+            if arg.startswith("--runs="):
+                runs = int(arg.split("=")[1])
+        print_metrics_summary(runs)
+    
+    elif "--store-info" in sys.argv:
+        store = PdfStore(default_store_dir())
+        for name, value in store.stats().items():
+            print(f"{name}: {value}")
     
     elif "--verify-all" in sys.argv:
-        verify_all_missing()
+        verify_all_missing(concurrency, rate, chunk_size, process_workers, queue_size)
+    
+    elif "--backfill" in sys.argv:
+        options = {}
+        for arg in sys.argv:
+            if arg.startswith("--from-edition="):
+                options['first'] = int(arg.split("=")[1])
+            elif arg.startswith("--to-edition="):
+                options['last'] = int(arg.split("=")[1])
+            elif arg.startswith("--from-date="):
+                options['first_date'] = arg.split("=")[1]
+            elif arg.startswith("--to-date="):
+                options['last_date'] = arg.split("=")[1]
+            elif arg.startswith("--shard-size="):
+                options['shard_size'] = int(arg.split("=")[1])
+            elif arg.startswith("--workers="):
+                options['workers'] = int(arg.split("=")[1])
+        run_backfill(concurrency=concurrency, rate=rate, chunk_size=chunk_size, process_workers=process_workers,
+                     queue_size=queue_size, **options)
     
     elif "--schedule" in sys.argv:
         # Verificar se há um horário especificado
@@ -566,7 +803,7 @@ def main():
                 hour = arg.split("=")[1]
                 break
         
-        schedule_daily_checks(hour)
+        schedule_daily_checks(hour, concurrency, rate, chunk_size, process_workers, queue_size)
     
     else:
         print("Opção inválida. Use --help para ver as opções disponíveis.")
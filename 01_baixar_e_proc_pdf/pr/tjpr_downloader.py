@@ -1,20 +1,36 @@
-import requests
-from bs4 import BeautifulSoup
 import re
 import os
 import time
+import sys
 from datetime import datetime
+from async_downloader import AsyncDownloadEngine, CHUNK_SIZE, DEFAULT_CONCURRENCY
+from tjpr_http import TJPRHttpClient, DEFAULT_RATE
+from tjpr_listing import parse_listing
+from pdf_store import PdfStore, default_store_dir
+
+# Datas nas células da listagem
+DATE_PATTERN = re.compile(r'(\d{4}-\d{2}-\d{2}|\d{2}/\d{2}/\d{4})')
+# Número da edição, que vai para o nome do arquivo; aceita suplementos com letra ('3857-A')
+EDITION_NUMBER_PATTERN = re.compile(r'\d+(?:-?[A-Za-z])?')
 
 class TJPRDiarioDownloader:
-    def __init__(self, download_dir=r"C:\Users\manoel\OneDrive\AmbVir\ARQUIVOS\pdfai\00 - para leitura"):
-        self.base_url = 'https://portal.tjpr.jus.br'
+    def __init__(self, download_dir=r"C:\Users\manoel\OneDrive\AmbVir\ARQUIVOS\pdfai\00 - para leitura",
+                 base_url='https://portal.tjpr.jus.br', concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE,
+                 chunk_size=CHUNK_SIZE, store_dir=None):
+        self.base_url = base_url
         self.search_url = f"{self.base_url}/e-dj/publico/diario/pesquisar.do"
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
         }
         self.download_dir = download_dir
-        self.session = requests.Session()
+        # Listagem e downloads passam pelo mesmo limitador de taxa e política de novas tentativas
+        self.http = TJPRHttpClient(self.headers, rate=rate, pool_size=concurrency)
+        self.session = self.http.session
+        self.concurrency = concurrency
+        self.chunk_size = chunk_size
+        # PDFs guardados pelo SHA-256, com o índice de nomes compartilhado com o downloader automático
+        self.store = PdfStore(store_dir or default_store_dir())
         
         # Criar diretório de download se não existir
         if not os.path.exists(download_dir):
@@ -22,10 +38,10 @@ class TJPRDiarioDownloader:
             print(f"Criado diretório de download: {download_dir}")
 
 
-    def download_diarios(self):
-        """Baixar diários conforme solicitação do usuário"""
+    def download_diarios(self, num_diarios=None):
+        """Baixar diários conforme solicitação do usuário; sem num_diarios, a quantidade é perguntada"""
         # Solicitar quantidade de diários
-        while True:
+        while num_diarios is None:
             try:
                 num_diarios = int(input("""\n
     ╔════════════════════════════════════════════════╗
@@ -39,106 +55,67 @@ class TJPRDiarioDownloader:
                 if num_diarios > 0:
                     break
                 else:
+                    num_diarios = None
                     print("Por favor, insira um número positivo.")
             except ValueError:
                 print("Entrada inválida. Digite um número inteiro.")
 
-        downloaded_diarios = []
+        # Edições encontradas na listagem; são baixadas juntas depois da varredura
+        editions = []
         current_page = 1
 
         # Página inicial
-        response = self.session.get(self.search_url, headers=self.headers)
+        response = self.http.get(self.search_url, headers=self.headers)
 
-        while len(downloaded_diarios) < num_diarios:
+        while len(editions) < num_diarios:
             print(f"\n=== Processando Página {current_page} ===")
 
             # Parsear o conteúdo da página
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            # Encontrar tabelas com diários
-            tables = soup.find_all('table')
+            found = len(editions)
 
-            for table in tables:
-                rows = table.find_all('tr')
-                for row in rows:
-                    if len(downloaded_diarios) >= num_diarios:
-                        break
+            for row in parse_listing(response.text):
+                if len(editions) >= num_diarios:
+                    break
 
-                    # Encontrar link de download
-                    link = row.find('a', href=re.compile(r'javascript:downloadWindow'))
-                    if not link:
-                        continue
+                # Extrair informações
+                numero = row.numero
+                if not EDITION_NUMBER_PATTERN.fullmatch(numero):
+                    print(f"Ignorando linha com número de edição inválido: {numero!r}")
+                    continue
 
-                    cells = row.find_all('td')
-                    if len(cells) < 2:
-                        continue
+                # Extrair data: primeira célula da linha com uma data; se não houver, a coluna de data padrão
+                data = next((match.group(1) for match in map(DATE_PATTERN.search, row.cells) if match), row.data)
 
-                    # Extrair informações
-                    numero = cells[0].text.strip()
+                full_url = f"{self.base_url}{row.download_path}"
 
-                    # Extrair data do código próximo ao número
+                # Formatar nome do arquivo
+                try:
+                    # Tenta primeiro o formato yyyy-mm-dd
+                    data_obj = datetime.strptime(data, "%Y-%m-%d")
+                except ValueError:
                     try:
-                        # Procurar em todas as células da linha
-                        data_match = None
-                        for cell in cells:
-                            data_match = re.search(r'(\d{4}-\d{2}-\d{2}|\d{2}/\d{2}/\d{4})', cell.text)
-                            if data_match:
-                                data = data_match.group(1)
-                                break
-
-                        # Se não encontrar, usar a coluna de data padrão
-                        if not data_match:
-                            data = cells[1].text.strip()
-                    except Exception as e:
-                        print(f"Erro ao extrair data: {e}")
-                        data = cells[1].text.strip()
-
-                    # Extrair caminho de download do JavaScript
-                    download_js = link.get('href', '')
-                    download_match = re.search(r"downloadWindow\('([^']+)'\)", download_js)
-
-                    if download_match:
-                        download_path = download_match.group(1)
-                        full_url = f"{self.base_url}{download_path}"
-
-                        # Formatar nome do arquivo
-                        try:
-                            # Tenta primeiro o formato yyyy-mm-dd
-                            data_obj = datetime.strptime(data, "%Y-%m-%d")
-                        except ValueError:
-                            try:
-                                # Se falhar, tenta o formato dd/mm/yyyy
-                                data_obj = datetime.strptime(data, "%d/%m/%Y")
-                            except ValueError:
-                                # Se ambos falharem, usa a data atual
-                                data_obj = datetime.now()
-                                print(f"Erro ao processar a data '{data}' para o diário {numero}. Usando data atual.")
-
-                        filename = f"PR_DIARIO_{numero}_{data_obj.strftime('%Y_%m_%d')}.pdf"
-                        filepath = os.path.join(self.download_dir, filename)
-
-                        # Baixar diário
-                        try:
-                            response_download = self.session.get(full_url, headers=self.headers)
-
-                            if response_download.status_code == 200:
-                                with open(filepath, 'wb') as f:
-                                    f.write(response_download.content)
-
-                                print(f"Baixado diário {numero} - {data}")
-                                downloaded_diarios.append({
-                                    'numero': numero,
-                                    'data': data,
-                                    'filename': filename
-                                })
-                        except Exception as e:
-                            print(f"Erro ao baixar diário {numero}: {e}")
-
-                if len(downloaded_diarios) >= num_diarios:
-                    break
+                        # Se falhar, tenta o formato dd/mm/yyyy
+                        data_obj = datetime.strptime(data, "%d/%m/%Y")
+                    except ValueError:
+                        # Se ambos falharem, usa a data atual
+                        data_obj = datetime.now()
+                        print(f"Erro ao processar a data '{data}' para o diário {numero}. Usando data atual.")
+
+                filename = f"PR_DIARIO_{numero}_{data_obj.strftime('%Y_%m_%d')}.pdf"
+                editions.append({
+                    'numero': numero,
+                    'data': data,
+                    'url': full_url,
+                    'filename': filename
+                })
 
             # Se atingiu o número desejado de diários, interromper
-            if len(downloaded_diarios) >= num_diarios:
+            if len(editions) >= num_diarios:
+                break
+
+            # Página sem diários: fim da listagem
+            if len(editions) == found:
+                print(f"Nenhum diário encontrado na página {current_page}")
                 break
 
             # Navegar para próxima página
@@ -150,17 +127,48 @@ class TJPRDiarioDownloader:
             }
 
             try:
-                response = self.session.post(self.search_url, headers=self.headers, data=form_data)
+                response = self.http.post(self.search_url, headers=self.headers, data=form_data)
             except Exception as e:
                 print(f"Erro ao navegar para próxima página: {e}")
                 break
 
+        # Baixar os diários encontrados, até self.concurrency ao mesmo tempo
+        print(f"\nBaixando {len(editions)} diários (até {self.concurrency} simultâneos)...")
+        engine = AsyncDownloadEngine(self.http, self.download_dir, headers=self.headers,
+                                     concurrency=self.concurrency, chunk_size=self.chunk_size, store=self.store)
+        downloaded_diarios = []
+        for result in engine.download_all(editions):
+            diario = result.edition
+            if result.success and result.existing is not None:
+                print(f"Diário {diario['numero']} - {diario['data']} já baixado como {result.existing}")
+            elif result.success:
+                print(f"Baixado diário {diario['numero']} - {diario['data']}")
+                downloaded_diarios.append({
+                    'numero': diario['numero'],
+                    'data': diario['data'],
+                    'filename': diario['filename']
+                })
+            else:
+                print(f"Erro ao baixar diário {diario['numero']}: {result.error}")
+
         return downloaded_diarios
 
 
 # Executar download
 if __name__ == '__main__':
-    downloader = TJPRDiarioDownloader()
+    # --concurrency=N define quantos diários são baixados ao mesmo tempo; --rate=R, requisições por segundo;
+    # --chunk-kb=N, o tamanho dos blocos de leitura dos downloads
+    concurrency = DEFAULT_CONCURRENCY
+    rate = DEFAULT_RATE
+    chunk_size = CHUNK_SIZE
+    for arg in sys.argv[1:]:
+        if arg.startswith("--concurrency="):
+            concurrency = int(arg.split("=", 1)[1])
+        elif arg.startswith("--rate="):
+            rate = float(arg.split("=", 1)[1])
+        elif arg.startswith("--chunk-kb="):
+            chunk_size = int(arg.split("=", 1)[1]) * 1024
+    downloader = TJPRDiarioDownloader(concurrency=concurrency, rate=rate, chunk_size=chunk_size)
     diarios_baixados = downloader.download_diarios()
 
     print("\n╔════════════════════════════════════════════════╗")
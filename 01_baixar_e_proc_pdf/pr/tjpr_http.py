@@ -0,0 +1,141 @@
+import email.utils
+import logging
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger("tjpr_autodownloader.http")
+
+# Timeouts de cada requisição: conexão e intervalo máximo sem receber bytes
+CONNECT_TIMEOUT = 10
+READ_TIMEOUT = 60
+
+# Limite de requisições ao portal (listagens e downloads juntos) e rajada permitida
+DEFAULT_RATE = 4.0
+DEFAULT_BURST = 8
+
+# Novas tentativas para erros 5xx/429 e falhas de conexão
+MAX_RETRIES = 4
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+# Maior espera aceita num Retry-After do servidor
+RETRY_AFTER_MAX = 300.0
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """Limitador token bucket compartilhado entre threads: rate fichas por segundo, até burst acumuladas"""
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        if rate <= 0:
+            raise ValueError(f"Taxa de requisições inválida: {rate}")
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited = 0.0
+
+    def acquire(self):
+        """Retira uma ficha, esperando o necessário; retorna o tempo esperado em segundos"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # A ficha é reservada já, mesmo que fique negativa; quem chega depois espera mais
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            self.waited += wait
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+def retry_after_seconds(response):
+    """Valor do cabeçalho Retry-After em segundos (aceita número ou data HTTP); None se ausente"""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        moment = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, moment.timestamp() - time.time())
+
+
+class TJPRHttpClient:
+    """Camada de requisições ao portal usada pela listagem e pelos downloads.
+
+    Toda requisição (inclusive cada nova tentativa) retira uma ficha do mesmo TokenBucket. Erros 5xx,
+    429 e falhas de conexão ou timeout são repetidos até max_retries vezes com backoff exponencial e
+    jitter completo, respeitando o Retry-After quando o servidor o envia. O pool de conexões da sessão
+    comporta pool_size conexões simultâneas, que deve ser o número de workers de download.
+    get e post aceitam os mesmos argumentos de requests.Session.
+    """
+
+    def __init__(self, headers=None, rate=DEFAULT_RATE, burst=DEFAULT_BURST, pool_size=1,
+                 timeout=(CONNECT_TIMEOUT, READ_TIMEOUT), max_retries=MAX_RETRIES,
+                 backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX):
+        self.session = requests.Session()
+        if headers:
+            self.session.headers.update(headers)
+        # Uma conexão a mais para a listagem, que corre junto com os downloads
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size + 1, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.limiter = TokenBucket(rate, burst)
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def backoff(self, attempt, response=None):
+        """Espera antes da tentativa attempt + 1: jitter completo sobre base * 2^attempt, ou o Retry-After"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if response is not None:
+            retry_after = retry_after_seconds(response)
+            if retry_after is not None:
+                delay = max(delay, min(retry_after, RETRY_AFTER_MAX))
+        return delay
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.backoff(attempt)
+                logger.warning(f"Falha de conexão em {url} ({e}); nova tentativa em {delay:.1f} s")
+            else:
+                if response.status_code not in RETRY_STATUS or attempt >= self.max_retries:
+                    return response
+                delay = self.backoff(attempt, response)
+                logger.warning(f"Código {response.status_code} em {url}; nova tentativa em {delay:.1f} s")
+                response.close()
+            with self._lock:
+                self.retries += 1
+            attempt += 1
+            time.sleep(delay)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,90 @@
+import re
+from collections import namedtuple
+
+try:
+    # lxml é opcional; sem ele a listagem é lida com o BeautifulSoup (html.parser), numa única busca
+    import lxml.html
+    from lxml import etree
+except ImportError:
+    lxml = None
+
+from bs4 import BeautifulSoup
+
+_DOWNLOAD_LINK = re.compile(r'javascript:downloadWindow')
+_DOWNLOAD_PATH = re.compile(r"downloadWindow\('([^']+)'\)")
+
+if lxml is not None:
+    # Links de download e, para cada um, a linha mais próxima e as células dela; com tabelas de layout
+    # aninhadas, os <tr> externos também contêm o link, mas não são linhas da listagem
+    _LINKS = etree.XPath("//a[contains(@href, 'javascript:downloadWindow')]")
+    _LINK_ROW = etree.XPath("ancestor::tr[1]")
+    _ROW_CELLS = etree.XPath("td")
+
+
+class ListingRow(namedtuple('ListingRow', ['cells', 'download_path'])):
+    """Linha da listagem de edições: textos das células (sem espaços nas pontas) e caminho do PDF"""
+    __slots__ = ()
+
+    @property
+    def numero(self):
+        return self.cells[0]
+
+    @property
+    def data(self):
+        return self.cells[1]
+
+
+def _row(cells, href):
+    """Monta a linha se ela tiver pelo menos número e data e um caminho de download reconhecível"""
+    if len(cells) < 2:
+        return None
+    match = _DOWNLOAD_PATH.search(href or '')
+    if not match:
+        return None
+    return ListingRow(tuple(cells), match.group(1))
+
+
+def _parse_lxml(html):
+    if isinstance(html, str):
+        # O lxml recusa str com declaração de codificação; os bytes em UTF-8 servem para os dois casos
+        html = html.encode('utf-8')
+    document = lxml.html.document_fromstring(html)
+    rows, seen = [], set()
+    for link in _LINKS(document):
+        tr = _LINK_ROW(link)
+        # Só o primeiro link de cada linha
+        if not tr or tr[0] in seen:
+            continue
+        seen.add(tr[0])
+        row = _row([td.text_content().strip() for td in _ROW_CELLS(tr[0])], link.get('href'))
+        if row:
+            rows.append(row)
+    return rows
+
+
+def _parse_soup(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    rows, seen = [], set()
+    for link in soup.find_all('a', href=_DOWNLOAD_LINK):
+        tr = link.find_parent('tr')
+        if tr is None or id(tr) in seen:
+            continue
+        seen.add(id(tr))
+        row = _row([td.text.strip() for td in tr.find_all('td', recursive=False)], link.get('href'))
+        if row:
+            rows.append(row)
+    return rows
+
+
+def parse_listing(html, use_lxml=None):
+    """Extrai as edições de uma página da listagem do e-DJ, na ordem da página (mais recente primeiro).
+
+    Retorna um ListingRow por linha de tabela com link javascript:downloadWindow('caminho') e pelo
+    menos duas células; a interpretação do número e da data fica com cada downloader. Cada linha
+    aparece uma vez, mesmo com tabelas aninhadas. use_lxml=False força o BeautifulSoup.
+    """
+    if not html or not html.strip():
+        return []
+    if use_lxml is None:
+        use_lxml = lxml is not None
+    return _parse_lxml(html) if use_lxml else _parse_soup(html)